@@ -6,21 +6,49 @@ Subtitle Translator - واجهة ويب محسنة
  
 import gradio as gr
 import pysubs2
-from deep_translator import GoogleTranslator
 from pathlib import Path
 import tempfile
-import re
 import os
 import hashlib
 import json
+import queue
+import threading
 import time
-
-# Cache للترجمات المكررة
-translation_cache = {}
-
-# Retry settings
-MAX_RETRIES = 3
-RETRY_DELAY = 2  # seconds
+from collections import OrderedDict, deque
+
+from job_api import API_PORT_ENV, start_api_server
+from language_detect import describe_sources, group_by_source, line_sources
+from line_filter import LineFilter, describe_skipped
+from metrics import METRICS_PORT_ENV, format_summary, get_metrics, snapshot_delta, start_metrics_server
+from openai_translator import DEFAULT_RPM
+from providers import get_provider
+from rate_limiter import DEFAULT_RATE, RateLimiter, set_rate_limiter
+from subtitle_translator import parse_targets, plan_target, translate_target
+from translation_engine import DEFAULT_WORKERS, PreparedTexts
+from translation_memory import DEFAULT_FUZZY_THRESHOLD, get_memory
+
+# Partial results are streamed to the UI at most this often
+STREAM_INTERVAL = 2.0  # seconds
+PREVIEW_LINES = 20
+
+# Files parsed by the preview, kept for the translate click of the same session
+PARSED_CACHE_SIZE = 16
+PARSED_CACHE_TTL = 600  # seconds
+# Batches of the first target translated in the background after a preview
+WARMUP_BATCHES = 2
+# Longest wait for the warm-up batch still in flight when translation starts
+WARMUP_WAIT = 30.0  # seconds
+
+_parsed_files = OrderedDict()
+_parsed_lock = threading.Lock()
+
+# Journals of unfinished jobs, so a retried upload resumes where it stopped
+JOURNAL_DIR = Path(tempfile.gettempdir()) / "subtitle_translator_journals"
+
+# One adaptive limiter per provider, shared by every session of the app
+set_rate_limiter(RateLimiter(DEFAULT_RATE), 'google')
+set_rate_limiter(RateLimiter(DEFAULT_RPM / 60), 'openai')
+set_rate_limiter(RateLimiter(0), 'local')
 
 
 def get_language_choices():
@@ -47,223 +75,358 @@ def get_language_choices():
     ]
 
 
-def get_cache_key(text: str, source: str, target: str, provider: str) -> str:
-    """Generate cache key for translation"""
-    content = f"{text}|{source}|{target}|{provider}"
-    return hashlib.md5(content.encode()).hexdigest()
+def get_journal_path(file_path: str, settings: dict) -> Path:
+    """Return the journal path for this file content and these settings"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        digest.update(f.read())
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return JOURNAL_DIR / f"{digest.hexdigest()}.journal"
+
+
+def parse_subtitles(path: str) -> dict:
+    """Load a subtitle file and segment its dialogue lines"""
+    metrics = get_metrics()
+    with metrics.stage('load'):
+        subs = pysubs2.load(path)
+    dialogue_lines = [event for event in subs.events if not event.is_comment]
+    texts = [event.text for event in dialogue_lines]
+    with metrics.stage('segment'):
+        prepared = PreparedTexts(texts)
+    return {
+        'subs': subs,
+        'dialogue': dialogue_lines,
+        'texts': texts,
+        'prepared': prepared,
+        'sources': {},
+        'warmup': None,
+        'warmup_cancel': threading.Event(),
+    }
+
+
+def _parsed_key(path: str, request) -> tuple:
+    # Uploads of the same content share a path, so the session is part of the key
+    return getattr(request, 'session_hash', None), path, os.path.getmtime(path)
+
+
+def remember_parsed(path: str, request, parsed: dict):
+    """Keep a parsed file for the next translate click of this session"""
+    now = time.monotonic()
+    parsed['time'] = now
+    with _parsed_lock:
+        _parsed_files[_parsed_key(path, request)] = parsed
+        while _parsed_files:
+            key, oldest = next(iter(_parsed_files.items()))
+            if len(_parsed_files) <= PARSED_CACHE_SIZE and now - oldest['time'] < PARSED_CACHE_TTL:
+                break
+            del _parsed_files[key]
+
+
+def take_parsed(path: str, request) -> dict:
+    """Return the file parsed by this session's preview, or parse it now
+
+    The entry leaves the cache: translation writes into its events.
+    """
+    with _parsed_lock:
+        parsed = _parsed_files.pop(_parsed_key(path, request), None)
+    if parsed is not None and time.monotonic() - parsed['time'] >= PARSED_CACHE_TTL:
+        parsed = None
+    get_metrics().inc('parsed_cache_lookups_total', result='miss' if parsed is None else 'hit')
+    return parsed if parsed is not None else parse_subtitles(path)
+
+
+def file_sources(parsed: dict, source_lang: str) -> list:
+    """Return the per-line source languages of a parsed file, detected once"""
+    if source_lang not in parsed['sources']:
+        with get_metrics().stage('detect'):
+            parsed['sources'][source_lang] = line_sources(parsed['texts'], source_lang)
+    return parsed['sources'][source_lang]
+
+
+def warm_up(parsed: dict, target: str, source_lang: str, provider: str, options: dict,
+            batch_size: int, skip_untranslatable: bool, fuzzy_threshold: float):
+    """Translate the first batches of a file into the translation memory
+
+    Runs in the background with a single request at a time, so a translate
+    click that follows finds those lines in memory. Batches are sent one by
+    one and none is started once parsed['warmup_cancel'] is set.
+    """
+    texts = parsed['texts']
+    sources = file_sources(parsed, source_lang)
+    kept = range(len(texts))
+    if skip_untranslatable:
+        reasons = LineFilter().classify(parsed['dialogue'], target, source_lang)
+        kept = [idx for idx, reason in enumerate(reasons) if reason is None]
+    todo = list(kept)[:WARMUP_BATCHES * batch_size]
+
+    translator = get_provider(provider, **options)
+    for source, indices in group_by_source(todo, sources, target).items():
+        for start in range(0, len(indices), batch_size):
+            if parsed['warmup_cancel'].is_set():
+                return
+            batch = indices[start:start + batch_size]
+            translator.translate_batch(
+                [texts[idx] for idx in batch], source, target,
+                batch_size=batch_size,
+                memory=get_memory(),
+                keep_results=False,
+                fuzzy_threshold=fuzzy_threshold if fuzzy_threshold < 1 else None,
+                prepared=parsed['prepared'].subset(batch),
+                max_workers=1
+            )
 
 
-def translate_with_openai(texts: list, source_lang: str, target_lang: str, api_key: str) -> list:
-    """Translate using OpenAI API for better context-aware translations"""
-    try:
-        from openai import OpenAI
-        client = OpenAI(api_key=api_key)
-
-        # Prepare batch prompt
-        lang_names = {
-            'ar': 'Arabic', 'en': 'English', 'ja': 'Japanese', 'ko': 'Korean',
-            'zh-CN': 'Simplified Chinese', 'zh-TW': 'Traditional Chinese',
-            'fr': 'French', 'de': 'German', 'es': 'Spanish', 'it': 'Italian',
-            'pt': 'Portuguese', 'ru': 'Russian', 'tr': 'Turkish'
-        }
-
-        target_name = lang_names.get(target_lang, target_lang)
-
-        # Join texts with separator
-        separator = "\n---SUBTITLE_SEP---\n"
-        combined_text = separator.join(texts)
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"You are a professional subtitle translator. Translate the following subtitles to {target_name}. Keep the same number of lines and maintain the same separator '---SUBTITLE_SEP---' between each subtitle. Preserve any formatting tags in curly braces like {{\\pos}} or {{\\an8}}. Only return the translations, nothing else."
-                },
-                {
-                    "role": "user",
-                    "content": combined_text
-                }
-            ],
-            temperature=0.3
-        )
-
-        translated_text = response.choices[0].message.content
-        return translated_text.split(separator)
-
-    except ImportError:
-        raise Exception("مكتبة openai غير مثبتة. قم بتثبيتها: pip install openai")
-    except Exception as e:
-        raise Exception(f"خطأ في OpenAI API: {str(e)}")
-
-
-def translate_with_google_batch(texts: list, source_lang: str, target_lang: str) -> list:
-    """Translate batch of texts using Google Translate with retry logic"""
-    src = 'auto' if source_lang == 'auto' else source_lang
-    translator = GoogleTranslator(source=src, target=target_lang)
-
-    results = []
-    for idx, text in enumerate(texts):
-        if not text or not text.strip():
-            results.append(text)
-            continue
-
-        # Extract and preserve ASS tags
-        tag_pattern = r'(\{[^}]*\})'
-        parts = re.split(tag_pattern, text)
-
-        translated_parts = []
-        for part in parts:
-            if part.startswith('{') and part.endswith('}'):
-                translated_parts.append(part)
-            elif part.strip():
-                # Check cache first
-                cache_key = get_cache_key(part, src, target_lang, 'google')
-                if cache_key in translation_cache:
-                    translated_parts.append(translation_cache[cache_key])
-                else:
-                    # Retry logic for rate limits
-                    translated = None
-                    for attempt in range(MAX_RETRIES):
-                        try:
-                            translated = translator.translate(part)
-                            if translated:
-                                translation_cache[cache_key] = translated
-                                break
-                        except Exception as e:
-                            if attempt < MAX_RETRIES - 1:
-                                time.sleep(RETRY_DELAY * (attempt + 1))
-                            else:
-                                translated = None
-
-                    translated_parts.append(translated if translated else part)
-            else:
-                translated_parts.append(part)
-
-        results.append(''.join(translated_parts))
-
-        # Small delay between texts to avoid rate limits
-        if idx < len(texts) - 1:
-            time.sleep(0.3)
-
-    return results
-
-
-def preview_subtitles(file):
-    """Preview first 10 lines of subtitle file"""
+def start_warm_up(parsed: dict, *args):
+    def run():
+        try:
+            warm_up(parsed, *args)
+        except Exception:
+            # Only a head start; the real run reports provider errors
+            pass
+
+    parsed['warmup'] = threading.Thread(target=run, daemon=True)
+    parsed['warmup'].start()
+
+
+def preview_subtitles(file, target_langs, source_lang, provider, api_key, batch_size, skip_untranslatable, fuzzy_threshold, request: gr.Request = None):
+    """Preview first 10 lines of subtitle file
+
+    The parsed file is kept for this session's translate click, and the
+    first batches of the first selected target are translated meanwhile.
+    """
     if file is None:
         return "لم يتم رفع ملف"
 
     try:
-        subs = pysubs2.load(file.name)
-        dialogue_lines = [event for event in subs.events if not event.is_comment][:10]
+        parsed = parse_subtitles(file.name)
+        dialogue_lines = parsed['dialogue']
 
         preview = "📋 معاينة أول 10 أسطر:\n\n"
-        for i, event in enumerate(dialogue_lines, 1):
+        for i, event in enumerate(dialogue_lines[:10], 1):
             preview += f"{i}. {event.text}\n"
 
-        if len([e for e in subs.events if not e.is_comment]) > 10:
-            preview += f"\n... و {len([e for e in subs.events if not e.is_comment]) - 10} سطر آخر"
+        if len(dialogue_lines) > 10:
+            preview += f"\n... و {len(dialogue_lines) - 10} سطر آخر"
+
+        targets = parse_targets(target_langs or [])
+        # A local model would only compete with the real run for the same hardware
+        if dialogue_lines and targets and provider != "local" and (provider != "openai" or api_key):
+            options = {'api_key': api_key} if provider == "openai" else {}
+            start_warm_up(parsed, targets[0], source_lang, provider, options,
+                          int(batch_size), skip_untranslatable, fuzzy_threshold)
+            preview += f"\n\n⚡ جاري تجهيز أول الدفعات ({targets[0]}) في الخلفية"
+        remember_parsed(file.name, request, parsed)
 
         return preview
     except Exception as e:
         return f"❌ خطأ في قراءة الملف: {str(e)}"
 
 
-def translate_subtitle(file, target_lang, source_lang, provider, api_key, dual_subs, batch_size, progress=gr.Progress()):
-    """Main translation function with improvements"""
+def translate_subtitle(file, target_langs, source_lang, provider, api_key, dual_subs, batch_size, concurrency, skip_untranslatable, fuzzy_threshold, progress=gr.Progress(), request: gr.Request = None):
+    """Main translation function, yielding partial results as batches finish
+
+    Every selected target language is translated concurrently from one
+    parse of the file and gets its own output file. A file previewed in
+    this session is not parsed again.
+    """
 
     if file is None:
-        return None, "❌ الرجاء رفع ملف ترجمة", ""
+        yield None, "❌ الرجاء رفع ملف ترجمة", ""
+        return
+
+    targets = parse_targets(target_langs or [])
+    if not targets:
+        yield None, "❌ الرجاء اختيار لغة الترجمة", ""
+        return
 
     if provider == "openai" and not api_key:
-        return None, "❌ الرجاء إدخال OpenAI API Key", ""
+        yield None, "❌ الرجاء إدخال OpenAI API Key", ""
+        return
+
+    # The registry is shared by all sessions; the panel shows this run's share
+    metrics = get_metrics()
+    metrics_before = metrics.snapshot()
 
     try:
         # Load subtitle file
         progress(0.1, desc="جاري تحميل الملف...")
-        subs = pysubs2.load(file.name)
-        original_subs = pysubs2.load(file.name)  # Keep original for dual subs
+        parsed = take_parsed(file.name, request)
+        subs = parsed['subs']
 
         input_path = Path(file.name)
 
         # Filter dialogue lines
-        dialogue_lines = [event for event in subs.events if not event.is_comment]
+        dialogue_lines = parsed['dialogue']
  
         if not dialogue_lines:
-            return None, "❌ لا توجد نصوص للترجمة في الملف", ""
+            yield None, "❌ لا توجد نصوص للترجمة في الملف", ""
+            return
 
-        total = len(dialogue_lines)
-        progress(0.2, desc=f"جاري الترجمة... (0/{total})")
+        texts = parsed['texts']
+        prepared = parsed['prepared']
+
+        # Fix the source language once for the whole file
+        sources = file_sources(parsed, source_lang)
 
-        # Batch translation for better performance
         batch_size = int(batch_size)
-        translated_count = 0
-
-        if provider == "openai":
-            # OpenAI batch translation
-            for i in range(0, total, batch_size):
-                batch = dialogue_lines[i:i+batch_size]
-                texts = [event.text for event in batch]
-
-                translated_texts = translate_with_openai(texts, source_lang, target_lang, api_key)
-
-                for j, event in enumerate(batch):
-                    if j < len(translated_texts):
-                        if dual_subs:
-                            original_text = event.text
-                            event.text = f"{translated_texts[j]}\\N{original_text}"
-                        else:
-                            event.text = translated_texts[j]
-
-                translated_count += len(batch)
-                progress(0.2 + (0.7 * translated_count / total), desc=f"جاري الترجمة... ({translated_count}/{total})")
-        else:
-            # Google Translate batch
-            for i in range(0, total, batch_size):
-                batch = dialogue_lines[i:i+batch_size]
-                texts = [event.text for event in batch]
-
-                translated_texts = translate_with_google_batch(texts, source_lang, target_lang)
-
-                for j, event in enumerate(batch):
-                    if j < len(translated_texts):
-                        if dual_subs:
-                            original_text = event.text
-                            event.text = f"{translated_texts[j]}\\N{original_text}"
-                        else:
-                            event.text = translated_texts[j]
-
-                translated_count += len(batch)
-                progress(0.2 + (0.7 * translated_count / total), desc=f"جاري الترجمة... ({translated_count}/{total})")
-
-        # Save translated file
         suffix = "_dual" if dual_subs else ""
-        output_filename = f"{input_path.stem}_{target_lang}{suffix}{input_path.suffix}"
-        output_path = Path(tempfile.gettempdir()) / output_filename
-        subs.save(str(output_path))
+        labelled = len(targets) > 1
+        finished = 0
+        recent = deque(maxlen=PREVIEW_LINES)
+
+        def apply(job: dict, idx: int, translated: str, complete: bool = True):
+            nonlocal finished
+            if not complete:
+                job['incomplete'] += 1
+            text = f"{translated}\\N{texts[idx]}" if dual_subs else translated
+            job['translated'][idx] = text
+            label = f"[{job['lang']}] " if labelled else ""
+            recent.append(f"{label}{idx + 1}. {text}")
+            finished += 1
+
+        def save(job: dict):
+            for event, text in zip(dialogue_lines, job['translated']):
+                event.text = text
+            subs.save(str(job['output']))
+
+        jobs = []
+        line_filter = LineFilter() if skip_untranslatable else None
+        for lang in targets:
+            # Resume lines finished by an earlier, interrupted attempt
+            settings = {'provider': provider, 'source': source_lang, 'target': lang}
+            job = plan_target(
+                lang,
+                Path(tempfile.gettempdir()) / f"{input_path.stem}_{lang}{suffix}{input_path.suffix}",
+                dialogue_lines, texts, prepared, sources, source_lang, provider,
+                line_filter=line_filter,
+                resume=True,
+                journal_file=get_journal_path(file.name, settings)
+            )
+            # Lines where a fragment failed and kept its source text
+            job['incomplete'] = 0
+            for idx in job['carried']:
+                apply(job, idx, job['translated'][idx])
+            # Lines in the target language or without text are done already
+            finished += job['done']
+            jobs.append(job)
+
+        total = sum(job['kept'] for job in jobs)
+        progress(0.2, desc=f"جاري الترجمة... ({finished}/{total})")
+
+        # Stop the preview's warm-up and let its batch in flight land in memory
+        # instead of repeating its requests; past WARMUP_WAIT it is left to finish
+        # on its own while the run sends those lines again
+        if parsed['warmup'] is not None:
+            parsed['warmup_cancel'].set()
+            parsed['warmup'].join(WARMUP_WAIT)
+
+        # One worker thread per target hands back finished lines
+        results = queue.Queue()
+        errors = []
+        options = {'api_key': api_key} if provider == "openai" else {}
+        translator = get_provider(provider, max_workers=int(concurrency) * len(jobs), **options)
+
+        def run(job: dict):
+            try:
+                translate_target(
+                    translator, job, texts, prepared, batch_size, get_memory(),
+                    fuzzy_threshold if fuzzy_threshold < 1 else None, int(concurrency),
+                    result_callback=lambda idx, translated, complete: results.put((job, idx, translated, complete))
+                )
+            except Exception as e:
+                errors.append(e)
+            finally:
+                results.put(None)
+
+        for job in jobs:
+            threading.Thread(target=run, args=(job,), daemon=True).start()
+        running = len(jobs)
+        last_yield = time.monotonic()
+        updated = set()
+        try:
+            while running:
+                try:
+                    item = results.get(timeout=0.5)
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    running -= 1
+                elif item:
+                    apply(*item)
+                    updated.add(item[0]['lang'])
+                    progress(0.2 + (0.7 * finished / total), desc=f"جاري الترجمة... ({finished}/{total})")
+
+                # Stream partially translated files and a rolling preview
+                if updated and time.monotonic() - last_yield >= STREAM_INTERVAL:
+                    for job in jobs:
+                        if job['lang'] in updated:
+                            save(job)
+                    updated.clear()
+                    last_yield = time.monotonic()
+                    status = f"⏳ جاري الترجمة... ({finished}/{total})\n"
+                    status += "📥 يمكنك تنزيل الجزء المترجم ومراجعته الآن"
+                    yield [str(job['output']) for job in jobs], status, "📋 آخر الأسطر المترجمة:\n\n" + "\n".join(recent)
+        finally:
+            for job in jobs:
+                job['journal'].close()
+
+        if errors:
+            raise errors[0]
+
+        # Save translated files
+        stats = {}
+        with metrics.stage('save'):
+            for job in jobs:
+                save(job)
+                job['journal'].discard()
+                for key, value in job['stats'].items():
+                    stats[key] = stats.get(key, 0) + value
 
         # Generate preview of translated content
-        preview = "📋 معاينة الترجمة (أول 5 أسطر):\n\n"
-        for i, event in enumerate(dialogue_lines[:5], 1):
-            preview += f"{i}. {event.text}\n"
+        preview_lines = max(5, PREVIEW_LINES // len(jobs))
+        preview = f"📋 معاينة الترجمة (أول {preview_lines} سطراً):\n"
+        for job in jobs:
+            preview += f"\n[{job['lang']}]\n" if labelled else "\n"
+            for i, text in enumerate(job['translated'][:preview_lines], 1):
+                preview += f"{i}. {text}\n"
 
         status = f"✅ تمت الترجمة بنجاح!\n\n"
-        status += f"📄 عدد الأسطر: {total}\n"
-        status += f"🌐 اللغة: {target_lang}\n"
+        status += f"📄 عدد الأسطر: {len(dialogue_lines)}\n"
+        for job in jobs:
+            if job['skipped']:
+                label = f" ({job['lang']})" if labelled else ""
+                status += f"⏭️ أسطر متخطاة{label}: {sum(job['skipped'].values())} ({describe_skipped(job['skipped'])})\n"
+        if source_lang == 'auto':
+            status += f"🔎 لغة المصدر: {describe_sources(sources)}\n"
+        status += f"🌐 اللغة: {'، '.join(targets)}\n"
         status += f"🔧 المحرك: {provider.upper()}\n"
         status += f"📦 حجم الدفعة: {batch_size}\n"
-        status += f"📁 الملف: {output_filename}"
+        status += f"⚡ الطلبات المتزامنة: {int(concurrency)}" + (" لكل لغة" if labelled else "") + "\n"
+        status += f"♻️ مقاطع مكررة لم تُرسل: {stats.get('deduplicated', 0)}\n"
+        if stats.get('tokens_saved'):
+            status += f"✂️ رموز موفرة بإزالة الوسوم: ~{stats['tokens_saved']}\n"
+        if stats.get('fuzzy'):
+            status += f"🔍 مقاطع من تطابق تقريبي في الذاكرة: {stats['fuzzy']}\n"
+        if stats.get('resumed'):
+            status += f"⏯️ أسطر مستأنفة من محاولة سابقة: {stats['resumed']}\n"
+        incomplete = sum(job['incomplete'] for job in jobs)
+        if incomplete:
+            status += f"⚠️ أسطر لم تُترجم بالكامل: {incomplete}\n"
+        status += f"📁 الملفات: {'، '.join(job['output'].name for job in jobs)}"
 
         if dual_subs:
             status += "\n🔄 ترجمة مزدوجة: نعم"
 
+        panel = format_summary(snapshot_delta(metrics.snapshot(), metrics_before))
+        if panel:
+            status += f"\n\n📈 المقاييس:\n{panel}"
+
         progress(1.0, desc="تم!")
 
-        return str(output_path), status, preview
+        yield [str(job['output']) for job in jobs], status, preview
 
     except Exception as e:
-        return None, f"❌ خطأ: {str(e)}", ""
+        yield None, f"❌ خطأ: {str(e)}", ""
 
 
 # Create Gradio interface
@@ -293,8 +456,9 @@ with gr.Blocks() as app:
 
             target_lang = gr.Dropdown(
                 choices=get_language_choices(),
-                value="ar",
-                label="🌐 لغة الترجمة"
+                value=["ar"],
+                multiselect=True,
+                label="🌐 لغة الترجمة (يمكن اختيار عدة لغات)"
             )
  
             source_lang = gr.Dropdown(
@@ -305,7 +469,11 @@ with gr.Blocks() as app:
 
             with gr.Row():
                 provider = gr.Radio(
-                    choices=[("Google (مجاني)", "google"), ("OpenAI (أفضل جودة)", "openai")],
+                    choices=[
+                        ("Google (مجاني)", "google"),
+                        ("OpenAI (أفضل جودة)", "openai"),
+                        ("محلي (دون إنترنت)", "local"),
+                    ],
                     value="google",
                     label="🔧 محرك الترجمة"
                 )
@@ -326,11 +494,32 @@ with gr.Blocks() as app:
                     label="📦 حجم الدفعة (أكبر = أسرع)"
                 )
 
-                dual_subs = gr.Checkbox(
-                    label="🔄 ترجمة مزدوجة (سطرين)",
-                    value=False
+                concurrency = gr.Slider(
+                    minimum=1,
+                    maximum=32,
+                    value=DEFAULT_WORKERS,
+                    step=1,
+                    label="⚡ الطلبات المتزامنة"
                 )
 
+            dual_subs = gr.Checkbox(
+                label="🔄 ترجمة مزدوجة (سطرين)",
+                value=False
+            )
+
+            skip_untranslatable = gr.Checkbox(
+                label="⏭️ تخطي اللافتات والأغاني والأسطر المترجمة مسبقاً",
+                value=True
+            )
+
+            fuzzy_threshold = gr.Slider(
+                minimum=0.7,
+                maximum=1.0,
+                value=1.0,
+                step=0.01,
+                label=f"🔍 حد التطابق التقريبي مع الذاكرة (1 = التطابق التام فقط، المقترح {DEFAULT_FUZZY_THRESHOLD:g})"
+            )
+
             translate_btn = gr.Button(
                 "🚀 ترجمة",
                 variant="primary",
@@ -339,12 +528,13 @@ with gr.Blocks() as app:
  
         with gr.Column():
             output_file = gr.File(
-                label="📥 تحميل الملف المترجم"
+                label="📥 تحميل الملفات المترجمة",
+                file_count="multiple"
             )
  
             status_text = gr.Textbox(
                 label="📊 الحالة",
-                lines=8,
+                lines=14,
                 interactive=False
             )
 
@@ -357,13 +547,13 @@ with gr.Blocks() as app:
     # Connect buttons
     preview_btn.click(
         fn=preview_subtitles,
-        inputs=[file_input],
+        inputs=[file_input, target_lang, source_lang, provider, api_key, batch_size, skip_untranslatable, fuzzy_threshold],
         outputs=[preview_text]
     )
 
     translate_btn.click(
         fn=translate_subtitle,
-        inputs=[file_input, target_lang, source_lang, provider, api_key, dual_subs, batch_size],
+        inputs=[file_input, target_lang, source_lang, provider, api_key, dual_subs, batch_size, concurrency, skip_untranslatable, fuzzy_threshold],
         outputs=[output_file, status_text, translated_preview]
     )
  
@@ -373,13 +563,25 @@ with gr.Blocks() as app:
         ### ملاحظات:
         - **Google**: مجاني، سريع، جودة جيدة
         - **OpenAI**: جودة أفضل للسياق، يحتاج API Key
+        - **محلي**: نموذج على جهازك دون إنترنت أو حصص (LOCAL_MT_MODEL، أو خادم LOCAL_MT_URL)، يحتاج تحديد لغة المصدر
+        - المعاينة تجهز أول الدفعات في الخلفية، فتبدأ الترجمة بعدها أسرع
+        - اختيار عدة لغات ينتج ملفاً لكل لغة من مهمة واحدة، وتُترجم اللغات بالتوازي
         - الترجمة المزدوجة تضيف الترجمة فوق النص الأصلي
         - حجم دفعة أكبر = سرعة أعلى
+        - طلبات متزامنة أكثر = سرعة أعلى (حتى حد المزود)
+        - التخطي يترك أنماط Sign/OP/ED وأسطر ♪ والأرقام والأسطر المكتوبة بلغة الهدف دون تغيير
         """
     )
  
  
 if __name__ == "__main__":
+    # Optional Prometheus endpoint, e.g. SUBTITLE_METRICS_PORT=9100
+    if os.environ.get(METRICS_PORT_ENV):
+        start_metrics_server(int(os.environ[METRICS_PORT_ENV]))
+    # Optional job API for pipelines, e.g. SUBTITLE_API_PORT=7861
+    if os.environ.get(API_PORT_ENV):
+        start_api_server(int(os.environ[API_PORT_ENV]))
+
     app.launch(
         server_name="0.0.0.0",
         server_port=7860,
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+ASS Text - تحليل نصوص ASS
+Tokenizer that turns an event's text into translatable sentences
+"""
+
+import re
+from typing import List, Optional, Tuple, Union
+
+# Override blocks, hard/soft line breaks and hard spaces
+TOKEN_PATTERN = re.compile(r'(\{[^}]*\}|\\[Nnh])')
+DRAWING_PATTERN = re.compile(r'\\p(\d+)')
+PLACEHOLDER_PATTERN = re.compile(r'⟦\s*(\d+)\s*⟧')
+LETTER_PATTERN = re.compile(r'[^\W\d_]')
+
+LINE_BREAKS = ('\\N', '\\n')
+
+
+def placeholder(n: int) -> str:
+    """Return the marker that stands for the n-th inline tag of a segment"""
+    return f"⟦{n}⟧"
+
+
+class Segment:
+    """One logical sentence: plain text with its inline tags as placeholders
+
+    Inline override blocks and hard spaces are replaced by numbered
+    placeholders. Line breaks are sent as spaces and put back at the same
+    relative position, which keeps the sentence whole for the translator.
+    """
+
+    def __init__(self):
+        self.text = ''
+        # (kind, original token, offset in self.text); kind is 'tag' or 'break'
+        self.markers: List[Tuple[str, str, int]] = []
+
+    def add_text(self, text: str):
+        self.text += text
+
+    def add_tag(self, tag: str):
+        # Adjacent tags share one placeholder
+        if self.markers and self.markers[-1][0] == 'tag' and self.text.endswith('⟧'):
+            kind, previous, offset = self.markers[-1]
+            self.markers[-1] = (kind, previous + tag, offset)
+            return
+        self.markers.append(('tag', tag, len(self.text)))
+        self.text += placeholder(sum(1 for kind, _, _ in self.markers if kind == 'tag') - 1)
+
+    def add_break(self, token: str):
+        self.markers.append(('break', token, len(self.text)))
+        self.text += ' '
+
+    def restore(self, translated: str) -> str:
+        """Put the original tags and line breaks back into a translation"""
+        tags = [token for kind, token, _ in self.markers if kind == 'tag']
+        used = set()
+
+        def replace(match):
+            n = int(match.group(1))
+            if n < len(tags) and n not in used:
+                used.add(n)
+                return tags[n]
+            return ''
+
+        result = PLACEHOLDER_PATTERN.sub(replace, translated)
+
+        # Tags the translator dropped and all line breaks go back at the same
+        # relative position, snapped to the nearest word boundary
+        source_length = max(len(self.text), 1)
+        inserts = []
+        tag_number = 0
+        for kind, token, offset in self.markers:
+            if kind == 'tag':
+                missing = tag_number not in used
+                tag_number += 1
+                if not missing:
+                    continue
+            inserts.append((offset / source_length, token))
+
+        # Insert from the end so earlier positions stay valid
+        for ratio, token in sorted(inserts, key=lambda item: item[0], reverse=True):
+            position = _snap_to_boundary(result, round(ratio * len(result)))
+            if token in LINE_BREAKS:
+                result = result[:position].rstrip(' ') + token + result[position:].lstrip(' ')
+            else:
+                result = result[:position] + token + result[position:]
+        return result
+
+
+def _snap_to_boundary(text: str, position: int) -> int:
+    position = max(0, min(position, len(text)))
+    if position in (0, len(text)) or text[position - 1] == ' ' or text[position] == ' ':
+        return position
+    left = text.rfind(' ', 0, position)
+    right = text.find(' ', position)
+    candidates = [p + 1 for p in (left,) if p != -1] + [p for p in (right,) if p != -1]
+    if not candidates:
+        return position
+    return min(candidates, key=lambda p: abs(p - position))
+
+
+def is_translatable(text: str) -> bool:
+    """Check whether text has anything worth sending to a translator"""
+    return bool(LETTER_PATTERN.search(PLACEHOLDER_PATTERN.sub('', text)))
+
+
+class ParsedLine:
+    """An event's text split into literal pieces and translatable segments"""
+
+    def __init__(self, pieces: List[Union[str, int]], segments: List[Segment]):
+        # Strings are copied verbatim, integers index into segments
+        self.pieces = pieces
+        self.segments = segments
+
+    def restore(self, translations: List[Optional[str]]) -> str:
+        """Rebuild the line; None keeps a segment's source text"""
+        out = []
+        for piece in self.pieces:
+            if isinstance(piece, int):
+                segment = self.segments[piece]
+                translated = translations[piece]
+                out.append(segment.restore(translated if translated else segment.text))
+            else:
+                out.append(piece)
+        return ''.join(out)
+
+
+def tokenize(text: str) -> List[Tuple[str, str, bool]]:
+    """Split text into (kind, token, drawing) with kind 'tag', 'break', 'space' or 'text'"""
+    tokens = []
+    drawing = False
+    for token in TOKEN_PATTERN.split(text):
+        if not token:
+            continue
+        if token.startswith('{') and token.endswith('}'):
+            for level in DRAWING_PATTERN.findall(token):
+                drawing = int(level) > 0
+            tokens.append(('tag', token, drawing))
+        elif token in LINE_BREAKS:
+            tokens.append(('break', token, drawing))
+        elif token == '\\h':
+            tokens.append(('space', token, drawing))
+        else:
+            tokens.append(('text', token, drawing))
+    return tokens
+
+
+def parse_line(text: str) -> ParsedLine:
+    """Split an event's text into verbatim pieces and translatable segments
+
+    Drawing-mode payloads (\\p1 and up), tag-only lines and segments without
+    any letters are never turned into segments.
+    """
+    tokens = tokenize(text)
+    pieces: List[Union[str, int]] = []
+    segments: List[Segment] = []
+
+    # Runs of tokens outside drawing mode; drawing tokens are copied verbatim
+    runs: List[List[Tuple[str, str]]] = []
+    current: List[Tuple[str, str]] = []
+    for kind, token, drawing in tokens:
+        if drawing and kind == 'text':
+            if current:
+                runs.append(current)
+                current = []
+            runs.append([('literal', token)])
+        else:
+            current.append((kind, token))
+    if current:
+        runs.append(current)
+
+    for run in runs:
+        text_positions = [
+            idx for idx, (kind, token) in enumerate(run)
+            if kind == 'text' and token.strip()
+        ]
+        if not text_positions:
+            pieces.extend(token for _, token in run)
+            continue
+
+        first, last = text_positions[0], text_positions[-1]
+        leading = run[first][1]
+        trailing = run[last][1]
+        pieces.extend(token for _, token in run[:first])
+
+        segment = Segment()
+        # Surrounding whitespace stays outside the segment
+        lead_space = leading[:len(leading) - len(leading.lstrip())]
+        for idx in range(first, last + 1):
+            kind, token = run[idx]
+            if idx == first:
+                token = token.lstrip()
+            if idx == last:
+                token = token.rstrip()
+            if kind == 'text':
+                segment.add_text(token)
+            elif kind == 'break':
+                segment.add_break(token)
+            else:
+                segment.add_tag(token)
+        trail_space = trailing[len(trailing.rstrip()):]
+
+        if is_translatable(segment.text):
+            if lead_space:
+                pieces.append(lead_space)
+            pieces.append(len(segments))
+            segments.append(segment)
+            if trail_space:
+                pieces.append(trail_space)
+        else:
+            pieces.extend(token for _, token in run[first:last + 1])
+        pieces.extend(token for _, token in run[last + 1:])
+
+    return ParsedLine(pieces, segments)
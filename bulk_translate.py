@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Bulk Translate - ترجمة مجلدات ومواسم كاملة
+Runs translate_subtitles over many files in a process pool
+"""
+
+import glob
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from queue import Empty
+from typing import List, Optional
+
+from tqdm import tqdm
+
+from line_filter import LineFilter
+from metrics import get_metrics
+from rate_limiter import DEFAULT_RATE, RateLimiter, set_rate_limiter
+from subtitle_stream import CHUNK_SIZE
+from subtitle_translator import parse_targets, print_error, print_info, print_success, translate_subtitles
+from translation_engine import DEFAULT_WORKERS
+
+SUPPORTED_EXTENSIONS = ('.ass', '.srt', '.ssa')
+DEFAULT_PROCESSES = min(4, os.cpu_count() or 1)
+
+# Set in each worker process by the pool initializer
+_progress_queue = None
+
+
+def is_bulk_input(patterns: List[str]) -> bool:
+    """Check whether the inputs name more than a single file"""
+    return len(patterns) > 1 or any(
+        os.path.isdir(p) or glob.has_magic(p) for p in patterns
+    )
+
+
+def expand_inputs(patterns: List[str], target_lang: Optional[str] = None) -> List[Path]:
+    """Expand files, directories and glob patterns into subtitle files"""
+    targets = parse_targets(target_lang) if target_lang else []
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = Path(pattern).rglob('*')
+        elif glob.has_magic(pattern):
+            candidates = (Path(p) for p in glob.glob(pattern, recursive=True))
+        else:
+            # Explicit paths are kept even if missing so the report lists them
+            found.append(Path(pattern))
+            continue
+
+        for path in candidates:
+            if not path.is_file() or path.suffix.lower() not in SUPPORTED_EXTENSIONS:
+                continue
+            # Skip our own outputs from a previous run
+            if any(path.stem.endswith(f"_{lang}") for lang in targets):
+                continue
+            found.append(path)
+
+    return sorted(set(found))
+
+
+def output_patterns(files: List[Path], output_dir: str) -> List[str]:
+    """
+    Build the output pattern of each file under output_dir
+
+    Each file keeps its path relative to the inputs' common root, so
+    season1/ep01.ass and season2/ep01.ass do not overwrite each other
+    (or each other's journals).
+    """
+    parents = [os.path.abspath(path.parent) for path in files]
+    root = os.path.commonpath(parents) if parents else ''
+    patterns = []
+    for path, parent in zip(files, parents):
+        relative = Path(os.path.relpath(parent, root))
+        patterns.append(str(Path(output_dir) / relative / f"{path.stem}_{{lang}}{path.suffix}"))
+    return patterns
+
+
+def _init_worker(limiter: RateLimiter, progress_queue):
+    global _progress_queue
+    set_rate_limiter(limiter)
+    _progress_queue = progress_queue
+
+
+def _translate_file(job: dict) -> dict:
+    input_file = job['input']
+
+    def on_progress(done: int, total: int):
+        _progress_queue.put((input_file, done, total))
+
+    # Each report carries the metrics of its own file only
+    metrics = get_metrics()
+    metrics.reset()
+    stats = {}
+    started = time.time()
+    success = translate_subtitles(
+        input_file=input_file,
+        output_file=job['output'],
+        target_lang=job['target_lang'],
+        source_lang=job['source_lang'],
+        batch_size=job['batch_size'],
+        use_cache=job['use_cache'],
+        cache_path=job['cache_path'],
+        max_workers=job['max_workers'],
+        incremental=job['incremental'],
+        resume=job['resume'],
+        line_filter=job['line_filter'],
+        provider=job['provider'],
+        provider_options=job['provider_options'],
+        fuzzy_threshold=job['fuzzy_threshold'],
+        stream=job['stream'],
+        chunk_size=job['chunk_size'],
+        stats=stats,
+        progress_callback=on_progress,
+        quiet=True
+    )
+    return {
+        'input': input_file,
+        'output': stats.get('output_file') if success else None,
+        'outputs': stats.get('outputs') if success else None,
+        'success': success,
+        'lines': stats.get('lines', 0),
+        'source': stats.get('source'),
+        'skipped': stats.get('skipped', 0),
+        'unique': stats.get('unique', 0),
+        'deduplicated': stats.get('deduplicated', 0),
+        'cached': stats.get('cached', 0),
+        'fuzzy': stats.get('fuzzy', 0),
+        'tokens_saved': stats.get('tokens_saved', 0),
+        'reused': stats.get('reused', 0),
+        'resumed': stats.get('resumed', 0),
+        'seconds': round(time.time() - started, 2),
+        'error': stats.get('error'),
+        'metrics': metrics.snapshot(),
+    }
+
+
+def run_bulk(
+    files: List[Path],
+    target_lang: str,
+    source_lang: str = 'auto',
+    output_dir: Optional[str] = None,
+    batch_size: int = 50,
+    max_workers: int = DEFAULT_WORKERS,
+    processes: int = DEFAULT_PROCESSES,
+    use_cache: bool = True,
+    cache_path: Optional[str] = None,
+    rate: float = DEFAULT_RATE,
+    incremental: bool = False,
+    resume: bool = False,
+    line_filter: Optional[LineFilter] = None,
+    provider: str = 'google',
+    provider_options: Optional[dict] = None,
+    fuzzy_threshold: Optional[float] = None,
+    stream: bool = False,
+    chunk_size: int = CHUNK_SIZE
+) -> List[dict]:
+    """
+    Translate many subtitle files in a pool of worker processes
+
+    All workers share one translation memory (the SQLite file) and one
+    global rate limiter, and report into a single progress bar. Worker
+    metrics are merged into this process's registry.
+
+    Returns:
+        One report dict per file, in input order
+    """
+    outputs = output_patterns(files, output_dir) if output_dir else [None] * len(files)
+    jobs = []
+    for path, output in zip(files, outputs):
+        if output:
+            Path(output).parent.mkdir(parents=True, exist_ok=True)
+        jobs.append({
+            'input': str(path),
+            'output': output,
+            'target_lang': target_lang,
+            'source_lang': source_lang,
+            'batch_size': batch_size,
+            'use_cache': use_cache,
+            'cache_path': cache_path,
+            'max_workers': max_workers,
+            'incremental': incremental,
+            'resume': resume,
+            'line_filter': line_filter,
+            'provider': provider,
+            'provider_options': provider_options,
+            'fuzzy_threshold': fuzzy_threshold,
+            'stream': stream,
+            'chunk_size': chunk_size,
+        })
+    limiter = RateLimiter(rate)
+    progress_queue = multiprocessing.Queue()
+    file_progress = {}
+    reports = {}
+
+    bar = tqdm(total=0, desc="الترجمة", unit="سطر")
+
+    def drain():
+        while True:
+            try:
+                input_file, done, total = progress_queue.get_nowait()
+            except Empty:
+                break
+            file_progress[input_file] = (done, total)
+        bar.total = sum(total for _, total in file_progress.values())
+        bar.n = sum(done for done, _ in file_progress.values())
+        bar.set_postfix_str(f"ملفات {len(reports)}/{len(jobs)}")
+        bar.refresh()
+
+    with ProcessPoolExecutor(
+        max_workers=max(1, processes),
+        initializer=_init_worker,
+        initargs=(limiter, progress_queue)
+    ) as executor:
+        futures = {executor.submit(_translate_file, job): job for job in jobs}
+        pending = set(futures)
+        while pending:
+            finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job = futures[future]
+                try:
+                    report = future.result()
+                    get_metrics().merge(report.pop('metrics'))
+                    reports[job['input']] = report
+                except Exception as e:
+                    reports[job['input']] = {
+                        'input': job['input'], 'output': None, 'success': False,
+                        'lines': 0, 'seconds': 0, 'error': f"خطأ: {str(e)}",
+                    }
+            drain()
+
+    drain()
+    bar.close()
+    return [reports[job['input']] for job in jobs]
+
+
+def print_report(reports: List[dict], report_path: Optional[str] = None):
+    """Print the per-file summary and optionally save it as JSON"""
+    print("\nتقرير الملفات:")
+    print("-" * 60)
+    for report in reports:
+        if report['success']:
+            output = '، '.join((report.get('outputs') or {}).values()) or report['output']
+            print_success(f"{report['input']} → {output} "
+                          f"({report['lines']} سطر، {report['seconds']} ث)")
+        else:
+            print_error(f"{report['input']}: {report['error']}")
+    print("-" * 60)
+
+    succeeded = sum(1 for report in reports if report['success'])
+    print_info(f"نجح: {succeeded}، فشل: {len(reports) - succeeded}، المجموع: {len(reports)}")
+
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        print_info(f"تم حفظ التقرير: {report_path}")
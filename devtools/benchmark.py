@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Benchmark - قياس أداء مسارات الترجمة
+Runs every pipeline mode against the local mock backend and records results
+
+Each case runs in a fresh process with its own translation memory, so peak
+memory and cache behaviour are measured per mode. Results are saved as JSON
+in devtools/benchmark_results/ and compared with the latest run that used
+the same settings.
+
+Usage:
+    python devtools/benchmark.py
+    python devtools/benchmark.py --sizes 500 5000 --latency 0.2 --error-rate 0.02
+    python devtools/benchmark.py --corpus ~/subs/season1 --modes cli bulk
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from mock_backend import start_server  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'benchmark_results'
+DEFAULT_SIZES = (200, 1000, 5000)
+MODES = ('cli', 'cli-warm', 'web-google', 'openai', 'bulk')
+DEFAULT_LATENCY = 0.05  # seconds per mock request
+TARGET_LANG = 'ar'
+# Slower than this share of the baseline's lines/second is reported as a regression
+REGRESSION_THRESHOLD = 0.15
+
+# Corpus building blocks: frequent short replies repeat like in real episodes
+INTERJECTIONS = [
+    "Yeah.", "What?", "Huh?", "Thank you.", "Wait!", "I see.", "Let's go!",
+    "Are you okay?", "No way...", "Sorry.", "Hey!", "Really?",
+]
+WORDS = (
+    "we have to get back before the train leaves the station tonight and "
+    "nobody knows where the old man hid the letter but I promised her that "
+    "this time I will not run away from the truth whatever it costs us"
+).split()
+
+
+def _sentence(rng: random.Random) -> str:
+    start = rng.randrange(len(WORDS) - 4)
+    words = WORDS[start:start + rng.randint(4, 12)]
+    return ' '.join(words).capitalize() + rng.choice(['.', '?', '!', '...'])
+
+
+def _dialogue(rng: random.Random) -> str:
+    roll = rng.random()
+    if roll < 0.25:
+        return rng.choice(INTERJECTIONS)
+    if roll < 0.40:
+        return f"{_sentence(rng)}\\N{_sentence(rng)}"
+    if roll < 0.50:
+        words = _sentence(rng).split(' ')
+        at = rng.randrange(len(words))
+        words[at] = f"{{\\i1}}{words[at]}{{\\i0}}"
+        return ' '.join(words)
+    return _sentence(rng)
+
+
+def generate_corpus(directory: Path, sizes, seed: int = 1) -> List[Path]:
+    """Write synthetic, real-world-shaped .ass and .srt files of each size"""
+    import pysubs2
+
+    directory.mkdir(parents=True, exist_ok=True)
+    files = []
+    for size in sizes:
+        rng = random.Random(seed + size)
+        subs = pysubs2.SSAFile()
+        subs.styles['Sign'] = pysubs2.SSAStyle(fontsize=30, alignment=pysubs2.Alignment.TOP_CENTER)
+        subs.styles['OP'] = pysubs2.SSAStyle(fontsize=24, italic=True)
+        start = 0
+        for _ in range(size):
+            roll = rng.random()
+            style, text = 'Default', _dialogue(rng)
+            if roll < 0.03:
+                style, text = 'Sign', f"{{\\an8\\pos(640,60)}}{rng.choice(WORDS).title()} Station"
+            elif roll < 0.06:
+                style, text = 'OP', "Kimi no koe ga kikoeru yo"
+            elif roll < 0.07:
+                text = "{\\p1}m 0 0 l 100 0 100 100 l 0 100{\\p0}"
+            duration = rng.randint(800, 4000)
+            event = pysubs2.SSAEvent(start=start, end=start + duration, text=text, style=style)
+            event.type = 'Comment' if rng.random() < 0.01 else 'Dialogue'
+            subs.events.append(event)
+            start += duration + rng.randint(0, 1500)
+
+        for fmt in ('ass', 'srt'):
+            path = directory / f"corpus_{size}.{fmt}"
+            subs.save(str(path))
+            files.append(path)
+    return files
+
+
+def _peak_memory_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux; bulk mode also counts its workers
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return round(peak / 1024, 1)
+
+
+def run_case(case: dict) -> dict:
+    """Run one benchmark case; called in a fresh process"""
+    os.environ['SUBTITLE_TM_PATH'] = case['cache_path']
+    os.environ['TQDM_DISABLE'] = '1'
+    # Inherited by bulk workers, which are started as fresh interpreters too
+    os.environ['GOOGLE_TRANSLATE_URL'] = f"{case['server']}/m"
+
+    import pysubs2
+    from bulk_translate import run_bulk
+    from line_filter import LineFilter
+    from providers import get_provider
+    from rate_limiter import RateLimiter, set_rate_limiter
+    from subtitle_translator import translate_subtitles
+    from translation_memory import get_memory
+
+    set_rate_limiter(RateLimiter(case['rate']) if case['rate'] else None)
+
+    mode = case['mode']
+    files = case['files']
+    stats = {}
+    started = time.perf_counter()
+
+    if mode in ('cli', 'cli-warm'):
+        ok = translate_subtitles(
+            files[0], case['output'], TARGET_LANG,
+            cache_path=case['cache_path'], stats=stats, quiet=True,
+            progress_callback=lambda done, total: None, line_filter=LineFilter()
+        )
+        if not ok:
+            raise RuntimeError(stats.get('error'))
+        lines = stats['lines']
+    elif mode == 'bulk':
+        reports = run_bulk(
+            [Path(f) for f in files], TARGET_LANG, output_dir=case['output'],
+            cache_path=case['cache_path'], rate=case['rate'], line_filter=LineFilter()
+        )
+        failed = [r for r in reports if not r['success']]
+        if failed:
+            raise RuntimeError(failed[0]['error'])
+        lines = sum(r['lines'] for r in reports)
+        stats['cached'] = sum(r.get('cached', 0) for r in reports)
+        stats['unique'] = sum(r.get('unique', 0) for r in reports)
+    else:
+        # The web app's path: one provider batch over the raw event texts
+        texts = [e.text for e in pysubs2.load(files[0]).events if not e.is_comment]
+        lines = len(texts)
+        if mode == 'web-google':
+            provider = get_provider('google')
+        else:
+            provider = get_provider('openai', api_key='mock-key', base_url=f"{case['server']}/v1")
+        provider.translate_batch(
+            texts, 'auto', TARGET_LANG, memory=get_memory(), stats=stats, keep_results=False
+        )
+
+    wall = time.perf_counter() - started
+    unique = stats.get('unique')
+    return {
+        'lines': lines,
+        'wall_seconds': round(wall, 3),
+        'lines_per_second': round(lines / wall, 1) if wall else None,
+        'cache_hit_rate': round(stats.get('cached', 0) / unique, 3) if unique else None,
+        'failed': stats.get('failed', 0),
+        'peak_memory_mb': _peak_memory_mb(),
+    }
+
+
+def run_isolated(case: dict) -> dict:
+    """Run a case in a new interpreter so memory peaks do not carry over"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_case, case).result()
+
+
+def build_cases(files: List[Path], modes, workdir: Path) -> List[dict]:
+    """Expand corpus files and modes into an ordered list of cases"""
+    cases = []
+    for path in files:
+        cache = str(workdir / f"{path.stem}_{path.suffix[1:]}.sqlite3")
+        for mode in modes:
+            if mode == 'bulk':
+                continue
+            cases.append({
+                'name': f"{mode}:{path.name}",
+                'mode': mode,
+                'files': [str(path)],
+                # cli-warm reuses the memory filled by the cli case before it
+                'cache_path': cache if mode in ('cli', 'cli-warm') else
+                str(workdir / f"{path.stem}_{path.suffix[1:]}_{mode}.sqlite3"),
+                'output': str(workdir / f"{mode}_{path.name}"),
+            })
+    if 'bulk' in modes:
+        cases.append({
+            'name': f"bulk:{len(files)} files",
+            'mode': 'bulk',
+            'files': [str(path) for path in files],
+            'cache_path': str(workdir / 'bulk.sqlite3'),
+            'output': str(workdir / 'bulk_out'),
+        })
+    return cases
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def latest_result(settings: dict, exclude: Optional[Path] = None) -> Optional[Path]:
+    """Return the most recent saved result file measured with the same settings"""
+    for path in sorted((p for p in RESULTS_DIR.glob('*.json') if p != exclude), reverse=True):
+        try:
+            with open(path, encoding='utf-8') as f:
+                if json.load(f).get('settings') == settings:
+                    return path
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def compare(results: List[dict], settings: dict, baseline_path: Path) -> int:
+    """Print per-case changes against a saved run and return the regression count"""
+    with open(baseline_path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    print(f"\nمقارنة مع: {baseline_path.name} ({data.get('revision')})")
+    if data.get('settings') != settings:
+        print("  إعدادات القياس مختلفة، لا تصح المقارنة")
+        return 0
+    baseline = {r['name']: r for r in data['results']}
+    regressions = 0
+    for result in results:
+        before = baseline.get(result['name'])
+        if not before or not before.get('lines_per_second') or not result.get('lines_per_second'):
+            continue
+        change = result['lines_per_second'] / before['lines_per_second'] - 1
+        flag = ''
+        if change < -REGRESSION_THRESHOLD or result['requests'] > before['requests']:
+            flag = '  ⚠ تراجع'
+            regressions += 1
+        print(f"  {result['name']:<32} {change:+7.1%} سطر/ث، "
+              f"الطلبات {before['requests']} → {result['requests']}{flag}")
+    return regressions
+
+
+def print_table(results: List[dict]):
+    header = f"{'case':<32} {'lines':>6} {'wall s':>8} {'lines/s':>9} {'req':>6} {'req/file':>8} {'hit':>6} {'MB':>7}"
+    print('\n' + header)
+    print('-' * len(header))
+    for r in results:
+        hit = '-' if r['cache_hit_rate'] is None else f"{r['cache_hit_rate']:.0%}"
+        print(f"{r['name']:<32} {r['lines']:>6} {r['wall_seconds']:>8.2f} "
+              f"{r['lines_per_second'] or 0:>9.1f} {r['requests']:>6} "
+              f"{r['requests_per_file']:>8.1f} {hit:>6} {r['peak_memory_mb']:>7.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس أداء مسارات الترجمة مقابل خادم محلي")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='أحجام الملفات المولدة بعدد الأسطر')
+    parser.add_argument('--corpus', help='مجلد ملفات حقيقية بدلاً من الملفات المولدة')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY, help='تأخير الخادم لكل طلب')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='نسبة الطلبات الفاشلة (500)')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='طلبات/ثانية قبل الرد بـ 429')
+    parser.add_argument('--rate', type=float, default=0.0, help='حد معدل الطلبات لدى العميل (0 = بلا حد)')
+    parser.add_argument('--baseline', help='ملف نتائج للمقارنة (افتراضي: آخر تشغيل محفوظ بنفس الإعدادات)')
+    parser.add_argument('--no-save', action='store_true', help='عدم حفظ النتائج')
+    args = parser.parse_args()
+
+    server, state = start_server(
+        latency=args.latency, error_rate=args.error_rate, rate_limit=args.rate_limit
+    )
+    server_url = f"http://127.0.0.1:{server.server_port}"
+
+    with tempfile.TemporaryDirectory(prefix='subtitle_bench_') as tmp:
+        workdir = Path(tmp)
+        if args.corpus:
+            from bulk_translate import expand_inputs
+            files = expand_inputs([args.corpus])
+        else:
+            files = generate_corpus(workdir / 'corpus', args.sizes)
+
+        results = []
+        for case in build_cases(files, args.modes, workdir):
+            case.update(server=server_url, rate=args.rate)
+            state.reset()
+            print(f"… {case['name']}", flush=True)
+            try:
+                result = run_isolated(case)
+            except Exception as e:
+                print(f"  ✗ {e}")
+                continue
+            backend = state.snapshot()
+            result.update(
+                name=case['name'],
+                mode=case['mode'],
+                files=len(case['files']),
+                requests=backend['requests'],
+                requests_per_file=round(backend['requests'] / len(case['files']), 1),
+                errors=backend['errors'],
+                throttled=backend['throttled'],
+                max_in_flight=backend['max_in_flight'],
+            )
+            results.append(result)
+
+    server.shutdown()
+    print_table(results)
+
+    settings = {
+        'sizes': None if args.corpus else args.sizes,
+        'corpus': args.corpus,
+        'modes': args.modes,
+        'latency': args.latency,
+        'error_rate': args.error_rate,
+        'rate_limit': args.rate_limit,
+        'rate': args.rate,
+    }
+    saved = None
+    if not args.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        saved = RESULTS_DIR / f"{stamp}.json"
+        with open(saved, 'w', encoding='utf-8') as f:
+            json.dump({
+                'revision': git_revision(),
+                'created': stamp,
+                'settings': settings,
+                'results': results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\nتم حفظ النتائج: {saved}")
+
+    baseline = Path(args.baseline) if args.baseline else latest_result(settings, exclude=saved)
+    if baseline and baseline.exists():
+        return 1 if compare(results, settings, baseline) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
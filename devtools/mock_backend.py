@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Mock Backend - خادم ترجمة محلي للتجربة والقياس
+Local stand-in for Google Translate and OpenAI chat completions
+
+Serves the Google mobile page used by deep-translator (GET /m) and an
+OpenAI-compatible /v1/chat/completions endpoint, with configurable latency,
+error rate, 429 throttling and batches answered with a line missing.
+
+Usage:
+    python devtools/mock_backend.py --port 8000 --latency 0.5
+    python devtools/mock_backend.py --error-rate 0.05 --rate-limit 20
+    python devtools/mock_backend.py --drop-rate 0.2
+    OPENAI_BASE_URL=http://127.0.0.1:8000/v1 python app.py
+"""
+
+import argparse
+import html
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+
+class StubState:
+    """Settings and counters shared by all request handlers"""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        prefix: str = "[stub] ",
+        error_rate: float = 0.0,
+        rate_limit: float = 0.0,
+        drop_rate: float = 0.0,
+        seed: int = 0
+    ):
+        self.latency = latency
+        self.prefix = prefix
+        # Share of requests answered with HTTP 500
+        self.error_rate = error_rate
+        # Requests per second accepted before answering HTTP 429 (0 = unlimited)
+        self.rate_limit = rate_limit
+        # Share of multi-line chat batches answered with one line missing
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.connections = 0
+        self.errors = 0
+        self.throttled = 0
+        self.dropped = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._recent = deque()
+        self.lock = threading.Lock()
+
+    def admit(self) -> int:
+        """Count a request and return the status code it should get"""
+        with self.lock:
+            self.requests += 1
+            now = time.monotonic()
+            if self.rate_limit:
+                while self._recent and now - self._recent[0] >= 1.0:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rate_limit:
+                    self.throttled += 1
+                    return 429
+                self._recent.append(now)
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.errors += 1
+                return 500
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return 200
+
+    def pick_dropped(self, count: int) -> int:
+        """Return the position of the line to leave out of a batch, or -1"""
+        with self.lock:
+            if count < 2 or not self.drop_rate or self.random.random() >= self.drop_rate:
+                return -1
+            self.dropped += 1
+            return self.random.randrange(count)
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'connections': self.connections,
+                'errors': self.errors,
+                'throttled': self.throttled,
+                'dropped': self.dropped,
+                'max_in_flight': self.max_in_flight,
+            }
+
+    def reset(self):
+        with self.lock:
+            self.requests = self.connections = self.errors = self.throttled = self.dropped = 0
+            self.max_in_flight = self.in_flight
+            self._recent.clear()
+
+
+def translate_payload(content: str, prefix: str, state: Optional[StubState] = None) -> str:
+    """Fake-translate a numbered JSON batch, or plain text otherwise
+
+    With a state whose drop_rate is set, some batches come back with one
+    key missing, the way a model merges or skips a line.
+    """
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return prefix + content
+    if isinstance(data, dict):
+        dropped = state.pick_dropped(len(data)) if state is not None else -1
+        return json.dumps(
+            {key: prefix + str(value) for position, (key, value) in enumerate(data.items()) if position != dropped},
+            ensure_ascii=False
+        )
+    return prefix + content
+
+
+def translate_lines(text: str, prefix: str) -> str:
+    """Fake-translate newline-packed text line by line, as Google does"""
+    return '\n'.join(prefix + line for line in text.split('\n'))
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, so clients that pool connections can be told apart
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.connections += 1
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, data: bytes, content_type: str):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            if status == 429:
+                self.send_header('Retry-After', '1')
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_json(self, status: int, body: dict):
+            self._send(status, json.dumps(body, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+        def _send_failure(self, status: int):
+            message = 'rate limited' if status == 429 else 'mock failure'
+            self._send_json(status, {'error': {'message': message}})
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            path = url.path.rstrip('/')
+            if path.endswith('/stats'):
+                self._send_json(200, state.snapshot())
+            elif path == '/m':
+                self._google(parse_qs(url.query).get('q', [''])[0])
+            else:
+                self._send_json(404, {'error': {'message': 'not found'}})
+
+        def _google(self, text: str):
+            status = state.admit()
+            if status != 200:
+                self._send_failure(status)
+                return
+            try:
+                if state.latency:
+                    time.sleep(state.latency)
+                translated = html.escape(translate_lines(text, state.prefix))
+                page = f'<html><body><div class="result-container">{translated}</div></body></html>'
+                self._send(200, page.encode('utf-8'), 'text/html; charset=utf-8')
+            finally:
+                state.release()
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send_json(404, {'error': {'message': 'not found'}})
+                return
+
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            status = state.admit()
+            if status != 200:
+                self._send_failure(status)
+                return
+            try:
+                if state.latency:
+                    time.sleep(state.latency)
+                messages = request.get('messages') or [{'content': ''}]
+                content = translate_payload(messages[-1].get('content', ''), state.prefix, state)
+                self._send_json(200, {
+                    'id': f"chatcmpl-stub-{state.requests}",
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': request.get('model', 'stub'),
+                    'choices': [{
+                        'index': 0,
+                        'message': {'role': 'assistant', 'content': content},
+                        'finish_reason': 'stop',
+                    }],
+                    'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+                })
+            finally:
+                state.release()
+
+    return Handler
+
+
+def start_server(
+    host: str = '127.0.0.1',
+    port: int = 0,
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    rate_limit: float = 0.0,
+    drop_rate: float = 0.0
+):
+    """Start the stub in a background thread and return (server, state)"""
+    state = StubState(latency=latency, error_rate=error_rate, rate_limit=rate_limit, drop_rate=drop_rate)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="خادم ترجمة محلي للتجربة والقياس")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help='التأخير لكل طلب بالثواني')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='نسبة الطلبات التي تفشل بالخطأ 500')
+    parser.add_argument('--rate-limit', type=float, default=0.0,
+                        help='الطلبات المقبولة في الثانية قبل الرد بـ 429 (0 = بلا حد)')
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help='نسبة دفعات OpenAI التي تعود ناقصة سطرا واحدا')
+    args = parser.parse_args()
+
+    state = StubState(
+        latency=args.latency, error_rate=args.error_rate, rate_limit=args.rate_limit, drop_rate=args.drop_rate
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"OpenAI: http://{args.host}:{server.server_port}/v1")
+    print(f"Google: http://{args.host}:{server.server_port}/m")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Job API - واجهة برمجية لمهام الترجمة
+HTTP job submission next to the web app, with a content-addressed output cache
+
+    POST /jobs                   submit files and settings, returns one job per file
+    GET  /jobs                   jobs of the calling client
+    GET  /jobs/<id>              status, progress, stats and result links
+    GET  /jobs/<id>/files/<lang> translated file
+
+Every request carries "Authorization: Bearer <token>"; each token
+configured in SUBTITLE_API_TOKENS is one client and only sees its own jobs.
+Jobs run on a bounded pool of worker threads. Queued jobs are handed out
+round-robin per client, so one large submission cannot starve the others.
+Every fully translated output is stored under a hash of the input bytes,
+the settings that affect the translation and the target language: an
+identical resubmission is answered from the cache without touching any
+provider.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from job_store import FairQueue, OutputCache
+from line_filter import LineFilter
+from metrics import get_metrics
+from providers import PROVIDER_NAMES
+from subtitle_translator import output_path, parse_targets, translate_subtitles
+from translation_engine import DEFAULT_WORKERS
+from translation_memory import DEFAULT_FUZZY_THRESHOLD
+
+# Environment variable that enables the job API of the web app
+API_PORT_ENV = 'SUBTITLE_API_PORT'
+# Client tokens, comma-separated "name:token" entries (a bare token is client "default")
+API_TOKENS_ENV = 'SUBTITLE_API_TOKENS'
+
+# Files translated at the same time; each runs its own concurrent requests
+DEFAULT_API_WORKERS = 2
+
+# Bump when a change makes cached outputs stale
+CACHE_VERSION = 1
+# Settings that change the translated text; concurrency and keys do not
+CACHE_SETTINGS = ('source', 'provider', 'model', 'batch_size', 'skip_untranslatable', 'fuzzy_threshold')
+
+SUPPORTED_EXTENSIONS = ('.ass', '.srt', '.ssa')
+MAX_REQUEST_BYTES = 64 * 1024 * 1024
+# Finished jobs kept for status queries; the oldest are forgotten first
+MAX_FINISHED_JOBS = 10_000
+
+JOB_PATH = re.compile(r'^/jobs/([0-9a-f]{32})(?:/files/([A-Za-z-]+))?$')
+
+
+def parse_tokens(value: Optional[str]) -> Dict[str, str]:
+    """Map every API token in a SUBTITLE_API_TOKENS value to its client name"""
+    tokens = {}
+    for entry in (value or '').split(','):
+        name, separator, token = entry.strip().partition(':')
+        if not separator:
+            name, token = 'default', name
+        if token:
+            tokens[token] = name or 'default'
+    return tokens
+
+
+def parse_settings(raw: dict) -> dict:
+    """Validate submitted settings and fill in the defaults of the web app"""
+    targets = parse_targets(raw.get('target') or raw.get('targets') or [])
+    if not targets:
+        raise ValueError("حدد لغة الهدف في target")
+    provider = raw.get('provider') or 'google'
+    if provider not in PROVIDER_NAMES:
+        raise ValueError(f"مزود غير معروف: {provider}")
+    api_key = raw.get('api_key') or os.environ.get('OPENAI_API_KEY')
+    if provider == 'openai' and not api_key:
+        raise ValueError("الرجاء إدخال OpenAI API Key")
+    # Fuzzy matching is opt-in: true selects the default threshold
+    fuzzy = raw.get('fuzzy_threshold')
+    if fuzzy is True:
+        fuzzy = DEFAULT_FUZZY_THRESHOLD
+    try:
+        return {
+            'targets': targets,
+            'source': raw.get('source') or 'auto',
+            'provider': provider,
+            'api_key': api_key if provider == 'openai' else None,
+            'model': raw.get('model'),
+            'batch_size': int(raw.get('batch_size', 50)),
+            'concurrency': max(1, int(raw.get('concurrency', DEFAULT_WORKERS))),
+            'skip_untranslatable': bool(raw.get('skip_untranslatable', True)),
+            'fuzzy_threshold': float(fuzzy) if fuzzy and float(fuzzy) < 1 else None,
+        }
+    except (TypeError, ValueError):
+        raise ValueError("قيمة غير صالحة في الإعدادات")
+
+
+def cache_key(content: bytes, settings: dict, target: str) -> str:
+    """Hash an input file, the settings that affect its translation and one target"""
+    digest = hashlib.sha256(content)
+    digest.update(json.dumps(
+        {
+            'version': CACHE_VERSION,
+            'target': target,
+            **{name: settings[name] for name in CACHE_SETTINGS},
+        },
+        sort_keys=True
+    ).encode())
+    return digest.hexdigest()
+
+
+class JobService:
+    """Job registry, fair queue and worker pool behind the HTTP API"""
+
+    def __init__(self, workers: int = DEFAULT_API_WORKERS, cache: Optional[OutputCache] = None):
+        self.cache = cache or OutputCache()
+        self.jobs: 'OrderedDict[str, dict]' = OrderedDict()
+        self.queue = FairQueue()
+        self._lock = threading.Lock()
+        self.work_dir = Path(tempfile.mkdtemp(prefix='subtitle_jobs_'))
+        for _ in range(max(1, int(workers))):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def submit(self, client: str, files: List[Tuple[str, bytes]], settings: dict) -> List[dict]:
+        """Queue one job per (file name, content); cached targets are not translated again"""
+        metrics = get_metrics()
+        files = [(Path(name).name, content) for name, content in files]
+        for name, _ in files:
+            if Path(name).suffix.lower() not in SUPPORTED_EXTENSIONS:
+                raise ValueError(f"صيغة غير مدعومة: {name}")
+
+        jobs = []
+        for name, content in files:
+            suffix = Path(name).suffix.lower()
+            job = {
+                'id': uuid.uuid4().hex,
+                'client': client,
+                'name': name,
+                'settings': settings,
+                'status': 'queued',
+                'submitted': time.time(),
+                'finished': None,
+                'done': 0,
+                'total': 0,
+                'keys': {lang: cache_key(content, settings, lang) for lang in settings['targets']},
+                'files': {},
+                'cached': [],
+                'stats': {},
+                'error': None,
+            }
+            for lang, key in job['keys'].items():
+                path = self.cache.get(key, suffix)
+                metrics.inc('output_cache_lookups_total', result='hit' if path else 'miss')
+                if path:
+                    job['files'][lang] = path
+                    job['cached'].append(lang)
+
+            with self._lock:
+                self.jobs[job['id']] = job
+            if len(job['files']) == len(job['keys']):
+                self._finish(job, 'done')
+            else:
+                # Inputs wait on disk, not in memory
+                job_dir = self.work_dir / job['id']
+                job_dir.mkdir()
+                (job_dir / name).write_bytes(content)
+                self.queue.put(client, job)
+            jobs.append(job)
+        return jobs
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self, client: str) -> List[dict]:
+        with self._lock:
+            return [job for job in self.jobs.values() if job['client'] == client]
+
+    def _finish(self, job: dict, status: str):
+        job['status'] = status
+        job['finished'] = time.time()
+        get_metrics().inc('api_jobs_total', status=status)
+        with self._lock:
+            finished = [job_id for job_id, job in self.jobs.items() if job['finished']]
+            for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self.jobs[job_id]
+                # Outputs with failed lines were never cached
+                shutil.rmtree(self.work_dir / 'uncached' / job_id, ignore_errors=True)
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            try:
+                self._run(job)
+            except Exception as e:
+                job['error'] = f"خطأ: {str(e)}"
+                self._finish(job, 'failed')
+
+    def _run(self, job: dict):
+        settings = job['settings']
+        job['status'] = 'running'
+        job_dir = self.work_dir / job['id']
+        input_file = job_dir / job['name']
+        suffix = input_file.suffix.lower()
+        missing = [lang for lang in settings['targets'] if lang not in job['files']]
+
+        def on_progress(done: int, total: int):
+            job['done'], job['total'] = done, total
+
+        options = {}
+        if settings['provider'] == 'openai':
+            options = {'api_key': settings['api_key'], 'model': settings['model']}
+        elif settings['provider'] == 'local':
+            options = {'model': settings['model']}
+
+        template = str(job_dir / f"{input_file.stem}_{{lang}}{input_file.suffix}")
+        try:
+            success = translate_subtitles(
+                input_file=str(input_file),
+                output_file=template,
+                target_lang=','.join(missing),
+                source_lang=settings['source'],
+                batch_size=settings['batch_size'],
+                max_workers=settings['concurrency'],
+                stats=job['stats'],
+                progress_callback=on_progress,
+                quiet=True,
+                line_filter=LineFilter() if settings['skip_untranslatable'] else None,
+                provider=settings['provider'],
+                provider_options=options,
+                fuzzy_threshold=settings['fuzzy_threshold']
+            )
+            if not success:
+                job['error'] = job['stats'].get('error')
+                self._finish(job, 'failed')
+                return
+            # Lines that kept their source text after a ban or an outage must
+            # not be served to every identical resubmission: keep such outputs
+            # with the job only
+            complete = not job['stats'].get('failed')
+            uncached = self.work_dir / 'uncached' / job['id']
+            for lang in missing:
+                output = Path(output_path(str(input_file), lang, template))
+                if complete:
+                    job['files'][lang] = self.cache.put(job['keys'][lang], suffix, output)
+                else:
+                    uncached.mkdir(parents=True, exist_ok=True)
+                    job['files'][lang] = Path(shutil.move(str(output), uncached / f"{lang}{suffix}"))
+            self._finish(job, 'done')
+        finally:
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+
+def describe_job(job: dict) -> dict:
+    """Public view of a job, without inputs, keys or paths"""
+    stem, suffix = Path(job['name']).stem, Path(job['name']).suffix
+    return {
+        'id': job['id'],
+        'name': job['name'],
+        'status': job['status'],
+        'targets': job['settings']['targets'],
+        'cached': job['cached'],
+        'progress': {'done': job['done'], 'total': job['total']},
+        'files': {
+            lang: {'name': f"{stem}_{lang}{suffix}", 'url': f"/jobs/{job['id']}/files/{lang}"}
+            for lang in job['files']
+        },
+        'stats': {key: value for key, value in job['stats'].items() if key not in ('output_file', 'outputs')},
+        'error': job['error'],
+        'submitted': job['submitted'],
+        'finished': job['finished'],
+    }
+
+
+def start_api_server(
+    port: int,
+    host: str = '0.0.0.0',
+    workers: int = DEFAULT_API_WORKERS,
+    service: Optional[JobService] = None,
+    tokens: Optional[Dict[str, str]] = None
+):
+    """Serve the job API from a background thread
+
+    tokens maps every accepted bearer token to its client name (default:
+    SUBTITLE_API_TOKENS). Without any token the server does not start:
+    jobs may spend the operator's provider keys.
+    """
+    tokens = tokens or parse_tokens(os.environ.get(API_TOKENS_ENV))
+    if not tokens:
+        raise Exception(f"حدد رموز الوصول إلى الواجهة البرمجية في المتغير {API_TOKENS_ENV}")
+    service = service or JobService(workers)
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def client(self) -> Optional[str]:
+            """Return the client of the request's token, or answer 401 and return None"""
+            scheme, _, given = self.headers.get('Authorization', '').partition(' ')
+            client = None
+            if scheme.lower() == 'bearer' and given:
+                # Compare with every token so timing does not tell how much matched
+                for token, name in tokens.items():
+                    if hmac.compare_digest(token.encode(), given.strip().encode()):
+                        client = name
+            if client is None:
+                self.send_json(401, {'error': "رمز الوصول مفقود أو غير صالح"})
+            return client
+
+        def send_json(self, status: int, data):
+            payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            client = self.client()
+            if client is None:
+                return
+            if self.path.rstrip('/') != '/jobs':
+                self.send_json(404, {'error': "مسار غير موجود"})
+                return
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                self.send_json(400, {'error': "قيمة Content-Length غير صالحة"})
+                return
+            if length > MAX_REQUEST_BYTES:
+                self.send_json(413, {'error': "حجم الطلب أكبر من المسموح"})
+                return
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+                files = [
+                    (item['name'], item['content'].encode('utf-8'))
+                    for item in body.get('files') or []
+                ]
+                if not files:
+                    raise ValueError("لم يتم إرسال ملفات في files")
+                jobs = service.submit(client, files, parse_settings(body.get('settings') or {}))
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                message = str(e) if isinstance(e, ValueError) else "صيغة الطلب غير صالحة"
+                self.send_json(400, {'error': message})
+                return
+            done = all(job['status'] == 'done' for job in jobs)
+            self.send_json(200 if done else 202, {'jobs': [describe_job(job) for job in jobs]})
+
+        def do_GET(self):
+            client = self.client()
+            if client is None:
+                return
+            path = self.path.split('?', 1)[0].rstrip('/')
+            if path == '/jobs':
+                self.send_json(200, {'jobs': [describe_job(job) for job in service.list(client)]})
+                return
+            match = JOB_PATH.match(path)
+            job = service.get(match.group(1)) if match else None
+            # Other clients' jobs do not exist for this one
+            if job is None or job['client'] != client:
+                self.send_json(404, {'error': "المهمة غير موجودة"})
+                return
+            lang = match.group(2)
+            if lang is None:
+                self.send_json(200, describe_job(job))
+                return
+            output = job['files'].get(lang)
+            if output is None or not output.is_file():
+                self.send_json(404, {'error': "الملف غير جاهز"})
+                return
+            data = output.read_bytes()
+            name = describe_job(job)['files'][lang]['name']
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Disposition', f"attachment; filename*=UTF-8''{quote(name)}")
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
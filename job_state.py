@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Job State - حالة مهام الترجمة
+Sidecar manifests for incremental re-translation and journals for resuming
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+MANIFEST_SUFFIX = '.manifest.json'
+MANIFEST_VERSION = 1
+JOURNAL_SUFFIX = '.journal'
+
+
+def source_hash(text: str) -> str:
+    """Hash an event's source text exactly as it appears in the file"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def manifest_path(output_file: str) -> Path:
+    """Return the manifest path stored next to an output file"""
+    return Path(f"{output_file}{MANIFEST_SUFFIX}")
+
+
+def journal_path(output_file: str) -> Path:
+    """Return the journal path stored next to an output file"""
+    return Path(f"{output_file}{JOURNAL_SUFFIX}")
+
+
+class Manifest:
+    """Per-event source hashes and translations of a previous run"""
+
+    def __init__(self, settings: dict, entries: Optional[List[Tuple[str, str]]] = None):
+        self.settings = settings
+        self.entries = entries or []
+        self._by_hash: Dict[str, str] = {h: t for h, t in self.entries}
+
+    def lookup(self, text: str) -> Optional[str]:
+        """Return the previous translation of an unchanged source text"""
+        return self._by_hash.get(source_hash(text))
+
+    @classmethod
+    def load(cls, output_file: str, settings: dict) -> 'Manifest':
+        """Load the manifest for output_file, or an empty one if unusable"""
+        path = manifest_path(output_file)
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(settings)
+
+        # Translations made with other languages or providers cannot be reused
+        if data.get('version') != MANIFEST_VERSION or data.get('settings') != settings:
+            return cls(settings)
+        return cls(settings, [(e['h'], e['t']) for e in data.get('events', [])])
+
+    def save(self, output_file: str, pairs: List[Tuple[str, str]]):
+        """Write (source text, translation) for every event of this run"""
+        # Events left unchanged may be failed translations: keep them retryable
+        self.entries = [
+            (source_hash(source), translated)
+            for source, translated in pairs
+            if translated != source
+        ]
+        self._by_hash = {h: t for h, t in self.entries}
+
+        path = manifest_path(output_file)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': MANIFEST_VERSION,
+                'settings': self.settings,
+                'events': [{'h': h, 't': t} for h, t in self.entries],
+            }, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+class Journal:
+    """Append-only log of finished events, used to resume interrupted runs
+
+    The first line records the job settings; every following line is one
+    finished event. Lines are flushed as soon as they are written, so a crash
+    or Ctrl-C loses at most the batch that was in flight.
+    """
+
+    def __init__(self, path: os.PathLike, settings: dict, resume: bool = False, track: bool = True):
+        self.path = Path(path)
+        self.settings = settings
+        # Without tracking, new entries are only written out, keeping memory flat
+        self.track = track
+        self.completed: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+        if resume:
+            self._load()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._write({'settings': settings})
+        for h, t in self.completed.items():
+            self._write({'h': h, 't': t})
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        if not lines:
+            return
+        try:
+            if json.loads(lines[0]).get('settings') != self.settings:
+                return
+        except ValueError:
+            return
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Last line cut short by the crash
+                continue
+            self.completed[entry['h']] = entry['t']
+
+    def _write(self, entry: dict):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def lookup(self, text: str) -> Optional[str]:
+        """Return the journaled translation of text from an earlier attempt"""
+        return self.completed.get(source_hash(text))
+
+    def record(self, source: str, translated: str, complete: bool = True):
+        """Append one finished event
+
+        Events where only part of the text was translated are left out, so
+        that a resumed run retries them.
+        """
+        if not complete or translated == source:
+            return
+        h = source_hash(source)
+        with self._lock:
+            if self.completed.get(h) == translated:
+                return
+            if self.track:
+                self.completed[h] = translated
+            self._write({'h': h, 't': translated})
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def discard(self):
+        """Close and delete the journal once the output has been saved"""
+        self.close()
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
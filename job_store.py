@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Job Store - تخزين مهام الواجهة البرمجية وجدولتها
+Content-addressed output cache and per-client fair queue behind the job API
+"""
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Dict, Optional
+
+OUTPUT_CACHE_DIR = Path(
+    os.environ.get(
+        'SUBTITLE_OUTPUT_CACHE',
+        Path.home() / '.cache' / 'subtitle_translator' / 'outputs'
+    )
+)
+DEFAULT_CACHE_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_CACHE_TTL = 30 * 24 * 3600  # seconds
+# Refresh a hit's timestamp at most this often, and evict after this many writes
+CACHE_TOUCH_INTERVAL = 3600  # seconds
+CACHE_EVICT_EVERY = 100
+
+
+class OutputCache:
+    """Translated files stored by job_api.cache_key, one file per key
+
+    Bounded like the translation memory: files older than ttl are dropped,
+    then the least recently used ones until the total fits max_bytes.
+    """
+
+    def __init__(
+        self,
+        root: Path = OUTPUT_CACHE_DIR,
+        max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        ttl: Optional[float] = DEFAULT_CACHE_TTL
+    ):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def path(self, key: str, suffix: str) -> Path:
+        return self.root / key[:2] / f"{key}{suffix}"
+
+    def get(self, key: str, suffix: str) -> Optional[Path]:
+        path = self.path(key, suffix)
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        now = time.time()
+        # The modification time is when the output was stored, the access time when it was last used
+        if self.ttl and now - stat.st_mtime > self.ttl:
+            return None
+        if now - stat.st_atime > CACHE_TOUCH_INTERVAL:
+            os.utime(path, (now, stat.st_mtime))
+        return path
+
+    def put(self, key: str, suffix: str, source: Path) -> Path:
+        """Move a finished output into the cache"""
+        path = self.path(key, suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        shutil.move(str(source), tmp)
+        os.replace(tmp, path)
+        with self._lock:
+            self._writes += 1
+            due = self._writes >= CACHE_EVICT_EVERY
+            if due:
+                self._writes = 0
+        if due:
+            self.evict()
+        return path
+
+    def evict(self) -> int:
+        """Drop expired files and trim the cache to max_bytes (LRU)"""
+        now = time.time()
+        files = []
+        removed = 0
+        for path in self.root.glob('*/*'):
+            try:
+                stat = path.stat()
+                if self.ttl and now - stat.st_mtime > self.ttl:
+                    path.unlink()
+                    removed += 1
+                else:
+                    files.append((stat.st_atime, stat.st_size, path))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+class FairQueue:
+    """One FIFO per client, served round-robin by the workers"""
+
+    def __init__(self):
+        self._queues: Dict[str, deque] = {}
+        self._order: deque = deque()
+        self._cond = threading.Condition()
+
+    def put(self, client: str, item):
+        with self._cond:
+            if client not in self._queues:
+                self._queues[client] = deque()
+                self._order.append(client)
+            self._queues[client].append(item)
+            self._cond.notify()
+
+    def get(self):
+        """Block until a job is queued and return the next client's oldest"""
+        with self._cond:
+            while not self._order:
+                self._cond.wait()
+            client = self._order.popleft()
+            queue = self._queues[client]
+            item = queue.popleft()
+            if queue:
+                self._order.append(client)
+            else:
+                del self._queues[client]
+            return item
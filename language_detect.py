@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Language Detect - كشف لغة المصدر
+One-time, local source language detection and per-line script routing
+
+With source 'auto' every provider request used to detect the language on
+its own, so mixed files (Japanese dialogue with English signs) were
+translated inconsistently. The file's language is now fixed once from a
+sample of its lines, and lines written in another script are routed to
+their own language pair.
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+from line_filter import language_script, line_script, plain_text
+
+# Lines sampled, evenly spread over the file, to fix its source language
+DETECT_SAMPLE = 300
+
+# Scripts written in a single language among those we translate
+SCRIPT_LANGUAGES = {
+    'japanese': 'ja', 'korean': 'ko', 'thai': 'th',
+    'greek': 'el', 'hebrew': 'iw', 'devanagari': 'hi',
+}
+
+# Frequent function words of languages sharing a script
+STOPWORDS = {
+    'en': 'the and you is to of it that what this are was not for have with my me your do',
+    'fr': 'le la les et est vous je tu pas que un une des du ce il mais pour nous avec',
+    'de': 'der die das und ist nicht ich du sie es ein eine zu was wir mit den auf ja',
+    'es': 'el los las y es que no en un una por qué yo tú pero está con lo del muy',
+    'it': 'il che è non di un una sono per mi ti io ma con cosa questo ho gli della',
+    'pt': 'o os que é não um uma você eu em para com isso mas está do da se muito',
+    'tr': 'bir ve bu ne da de için ben sen değil mi çok ama var yok şey gibi evet',
+    'id': 'yang dan ini itu tidak aku kamu saya apa di ke dari ada akan dengan untuk',
+    'vi': 'không là và của tôi bạn có này một được những cho anh em với đã người gì',
+    'nl': 'de het een en is niet ik je dat van wat we zijn op te maar hij met die',
+    'ru': 'и в не что я ты он на это с как мы но вы так да нет она все был',
+    'uk': 'і в не що я ти він на це з як ми але ви так ні вона все є був',
+    'ar': 'في من على أن هذا ما لا إلى هل أنا أنت هو كان لقد مع عن ذلك هذه لم يا',
+    'fa': 'و در به از که این را با است من تو او چه نه آن برای یک ما شما هم',
+}
+_STOPWORDS = {lang: set(words.split()) for lang, words in STOPWORDS.items()}
+
+# Frequent characters written differently in Simplified and Traditional
+# Chinese; Han text tells the two apart only through characters like these
+HAN_VARIANTS = {
+    'zh-CN': '这们个来说为会对时么国后过还见里吗边话让给问开关长门东车马书学习认识谢请爱经实现发电听觉应该样写从点头买卖钱办没几机无进动间题',
+    'zh-TW': '這們個來說為會對時麼國後過還見裡嗎邊話讓給問開關長門東車馬書學習認識謝請愛經實現發電聽覺應該樣寫從點頭買賣錢辦沒幾機無進動間題',
+}
+_HAN_VARIANTS = {lang: set(chars) for lang, chars in HAN_VARIANTS.items()}
+
+# The best language needs this many stopword hits and this lead over the next
+MIN_WORD_HITS = 3
+MIN_LEAD = 1.5
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def detect_language(texts: Sequence[str]) -> str:
+    """Return the language most of texts are written in, or 'auto' if unsure"""
+    scripts = Counter(script for script in (line_script(plain_text(text)) for text in texts) if script)
+    if not scripts:
+        return 'auto'
+    script = scripts.most_common(1)[0][0]
+    if script in SCRIPT_LANGUAGES:
+        return SCRIPT_LANGUAGES[script]
+
+    hits = Counter()
+    if script == 'han':
+        # Simplified or Traditional: count the characters only one of them uses
+        for text in texts:
+            for char in plain_text(text):
+                for lang, chars in _HAN_VARIANTS.items():
+                    if char in chars:
+                        hits[lang] += 1
+    else:
+        # Shared scripts (Latin, Cyrillic, Arabic): count function words
+        candidates = [lang for lang in _STOPWORDS if language_script(lang) == script]
+        for text in texts:
+            for word in WORD_PATTERN.findall(plain_text(text).lower()):
+                for lang in candidates:
+                    if word in _STOPWORDS[lang]:
+                        hits[lang] += 1
+    ranked = hits.most_common(2)
+    if not ranked or ranked[0][1] < MIN_WORD_HITS:
+        return 'auto'
+    if len(ranked) > 1 and ranked[0][1] < ranked[1][1] * MIN_LEAD:
+        return 'auto'
+    return ranked[0][0]
+
+
+def detect_source(texts: Sequence[str], sample: int = DETECT_SAMPLE) -> str:
+    """Detect a file's source language from an even sample of its lines"""
+    step = max(1, len(texts) // max(1, sample))
+    return detect_language(texts[::step])
+
+
+def line_sources(
+    texts: Sequence[str],
+    source_lang: str = 'auto',
+    file_source: Optional[str] = None
+) -> List[str]:
+    """
+    Return the source language to translate every line from
+
+    A given source_lang applies to every line. With 'auto', the file's
+    language (file_source, detected from texts if not given) applies to
+    lines in its script and to mixed or letterless lines; lines in any
+    other script are grouped by script and each group is detected on its own.
+    """
+    if source_lang != 'auto':
+        return [source_lang] * len(texts)
+    if file_source is None:
+        file_source = detect_source(texts)
+
+    scripts = [line_script(plain_text(text)) for text in texts]
+    main_script = language_script(file_source)
+    if main_script is None:
+        main_script = Counter(script for script in scripts if script).most_common(1)[0][0] if any(scripts) else None
+    if main_script in ('japanese', 'korean'):
+        # Kana-less Japanese and hanja-only Korean lines are all Han characters
+        main_scripts = {main_script, 'han'}
+    else:
+        main_scripts = {main_script}
+
+    groups: Dict[str, List[int]] = {}
+    for idx, script in enumerate(scripts):
+        if script is not None and script not in main_scripts:
+            groups.setdefault(script, []).append(idx)
+
+    sources = [file_source] * len(texts)
+    for indices in groups.values():
+        lang = detect_language([texts[idx] for idx in indices])
+        for idx in indices:
+            sources[idx] = lang
+    return sources
+
+
+def group_by_source(indices: Sequence[int], sources: Sequence[str], target: str) -> Dict[str, List[int]]:
+    """Split line indices into one batch per source language
+
+    Lines already in the target language are left out: they stay unchanged.
+    Lines whose language could not be told apart from the target's by
+    script alone are detected as 'auto' and kept.
+    """
+    groups: Dict[str, List[int]] = {}
+    for idx in indices:
+        if sources[idx] != target:
+            groups.setdefault(sources[idx], []).append(idx)
+    return groups
+
+
+def describe_sources(sources: Sequence[str]) -> str:
+    """Format line counts per source language for console and UI messages"""
+    counts = Counter(sources)
+    return '، '.join(
+        f"{'تلقائي' if lang == 'auto' else lang}: {count}"
+        for lang, count in counts.most_common()
+    )
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Line Filter - تصفية الأسطر غير القابلة للترجمة
+Pre-flight classifier that keeps untranslatable events away from providers
+"""
+
+import fnmatch
+import re
+from bisect import bisect_right
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ass_text import TOKEN_PATTERN
+
+# Typesetting, opening/ending and karaoke styles are left as they are
+DEFAULT_EXCLUDE_STYLES = (
+    'sign*', 'op', 'op[0-9 _-]*', 'ed', 'ed[0-9 _-]*', 'opening*', 'ending*',
+    '*kara*', 'song*', 'lyrics*', 'typeset*', 'ts', 'ts[0-9 _-]*',
+)
+# Music notes mark sung lines
+DEFAULT_DENYLIST = (r'[♪♫]',)
+
+# A line counts as written in one script when at least this share of its letters is
+SCRIPT_RATIO = 0.9
+
+# Sorted (first code point, last code point, script) ranges
+SCRIPT_RANGES = sorted([
+    (0x0041, 0x005A, 'latin'), (0x0061, 0x007A, 'latin'),
+    (0x00C0, 0x024F, 'latin'), (0x1E00, 0x1EFF, 'latin'),
+    (0x0370, 0x03FF, 'greek'),
+    (0x0400, 0x052F, 'cyrillic'),
+    (0x0590, 0x05FF, 'hebrew'),
+    (0x0600, 0x06FF, 'arabic'), (0x0750, 0x077F, 'arabic'),
+    (0x08A0, 0x08FF, 'arabic'), (0xFB50, 0xFDFF, 'arabic'), (0xFE70, 0xFEFF, 'arabic'),
+    (0x0900, 0x097F, 'devanagari'),
+    (0x0E00, 0x0E7F, 'thai'),
+    (0x1100, 0x11FF, 'hangul'), (0x3130, 0x318F, 'hangul'), (0xAC00, 0xD7AF, 'hangul'),
+    (0x3040, 0x30FF, 'kana'), (0x31F0, 0x31FF, 'kana'), (0xFF66, 0xFF9F, 'kana'),
+    (0x3400, 0x4DBF, 'han'), (0x4E00, 0x9FFF, 'han'), (0xF900, 0xFAFF, 'han'),
+])
+_RANGE_STARTS = [start for start, _, _ in SCRIPT_RANGES]
+# Scripts whose lines may consist of Han characters alone
+CJK_HAN_SCRIPTS = {'japanese', 'korean'}
+
+# Script each language is written in
+LANGUAGE_SCRIPTS = {
+    'ar': 'arabic', 'fa': 'arabic', 'ur': 'arabic',
+    'ru': 'cyrillic', 'uk': 'cyrillic', 'bg': 'cyrillic', 'sr': 'cyrillic',
+    'el': 'greek', 'he': 'hebrew', 'iw': 'hebrew',
+    'hi': 'devanagari', 'mr': 'devanagari', 'ne': 'devanagari',
+    'th': 'thai', 'ja': 'japanese', 'ko': 'korean',
+    'zh-CN': 'han', 'zh-TW': 'han', 'zh': 'han',
+    'en': 'latin', 'fr': 'latin', 'de': 'latin', 'es': 'latin', 'it': 'latin',
+    'pt': 'latin', 'tr': 'latin', 'vi': 'latin', 'id': 'latin', 'ms': 'latin',
+    'nl': 'latin', 'pl': 'latin', 'sv': 'latin', 'ro': 'latin', 'cs': 'latin',
+}
+
+# Reasons reported for skipped lines
+REASON_STYLE = 'style'
+REASON_DENYLIST = 'denylist'
+REASON_NO_LETTERS = 'no_letters'
+REASON_TARGET_SCRIPT = 'target_script'
+
+
+def char_script(ch: str) -> Optional[str]:
+    """Return the script a letter belongs to, or None for anything else"""
+    code = ord(ch)
+    idx = bisect_right(_RANGE_STARTS, code) - 1
+    if idx >= 0:
+        start, end, script = SCRIPT_RANGES[idx]
+        if code <= end:
+            return script
+    return 'other' if ch.isalpha() else None
+
+
+def plain_text(text: str) -> str:
+    """Strip override blocks and line breaks from an event's text"""
+    return TOKEN_PATTERN.sub(' ', text)
+
+
+def line_script(text: str) -> Optional[str]:
+    """Return the script a line is written in, or None if mixed or letterless
+
+    Kana marks Japanese and hangul marks Korean, so their Han characters are
+    counted with them.
+    """
+    counts = Counter(script for script in map(char_script, text) if script)
+    letters = sum(counts.values())
+    if not letters:
+        return None
+    if counts['kana']:
+        counts['japanese'] = counts.pop('kana') + counts.pop('han', 0)
+    elif counts['hangul']:
+        counts['korean'] = counts.pop('hangul') + counts.pop('han', 0)
+    script, count = counts.most_common(1)[0]
+    return script if count / letters >= SCRIPT_RATIO else None
+
+
+def language_script(lang: Optional[str]) -> Optional[str]:
+    """Return the script a language code is written in, if known"""
+    if not lang or lang == 'auto':
+        return None
+    return LANGUAGE_SCRIPTS.get(lang) or LANGUAGE_SCRIPTS.get(lang.split('-')[0].lower())
+
+
+class LineFilter:
+    """Style rules, a regex denylist and script detection for events
+
+    include_styles, when given, limits translation to matching styles.
+    Otherwise styles matching exclude_styles are skipped. Style patterns are
+    case-insensitive shell wildcards.
+    """
+
+    def __init__(
+        self,
+        include_styles: Optional[Sequence[str]] = None,
+        exclude_styles: Sequence[str] = DEFAULT_EXCLUDE_STYLES,
+        denylist: Sequence[str] = DEFAULT_DENYLIST,
+        skip_target_script: bool = True
+    ):
+        self.include_styles = [p.lower() for p in include_styles or []]
+        self.exclude_styles = [p.lower() for p in exclude_styles or []]
+        self.denylist = [re.compile(p) for p in denylist or []]
+        self.skip_target_script = skip_target_script
+
+    def _style_skipped(self, style: str) -> bool:
+        style = (style or '').lower()
+        if self.include_styles:
+            return not any(fnmatch.fnmatchcase(style, p) for p in self.include_styles)
+        return any(fnmatch.fnmatchcase(style, p) for p in self.exclude_styles)
+
+    def classify(
+        self,
+        events: Iterable,
+        target_lang: str,
+        source_lang: str = 'auto'
+    ) -> List[Optional[str]]:
+        """Return a skip reason for every event, or None if it should be translated"""
+        reasons: List[Optional[str]] = []
+        scripts: List[Optional[str]] = []
+        for event in events:
+            text = plain_text(event.text)
+            script = None
+            if self._style_skipped(event.style):
+                reason = REASON_STYLE
+            elif any(pattern.search(text) for pattern in self.denylist):
+                reason = REASON_DENYLIST
+            elif not any(ch.isalpha() for ch in text):
+                reason = REASON_NO_LETTERS
+            else:
+                reason = None
+                script = line_script(text)
+            reasons.append(reason)
+            scripts.append(script)
+
+        target_script = language_script(target_lang)
+        if not self.skip_target_script or target_script is None:
+            return reasons
+
+        # With auto-detection the file's most common script stands for the source
+        common = Counter(script for script in scripts if script).most_common(1)
+        file_script = common[0][0] if common else None
+        source_script = language_script(source_lang) or file_script
+
+        # Lines already in the target script only make sense to skip when the
+        # source is written in another script (en -> fr must translate Latin)
+        if source_script == target_script:
+            return reasons
+        # Kanji-only Japanese and hanja-only Korean lines are Han too, but not Chinese
+        if target_script == 'han' and {source_script, file_script} & CJK_HAN_SCRIPTS:
+            return reasons
+        return [
+            REASON_TARGET_SCRIPT if reason is None and script == target_script else reason
+            for reason, script in zip(reasons, scripts)
+        ]
+
+    def split(
+        self,
+        events: Sequence,
+        target_lang: str,
+        source_lang: str = 'auto'
+    ) -> Tuple[List, Dict[str, int]]:
+        """Return the events to translate and the skipped count per reason"""
+        kept = []
+        skipped: Dict[str, int] = {}
+        for event, reason in zip(events, self.classify(events, target_lang, source_lang)):
+            if reason is None:
+                kept.append(event)
+            else:
+                skipped[reason] = skipped.get(reason, 0) + 1
+        return kept, skipped
+
+
+def describe_skipped(skipped: Dict[str, int]) -> str:
+    """Format skipped counts per reason for console and UI messages"""
+    labels = {
+        REASON_STYLE: 'أنماط مستثناة',
+        REASON_DENYLIST: 'قائمة الحظر',
+        REASON_NO_LETTERS: 'بلا حروف',
+        REASON_TARGET_SCRIPT: 'بلغة الهدف',
+    }
+    return '، '.join(f"{labels.get(reason, reason)}: {count}" for reason, count in skipped.items())
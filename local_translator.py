@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Local Translator - الترجمة المحلية دون إنترنت
+Batched CPU inference with a local machine-translation model
+"""
+
+import os
+import threading
+from functools import lru_cache
+from typing import List, Optional
+
+# Any seq2seq translation model from the Hugging Face hub or a local directory;
+# NLLB covers every language pair with one model
+DEFAULT_LOCAL_MODEL = os.environ.get('LOCAL_MT_MODEL') or 'facebook/nllb-200-distilled-600M'
+
+# OpenAI-compatible local server (llama.cpp, vLLM, Ollama...), used instead of
+# an in-process model when set
+LOCAL_URL = os.environ.get('LOCAL_MT_URL')
+
+# Subtitle lines per inference call, and batches in flight
+LOCAL_BATCH_SIZE = 32
+LOCAL_WORKERS = 2
+
+# Subtitle lines are short; longer inputs are truncated
+MAX_INPUT_TOKENS = 256
+BEAM_SIZE = 2
+
+# NLLB / FLORES-200 codes of the languages offered by the CLI and web UI
+NLLB_CODES = {
+    'ar': 'arb_Arab', 'en': 'eng_Latn', 'ja': 'jpn_Jpan', 'ko': 'kor_Hang',
+    'zh-CN': 'zho_Hans', 'zh-TW': 'zho_Hant', 'fr': 'fra_Latn', 'de': 'deu_Latn',
+    'es': 'spa_Latn', 'it': 'ita_Latn', 'pt': 'por_Latn', 'ru': 'rus_Cyrl',
+    'tr': 'tur_Latn', 'hi': 'hin_Deva', 'th': 'tha_Thai', 'vi': 'vie_Latn',
+    'id': 'ind_Latn', 'ms': 'zsm_Latn', 'fa': 'pes_Arab', 'uk': 'ukr_Cyrl',
+    'he': 'heb_Hebr', 'nl': 'nld_Latn', 'pl': 'pol_Latn', 'sv': 'swe_Latn',
+    'el': 'ell_Grek', 'iw': 'heb_Hebr',  # Google's code for Hebrew, as detected
+}
+
+
+class LocalModel:
+    """A translation model loaded once and shared by all workers
+
+    Converted CTranslate2 models (a directory with model.bin) run with
+    int8 weights and one inference thread pool per batch in flight;
+    anything else runs through transformers with torch using every core.
+    """
+
+    def __init__(self, model: str = DEFAULT_LOCAL_MODEL, workers: int = LOCAL_WORKERS):
+        self.name = model
+        workers = max(1, int(workers))
+        cores = os.cpu_count() or 1
+        try:
+            from transformers import AutoTokenizer
+        except ImportError:
+            raise Exception("مكتبة transformers غير مثبتة. قم بتثبيتها: pip install transformers sentencepiece")
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model)
+        self.multilingual = 'Nllb' in type(self.tokenizer).__name__
+        # Tokenizers keep the source language as state: one batch at a time
+        self._lock = threading.Lock()
+
+        if os.path.isfile(os.path.join(model, 'model.bin')):
+            try:
+                import ctranslate2
+            except ImportError:
+                raise Exception("مكتبة ctranslate2 غير مثبتة. قم بتثبيتها: pip install ctranslate2")
+            self.translator = ctranslate2.Translator(
+                model,
+                device='cpu',
+                compute_type='int8',
+                inter_threads=workers,
+                intra_threads=max(1, cores // workers)
+            )
+            self.model = None
+        else:
+            try:
+                import torch
+                from transformers import AutoModelForSeq2SeqLM
+            except ImportError:
+                raise Exception("مكتبة torch غير مثبتة. قم بتثبيتها: pip install torch")
+            torch.set_num_threads(cores)
+            self.translator = None
+            self.model = AutoModelForSeq2SeqLM.from_pretrained(model).eval()
+
+    def language_code(self, lang: str) -> Optional[str]:
+        """Map a language code to the model's code (None for pair-specific models)"""
+        if not self.multilingual:
+            return None
+        if lang == 'auto':
+            raise Exception("النموذج المحلي يحتاج لغة المصدر، حددها باستخدام -s")
+        if lang in NLLB_CODES.values():
+            return lang
+        if lang not in NLLB_CODES:
+            raise Exception(f"لغة غير مدعومة في النموذج المحلي: {lang}")
+        return NLLB_CODES[lang]
+
+    def translate_lines(self, lines: List[str], source: str, target: str) -> List[str]:
+        """Translate a batch of lines in one inference call"""
+        source_code = self.language_code(source)
+        target_code = self.language_code(target)
+        if self.translator is not None:
+            return self._translate_ctranslate2(lines, source_code, target_code)
+        return self._translate_transformers(lines, source_code, target_code)
+
+    def _translate_ctranslate2(self, lines, source_code, target_code) -> List[str]:
+        with self._lock:
+            if source_code:
+                self.tokenizer.src_lang = source_code
+            batch = [
+                self.tokenizer.convert_ids_to_tokens(
+                    self.tokenizer.encode(line, truncation=True, max_length=MAX_INPUT_TOKENS)
+                )
+                for line in lines
+            ]
+        # Runs outside the lock: ctranslate2 spreads concurrent batches over its threads
+        results = self.translator.translate_batch(
+            batch,
+            target_prefix=[[target_code]] * len(batch) if target_code else None,
+            beam_size=BEAM_SIZE,
+            max_decoding_length=MAX_INPUT_TOKENS
+        )
+        skip = 1 if target_code else 0
+        return [
+            self.tokenizer.decode(
+                self.tokenizer.convert_tokens_to_ids(result.hypotheses[0][skip:]),
+                skip_special_tokens=True
+            )
+            for result in results
+        ]
+
+    def _translate_transformers(self, lines, source_code, target_code) -> List[str]:
+        import torch
+
+        with self._lock, torch.inference_mode():
+            if source_code:
+                self.tokenizer.src_lang = source_code
+            inputs = self.tokenizer(
+                lines, return_tensors='pt', padding=True, truncation=True, max_length=MAX_INPUT_TOKENS
+            )
+            options = {}
+            if target_code:
+                options['forced_bos_token_id'] = self.tokenizer.convert_tokens_to_ids(target_code)
+            generated = self.model.generate(
+                **inputs, num_beams=BEAM_SIZE, max_new_tokens=MAX_INPUT_TOKENS, **options
+            )
+            return self.tokenizer.batch_decode(generated, skip_special_tokens=True)
+
+
+@lru_cache(maxsize=2)
+def load_model(model: str = DEFAULT_LOCAL_MODEL, workers: int = LOCAL_WORKERS) -> LocalModel:
+    """Return the process-wide instance of a local model, loading it on first use"""
+    return LocalModel(model, workers)
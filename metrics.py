@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Metrics - مقاييس الأداء
+Counters, latency histograms and stage timings shared by the CLI and the web app
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+# Upper bounds in seconds, for provider requests and pipeline stages alike
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Environment variable that enables the Prometheus endpoint of the web app
+METRICS_PORT_ENV = 'SUBTITLE_METRICS_PORT'
+
+PREFIX = 'subtitle_'
+
+SeriesKey = Tuple[str, str]
+
+
+def _labels(labels: dict) -> str:
+    return ','.join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+
+
+def _series(name: str, labels: str) -> str:
+    return f"{name}{{{labels}}}" if labels else name
+
+
+def _split_series(series: str) -> SeriesKey:
+    name, _, labels = series.partition('{')
+    return name, labels.rstrip('}')
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile as the upper bound of the bucket it falls in, if any"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= rank:
+                return bound
+        # Beyond the last bucket
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'buckets': {str(bound): count for bound, count in zip(self.buckets, self.counts)},
+        }
+
+    def merge_dict(self, data: dict):
+        self.count += data['count']
+        self.sum += data['sum']
+        for idx, bound in enumerate(self.buckets):
+            self.counts[idx] += data['buckets'].get(str(bound), 0)
+
+
+class Metrics:
+    """Thread-safe registry of counters and histograms
+
+    Every process has its own registry (see get_metrics); bulk workers send
+    their snapshots back to the parent, which merges them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[SeriesKey, float] = {}
+        self.histograms: Dict[SeriesKey, Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Add value to a counter"""
+        key = (PREFIX + name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one value, e.g. a latency in seconds, in a histogram"""
+        key = (PREFIX + name, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a pipeline stage"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - started, stage=name)
+
+    def snapshot(self) -> dict:
+        """Return all series as a JSON-serializable dict"""
+        with self._lock:
+            return {
+                'counters': {
+                    _series(name, labels): round(value, 6)
+                    for (name, labels), value in sorted(self.counters.items())
+                },
+                'histograms': {
+                    _series(name, labels): histogram.to_dict()
+                    for (name, labels), histogram in sorted(self.histograms.items())
+                },
+            }
+
+    def merge(self, snapshot: dict):
+        """Add a snapshot taken in another process"""
+        with self._lock:
+            for series, value in snapshot.get('counters', {}).items():
+                key = _split_series(series)
+                self.counters[key] = self.counters.get(key, 0) + value
+            for series, data in snapshot.get('histograms', {}).items():
+                key = _split_series(series)
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram()
+                histogram.merge_dict(data)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render_prometheus(self) -> str:
+        """Render all series in the Prometheus text exposition format"""
+        lines = []
+        typed = set()
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} counter")
+                lines.append(f"{_series(name, labels)} {value:g}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} histogram")
+                sep = ',' if labels else ''
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'{name}_bucket{{{labels}{sep}le="{bound:g}"}} {count}')
+                lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {histogram.count}')
+                lines.append(f"{_series(name + '_sum', labels)} {histogram.sum:g}")
+                lines.append(f"{_series(name + '_count', labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+
+def snapshot_delta(after: dict, before: dict) -> dict:
+    """Return what was recorded between two snapshots of the same registry"""
+    counters = {
+        series: round(value - before['counters'].get(series, 0), 6)
+        for series, value in after['counters'].items()
+        if value != before['counters'].get(series, 0)
+    }
+    histograms = {}
+    for series, data in after['histograms'].items():
+        old = before['histograms'].get(series)
+        if old is None:
+            histograms[series] = data
+        elif data['count'] != old['count']:
+            histograms[series] = {
+                'count': data['count'] - old['count'],
+                'sum': round(data['sum'] - old['sum'], 6),
+                'buckets': {
+                    bound: count - old['buckets'].get(bound, 0)
+                    for bound, count in data['buckets'].items()
+                },
+            }
+    return {'counters': counters, 'histograms': histograms}
+
+
+def summarize(snapshot: dict) -> dict:
+    """Condense a snapshot into per-provider and per-stage figures"""
+    counters = snapshot.get('counters', {})
+    summary = {'providers': {}, 'stages': {}, 'cache': {}, 'limiter': {}}
+
+    def labels_of(series: str) -> dict:
+        _, labels = _split_series(series)
+        return dict(part.split('=', 1) for part in labels.split(',') if part) if labels else {}
+
+    for series, value in counters.items():
+        name, _ = _split_series(series)
+        labels = {k: v.strip('"') for k, v in labels_of(series).items()}
+        if name == PREFIX + 'cache_lookups_total':
+            summary['cache'][labels.get('result')] = int(value)
+            continue
+        if name in (PREFIX + 'rate_decreases_total', PREFIX + 'breaker_trips_total'):
+            summary['limiter'][name[len(PREFIX):].replace('_total', '')] = int(value)
+            continue
+        provider = labels.get('provider')
+        if provider is None:
+            continue
+        entry = summary['providers'].setdefault(provider, {})
+        short = name[len(PREFIX):].replace('_total', '')
+        if 'outcome' in labels:
+            short = f"{short}_{labels['outcome']}"
+        entry[short] = entry.get(short, 0) + value
+
+    for series, data in snapshot.get('histograms', {}).items():
+        name, _ = _split_series(series)
+        labels = {k: v.strip('"') for k, v in labels_of(series).items()}
+        histogram = Histogram()
+        histogram.merge_dict(data)
+        if name == PREFIX + 'stage_seconds':
+            summary['stages'][labels.get('stage')] = round(histogram.sum, 3)
+        elif name == PREFIX + 'request_seconds':
+            entry = summary['providers'].setdefault(labels.get('provider'), {})
+            entry['latency_avg'] = round(histogram.sum / histogram.count, 3) if histogram.count else None
+            entry['latency_p50'] = histogram.quantile(0.5)
+            entry['latency_p95'] = histogram.quantile(0.95)
+
+    hits = summary['cache'].get('hit', 0) + summary['cache'].get('fuzzy', 0)
+    lookups = hits + summary['cache'].get('miss', 0)
+    summary['cache']['hit_rate'] = round(hits / lookups, 3) if lookups else None
+    return summary
+
+
+def format_summary(snapshot: dict) -> str:
+    """Format a snapshot as the metrics panel shown in the web UI"""
+    summary = summarize(snapshot)
+    lines = []
+    for provider, entry in sorted(summary['providers'].items()):
+        requests = int(sum(v for k, v in entry.items() if k.startswith('requests_')))
+        line = f"🔌 {provider}: {requests} طلب"
+        if entry.get('latency_avg') is not None:
+            line += f"، متوسط {entry['latency_avg']} ث"
+        if entry.get('latency_p95') is not None:
+            line += f"، p95 ≤ {entry['latency_p95']:g} ث"
+        lines.append(line)
+        extras = []
+        if entry.get('retries'):
+            extras.append(f"إعادات: {int(entry['retries'])}")
+        if entry.get('requests_throttled'):
+            extras.append(f"429: {int(entry['requests_throttled'])}")
+        if entry.get('requests_error'):
+            extras.append(f"أخطاء: {int(entry['requests_error'])}")
+        if entry.get('chars_sent'):
+            extras.append(f"أحرف: {int(entry['chars_sent'])}")
+        if entry.get('tokens_sent'):
+            extras.append(f"رموز: {int(entry['tokens_sent'])}")
+        if entry.get('tokens_saved'):
+            extras.append(f"رموز موفرة: {int(entry['tokens_saved'])}")
+        if entry.get('wait_seconds', 0) >= 0.05:
+            extras.append(f"انتظار المعدل: {entry['wait_seconds']:.1f} ث")
+        if entry.get('backoff_seconds', 0) >= 0.05:
+            extras.append(f"تراجع بعد الفشل: {entry['backoff_seconds']:.1f} ث")
+        if extras:
+            lines.append('   ' + '، '.join(extras))
+    if summary['limiter']:
+        lines.append(
+            f"🚦 تخفيض المعدل: {summary['limiter'].get('rate_decreases', 0)}، "
+            f"إيقاف مؤقت للمزود: {summary['limiter'].get('breaker_trips', 0)}"
+        )
+    if summary['cache'].get('hit_rate') is not None:
+        lines.append(
+            f"💾 ذاكرة الترجمة: {summary['cache'].get('hit', 0)} إصابة، "
+            f"{summary['cache'].get('fuzzy', 0)} تقريبية، "
+            f"{summary['cache'].get('miss', 0)} إخفاق ({summary['cache']['hit_rate']:.0%})"
+        )
+    if summary['stages']:
+        lines.append('⏱️ ' + '، '.join(f"{stage}: {seconds} ث" for stage, seconds in summary['stages'].items()))
+    return '\n'.join(lines)
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """Return the registry of this process"""
+    return _metrics
+
+
+def start_metrics_server(port: int, host: str = '0.0.0.0', metrics: Optional[Metrics] = None):
+    """Serve /metrics in the Prometheus text format from a background thread"""
+    registry = metrics or get_metrics()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip('/') != '/metrics':
+                self.send_error(404)
+                return
+            data = registry.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
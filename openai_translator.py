@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+OpenAI Translator - الترجمة عبر OpenAI
+Token-budgeted batching with detection and recovery of misaligned results
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+from metrics import get_metrics
+from rate_limiter import backoff_delay, get_rate_limiter
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Estimated source tokens per request. Translations are usually longer than
+# the source (Arabic roughly 1.5-2x), so this keeps the completion well under
+# the model's output limit while still packing many lines per call.
+DEFAULT_TOKEN_BUDGET = 2000
+MAX_LINES_PER_REQUEST = 100
+# JSON key, quotes and separators added around every line
+LINE_OVERHEAD_TOKENS = 4
+
+# Batches in flight and per-minute budgets (OpenAI tier-1 limits for gpt-4o-mini)
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RPM = 500
+DEFAULT_TPM = 200_000
+# Completion tokens are budgeted as this multiple of the prompt estimate
+COMPLETION_RATIO = 1.0
+
+# Attempts per batch; the delay between them comes from backoff_delay()
+MAX_RETRIES = 3
+
+LANG_NAMES = {
+    'ar': 'Arabic', 'en': 'English', 'ja': 'Japanese', 'ko': 'Korean',
+    'zh-CN': 'Simplified Chinese', 'zh-TW': 'Traditional Chinese',
+    'fr': 'French', 'de': 'German', 'es': 'Spanish', 'it': 'Italian',
+    'pt': 'Portuguese', 'ru': 'Russian', 'tr': 'Turkish', 'hi': 'Hindi',
+    'th': 'Thai', 'vi': 'Vietnamese', 'id': 'Indonesian', 'fa': 'Persian',
+    'ms': 'Malay',
+}
+
+SYSTEM_PROMPT = (
+    "You are a professional subtitle translator. Translate the subtitles to {target}{source}. "
+    "The input is a JSON object mapping line numbers to subtitle lines. "
+    "Return a JSON object with exactly the same keys, each mapped to its translation. "
+    "Never merge, split, skip or reorder lines. "
+    "Keep every marker like ⟦0⟧ exactly once, next to the words it belongs to."
+)
+
+
+class RequestBudget:
+    """Requests-per-minute and tokens-per-minute budget shared by all workers"""
+
+    WINDOW = 60.0  # seconds
+
+    def __init__(self, rpm: Optional[int] = DEFAULT_RPM, tpm: Optional[int] = DEFAULT_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._lock = threading.Lock()
+        self._sent = deque()  # (timestamp, tokens)
+        self._tokens = 0
+
+    def acquire(self, tokens: int) -> float:
+        """Block until a request of the given size fits in the budget; return the seconds waited"""
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._sent and now - self._sent[0][0] >= self.WINDOW:
+                    self._tokens -= self._sent.popleft()[1]
+
+                rpm_ok = not self.rpm or len(self._sent) < self.rpm
+                # A single oversized request is let through once the window is empty
+                tpm_ok = not self.tpm or not self._sent or self._tokens + tokens <= self.tpm
+                if rpm_ok and tpm_ok:
+                    self._sent.append((now, tokens))
+                    self._tokens += tokens
+                    return now - started
+                wait = self._sent[0][0] + self.WINDOW - now
+            time.sleep(min(max(wait, 0.05), 1.0))
+
+
+@lru_cache(maxsize=8)
+def get_client(api_key: str, base_url: Optional[str] = None, pool_size: int = DEFAULT_CONCURRENCY):
+    """Return a long-lived OpenAI client shared by all calls with these credentials
+
+    Its keep-alive pool holds one connection per batch in flight, so TLS
+    sessions are reused instead of renegotiated for every request.
+    """
+    try:
+        import httpx
+        from openai import DefaultHttpxClient, OpenAI
+    except ImportError:
+        raise Exception("مكتبة openai غير مثبتة. قم بتثبيتها: pip install openai")
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    # Retries are ours: 429s must reach the shared rate limiter, not be retried silently
+    return OpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        max_retries=0,
+        http_client=DefaultHttpxClient(limits=limits)
+    )
+
+
+@lru_cache(maxsize=1)
+def _get_encoder():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # tiktoken missing or its vocabulary cannot be downloaded
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in text"""
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    # ~4 Latin characters per token, about one token per non-Latin character
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def pack_by_tokens(
+    texts: List[str],
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    max_lines: int = MAX_LINES_PER_REQUEST
+) -> List[List[int]]:
+    """Group text indices into batches that fit the token budget"""
+    batches = []
+    current = []
+    used = 0
+    for idx, text in enumerate(texts):
+        cost = estimate_tokens(text) + LINE_OVERHEAD_TOKENS
+        if current and (len(current) >= max_lines or used + cost > token_budget):
+            batches.append(current)
+            current = []
+            used = 0
+        current.append(idx)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_messages(lines: Dict[int, str], source_lang: str, target_lang: str) -> list:
+    """Build the chat messages for one numbered batch"""
+    source = '' if source_lang == 'auto' else f" from {LANG_NAMES.get(source_lang, source_lang)}"
+    # Short per-batch keys (1, 2, ...) instead of global line numbers
+    payload = {str(number): text for number, text in enumerate(lines.values(), 1)}
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT.format(
+                target=LANG_NAMES.get(target_lang, target_lang), source=source
+            )
+        },
+        {
+            "role": "user",
+            "content": json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+        }
+    ]
+
+
+def parse_response(content: str, expected: List[int]) -> Dict[int, str]:
+    """Return the translations of a batch, keyed by the line numbers in expected
+
+    The response uses the batch's own keys, 1 for expected[0] and so on.
+    """
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    results = {}
+    for key, value in data.items():
+        try:
+            position = int(key) - 1
+        except (TypeError, ValueError):
+            continue
+        if 0 <= position < len(expected) and isinstance(value, str) and value.strip():
+            results[expected[position]] = value
+    return results
+
+
+def request_translations(
+    client,
+    lines: Dict[int, str],
+    source_lang: str,
+    target_lang: str,
+    model: str = DEFAULT_MODEL,
+    budget: Optional[RequestBudget] = None,
+    provider: str = 'openai'
+) -> Dict[int, str]:
+    """Send one numbered batch and return the aligned translations"""
+    messages = build_messages(lines, source_lang, target_lang)
+    metrics = get_metrics()
+    prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+    if budget is not None:
+        metrics.inc(
+            'wait_seconds_total',
+            budget.acquire(int(prompt_tokens * (1 + COMPLETION_RATIO))),
+            provider=provider
+        )
+
+    limiter = get_rate_limiter(provider)
+    for attempt in range(MAX_RETRIES):
+        if attempt:
+            metrics.inc('retries_total', provider=provider)
+        if limiter is not None:
+            metrics.inc('wait_seconds_total', limiter.acquire(), provider=provider)
+        metrics.inc('chars_sent_total', len(messages[-1]["content"]), provider=provider)
+        started = time.perf_counter()
+        try:
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                response_format={"type": "json_object"},
+                temperature=0.3
+            )
+        except Exception as e:
+            metrics.observe('request_seconds', time.perf_counter() - started, provider=provider)
+            throttled = getattr(e, 'status_code', None) == 429 or 'Timeout' in type(e).__name__
+            outcome = 'throttled' if throttled else 'error'
+            metrics.inc('requests_total', provider=provider, outcome=outcome)
+            if limiter is not None:
+                if throttled:
+                    limiter.on_throttle()
+                else:
+                    limiter.on_failure()
+            if attempt == MAX_RETRIES - 1:
+                raise
+            delay = backoff_delay(attempt)
+            metrics.inc('backoff_seconds_total', delay, provider=provider)
+            time.sleep(delay)
+            continue
+
+        metrics.observe('request_seconds', time.perf_counter() - started, provider=provider)
+        metrics.inc('requests_total', provider=provider, outcome='ok')
+        if limiter is not None:
+            limiter.on_success()
+        # Prefer the reported usage; compatible servers may leave it empty
+        usage = getattr(response, 'usage', None)
+        metrics.inc('tokens_sent_total', getattr(usage, 'prompt_tokens', 0) or prompt_tokens, provider=provider)
+        metrics.inc('tokens_received_total', getattr(usage, 'completion_tokens', 0) or 0, provider=provider)
+        return parse_response(response.choices[0].message.content, list(lines))
+    return {}
+
+
+def _contiguous_runs(numbers: List[int]) -> List[List[int]]:
+    runs = []
+    for number in sorted(numbers):
+        if runs and runs[-1][-1] == number - 1:
+            runs[-1].append(number)
+        else:
+            runs.append([number])
+    return runs
+
+
+def translate_range(
+    client,
+    texts: List[str],
+    indices: List[int],
+    source_lang: str,
+    target_lang: str,
+    model: str = DEFAULT_MODEL,
+    budget: Optional[RequestBudget] = None,
+    provider: str = 'openai'
+) -> Dict[int, str]:
+    """Translate texts[indices], re-submitting only misaligned sub-ranges"""
+    results = request_translations(
+        client, {idx: texts[idx] for idx in indices}, source_lang, target_lang, model, budget, provider
+    )
+    missing = [idx for idx in indices if idx not in results]
+    if not missing:
+        return results
+
+    if len(missing) == len(indices):
+        if len(indices) == 1:
+            # One more try on its own, then give up on this line
+            results.update(request_translations(
+                client, {indices[0]: texts[indices[0]]}, source_lang, target_lang, model, budget, provider
+            ))
+            return results
+        # Nothing usable came back: bisect the whole range
+        mid = len(indices) // 2
+        for half in (indices[:mid], indices[mid:]):
+            results.update(translate_range(
+                client, texts, half, source_lang, target_lang, model, budget, provider
+            ))
+        return results
+
+    for run in _contiguous_runs(missing):
+        results.update(translate_range(
+            client, texts, run, source_lang, target_lang, model, budget, provider
+        ))
+    return results
+
+
+def translate_with_openai(
+    texts: List[str],
+    source_lang: str,
+    target_lang: str,
+    api_key: str,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    max_lines: int = MAX_LINES_PER_REQUEST,
+    model: str = DEFAULT_MODEL,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    stats: Optional[dict] = None,
+    max_concurrency: int = DEFAULT_CONCURRENCY,
+    rpm: Optional[int] = DEFAULT_RPM,
+    tpm: Optional[int] = DEFAULT_TPM,
+    base_url: Optional[str] = None,
+    result_callback: Optional[Callable[[int, str], None]] = None,
+    client=None,
+    budget: Optional[RequestBudget] = None,
+    provider: str = 'openai'
+) -> List[str]:
+    """
+    Translate texts with OpenAI using token-budgeted, numbered batches
+
+    Up to max_concurrency batches are in flight at once on a shared client,
+    within the rpm/tpm budget. Lines the model fails to return after recovery
+    keep their original text and are counted in stats['failed'].
+    result_callback, if given, receives (index, translation) for every line
+    as soon as its batch completes. A long-lived client and budget can be
+    passed in so that connections and limits carry over between calls.
+    Texts should carry override tags as ⟦n⟧ placeholders (see ass_text),
+    which is how OpenAIProvider sends them.
+    provider names the metrics series and rate limiter, e.g. 'local' for
+    an OpenAI-compatible local server.
+
+    Returns:
+        Translated texts in the same order as the input
+    """
+    if client is None:
+        client = get_client(api_key, base_url)
+
+    try:
+        translated = list(texts)
+        done = 0
+        failed = 0
+        batches = pack_by_tokens(texts, token_budget, max_lines)
+        if budget is None:
+            budget = RequestBudget(rpm, tpm)
+
+        executor = ThreadPoolExecutor(max_workers=max(1, int(max_concurrency)))
+        try:
+            futures = {
+                executor.submit(
+                    translate_range, client, texts, batch, source_lang, target_lang, model, budget, provider
+                ): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                results = future.result()
+                for idx in batch:
+                    if idx in results:
+                        translated[idx] = results[idx]
+                        if result_callback:
+                            result_callback(idx, results[idx])
+                    else:
+                        failed += 1
+                done += len(batch)
+                if progress_callback:
+                    progress_callback(done, len(texts))
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+
+        if stats is not None:
+            stats['batches'] = stats.get('batches', 0) + len(batches)
+            stats['failed'] = stats.get('failed', 0) + failed
+        return translated
+
+    except Exception as e:
+        raise Exception(f"خطأ في OpenAI API: {str(e)}")
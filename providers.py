@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Providers - مزودو الترجمة
+Long-lived translation providers with pooled connections and one batch interface
+"""
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import requests
+from bs4 import BeautifulSoup
+from deep_translator.constants import BASE_URLS, GOOGLE_LANGUAGES_TO_CODES
+from requests.adapters import HTTPAdapter
+
+from local_translator import DEFAULT_LOCAL_MODEL, LOCAL_BATCH_SIZE, LOCAL_URL, LOCAL_WORKERS, load_model
+from metrics import get_metrics
+from openai_translator import (
+    COMPLETION_RATIO, DEFAULT_CONCURRENCY, DEFAULT_MODEL, MAX_LINES_PER_REQUEST, RequestBudget,
+    estimate_tokens, get_client, translate_with_openai
+)
+from rate_limiter import ThrottledError
+from translation_engine import (
+    DEFAULT_PACK_SIZE, DEFAULT_WORKERS, PACK_SEPARATOR, PreparedTexts, lookup_memory,
+    normalize_fragment, translate_texts
+)
+from translation_memory import TranslationMemory, make_namespace
+
+# Alternative Google endpoint, e.g. the mock backend in devtools/
+GOOGLE_URL = os.environ.get('GOOGLE_TRANSLATE_URL') or BASE_URLS['GOOGLE_TRANSLATE']
+REQUEST_TIMEOUT = 30  # seconds
+
+PROVIDER_NAMES = ('google', 'openai', 'local')
+
+# Provider instances kept alive at once; every API key and concurrency
+# setting of the web app and job API gets its own
+MAX_PROVIDERS = 8
+
+
+class Provider(ABC):
+    """A translation service behind one thread-safe batch interface
+
+    Instances are long-lived (see get_provider) so that HTTP connections,
+    TLS sessions and request budgets carry over between files and calls.
+    """
+
+    name = ''
+
+    @abstractmethod
+    def translate_batch(
+        self,
+        texts: List[str],
+        source: str,
+        target: str,
+        batch_size: Optional[int] = None,
+        memory: Optional[TranslationMemory] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        stats: Optional[dict] = None,
+        result_callback: Optional[Callable[[int, str, bool], None]] = None,
+        keep_results: bool = True,
+        fuzzy_threshold: Optional[float] = None,
+        prepared: Optional[PreparedTexts] = None,
+        max_workers: Optional[int] = None
+    ) -> List[str]:
+        """
+        Translate subtitle texts, keeping their order
+
+        Args:
+            texts: Subtitle texts, possibly containing ASS override tags
+            source: Source language code ('auto' to detect)
+            target: Target language code
+            batch_size: Maximum number of lines or fragments per request
+            memory: Translation memory to read from and write to (optional)
+            progress_callback: Called with (finished texts, total texts)
+            stats: Dict filled with provider counters (optional)
+            result_callback: Called with (text index, translation, complete)
+                as soon as a text is done; complete is False when part of it
+                failed and kept its source text
+            keep_results: When False, an empty list is returned and finished
+                texts are only passed to result_callback
+            fuzzy_threshold: Reuse memory entries at least this similar
+                (None = exact matches only)
+            prepared: The same texts already parsed, e.g. shared by several
+                target languages (optional)
+            max_workers: Requests in flight for this call, when several calls
+                share the provider (default: the provider's own)
+
+        Returns:
+            Translated texts in the same order as the input
+        """
+
+    def close(self):
+        """Release pooled connections"""
+
+
+class GoogleProvider(Provider):
+    """Google Translate over one keep-alive session shared by all workers"""
+
+    name = 'google'
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, base_url: str = GOOGLE_URL):
+        self.max_workers = max(1, int(max_workers))
+        self.base_url = base_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @staticmethod
+    def language_code(lang: str) -> str:
+        """Map a language name or code to the code Google expects"""
+        if lang == 'auto' or lang in GOOGLE_LANGUAGES_TO_CODES.values():
+            return lang
+        if lang.lower() in GOOGLE_LANGUAGES_TO_CODES:
+            return GOOGLE_LANGUAGES_TO_CODES[lang.lower()]
+        raise Exception(f"لغة غير مدعومة: {lang}")
+
+    def request(self, text: str, source: str, target: str) -> Optional[str]:
+        """Send one request and return the translation
+
+        Same endpoint, parameters and result elements as deep_translator's
+        GoogleTranslator.translate(), which sends every call through a new
+        requests.get() and so cannot share the pooled session.
+        """
+        if source == target:
+            return text
+        try:
+            response = self.session.get(
+                self.base_url,
+                params={'tl': target, 'sl': source, 'q': text},
+                timeout=REQUEST_TIMEOUT
+            )
+        except requests.Timeout:
+            # An overloaded service slows down before it answers 429
+            raise ThrottledError()
+        if response.status_code == 429:
+            raise ThrottledError()
+        response.raise_for_status()
+
+        soup = BeautifulSoup(response.text, 'html.parser')
+        element = soup.find('div', {'class': 't0'}) or soup.find('div', {'class': 'result-container'})
+        if element is None:
+            # A consent or error page: fail so the request is retried and counted
+            raise Exception("لم يتم العثور على الترجمة في رد Google")
+        return element.get_text(strip=True) or None
+
+    def translate_batch(
+        self,
+        texts: List[str],
+        source: str,
+        target: str,
+        batch_size: Optional[int] = None,
+        memory: Optional[TranslationMemory] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        stats: Optional[dict] = None,
+        result_callback: Optional[Callable[[int, str, bool], None]] = None,
+        keep_results: bool = True,
+        fuzzy_threshold: Optional[float] = None,
+        prepared: Optional[PreparedTexts] = None,
+        max_workers: Optional[int] = None
+    ) -> List[str]:
+        return translate_texts(
+            texts,
+            self.language_code(source),
+            self.language_code(target),
+            self.request,
+            max_workers=max_workers or self.max_workers,
+            memory=memory,
+            progress_callback=progress_callback,
+            pack_size=batch_size or DEFAULT_PACK_SIZE,
+            stats=stats,
+            result_callback=result_callback,
+            keep_results=keep_results,
+            provider=self.name,
+            fuzzy_threshold=fuzzy_threshold,
+            prepared=prepared
+        )
+
+    def close(self):
+        self.session.close()
+
+
+class OpenAIProvider(Provider):
+    """OpenAI chat completions with a pooled client and a shared rpm/tpm budget"""
+
+    name = 'openai'
+
+    def __init__(
+        self,
+        api_key: str,
+        max_workers: Optional[int] = None,
+        model: Optional[str] = None,
+        base_url: Optional[str] = None
+    ):
+        if not api_key:
+            raise Exception("الرجاء إدخال OpenAI API Key")
+        self.api_key = api_key
+        self.max_workers = max(1, int(max_workers or DEFAULT_CONCURRENCY))
+        self.model = model or DEFAULT_MODEL
+        self.base_url = base_url
+        self.client = get_client(api_key, base_url, self.max_workers)
+        self.budget = RequestBudget()
+
+    def translate_batch(
+        self,
+        texts: List[str],
+        source: str,
+        target: str,
+        batch_size: Optional[int] = None,
+        memory: Optional[TranslationMemory] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        stats: Optional[dict] = None,
+        result_callback: Optional[Callable[[int, str, bool], None]] = None,
+        keep_results: bool = True,
+        fuzzy_threshold: Optional[float] = None,
+        prepared: Optional[PreparedTexts] = None,
+        max_workers: Optional[int] = None
+    ) -> List[str]:
+        # Prompt compaction: override blocks become ⟦n⟧ placeholders, edge
+        # tags and drawings stay out of the prompt, and every distinct
+        # segment is sent once; restore() puts the exact tags back
+        if prepared is None:
+            prepared = PreparedTexts(texts)
+        # Copied: finished lines are released below
+        lines = list(prepared.lines)
+        translations = [[None] * len(line.segments) if line else [] for line in lines]
+        targets = prepared.groups()
+        units = list(targets)
+        remaining = [len(segments) for segments in translations]
+        namespace = make_namespace(f"{self.name}/{self.model}", source, target)
+
+        fragments = sum(remaining)
+        raw = {normalize_fragment(text) for text, count in zip(texts, remaining) if count}
+        # Prompt tokens, plus the completion that would have echoed the tags
+        saved = max(0, sum(estimate_tokens(text) for text in raw) - sum(estimate_tokens(unit) for unit in units))
+        saved = int(saved * (1 + COMPLETION_RATIO))
+        get_metrics().inc('tokens_saved_total', saved, provider=self.name)
+
+        results = list(texts) if keep_results else []
+
+        def finish(i: int):
+            restored = lines[i].restore(translations[i])
+            if keep_results:
+                results[i] = restored
+            if result_callback:
+                result_callback(i, restored, remaining[i] == 0)
+            lines[i] = translations[i] = None
+
+        def finish_unit(key: str, translated: str):
+            for i, k in targets[key]:
+                translations[i][k] = translated
+                remaining[i] -= 1
+                if remaining[i] == 0:
+                    finish(i)
+
+        pending = units
+        cached_count = fuzzy_count = 0
+        if memory is not None and units:
+            found, fuzzy_count = lookup_memory(memory, namespace, units, fuzzy_threshold)
+            cached_count = len(found) - fuzzy_count
+            for key, translated in found.items():
+                finish_unit(key, translated)
+            pending = [key for key in units if key not in found]
+
+        if stats is not None:
+            stats['fragments'] = stats.get('fragments', 0) + fragments
+            stats['unique'] = stats.get('unique', 0) + len(units)
+            stats['deduplicated'] = stats.get('deduplicated', 0) + fragments - len(units)
+            stats['tokens_saved'] = stats.get('tokens_saved', 0) + saved
+            stats['cached'] = stats.get('cached', 0) + cached_count
+            stats['fuzzy'] = stats.get('fuzzy', 0) + fuzzy_count
+
+        # New translations are stored once per finished batch
+        fresh = []
+
+        def on_result(unit: int, translated: str):
+            fresh.append((pending[unit], translated))
+            finish_unit(pending[unit], translated)
+
+        def on_progress(finished: int, total: int):
+            if memory is not None and fresh:
+                memory.put_many(namespace, fresh)
+                fresh.clear()
+            # Batches finish out of order; report the share of distinct segments done
+            if progress_callback:
+                done = len(units) - total + finished
+                progress_callback(len(texts) * done // max(len(units), 1), len(texts))
+
+        if pending:
+            with get_metrics().stage('translate'):
+                translate_with_openai(
+                    pending,
+                    source,
+                    target,
+                    self.api_key,
+                    max_lines=batch_size or MAX_LINES_PER_REQUEST,
+                    model=self.model,
+                    progress_callback=on_progress,
+                    stats=stats,
+                    max_concurrency=max_workers or self.max_workers,
+                    base_url=self.base_url,
+                    result_callback=on_result,
+                    client=self.client,
+                    budget=self.budget,
+                    provider=self.name
+                )
+        elif progress_callback:
+            progress_callback(len(texts), len(texts))
+        # Lines with a segment the model never returned keep its source text
+        for i, count in enumerate(remaining):
+            if count > 0 and lines[i] is not None:
+                finish(i)
+        return results
+
+    def close(self):
+        self.client.close()
+
+
+class LocalServerProvider(OpenAIProvider):
+    """An OpenAI-compatible server on our own hardware, without rpm/tpm quotas"""
+
+    name = 'local'
+
+    def __init__(self, base_url: str, max_workers: Optional[int] = None, model: Optional[str] = None):
+        # Local servers ignore the key, but the client requires one
+        super().__init__('local', max_workers, model or 'local', base_url)
+        self.budget = RequestBudget(rpm=None, tpm=None)
+
+
+class LocalProvider(Provider):
+    """In-process machine-translation model, batching many lines per inference call"""
+
+    name = 'local'
+
+    def __init__(self, max_workers: Optional[int] = None, model: Optional[str] = None):
+        self.max_workers = max(1, int(max_workers or LOCAL_WORKERS))
+        self.model = load_model(model or DEFAULT_LOCAL_MODEL, self.max_workers)
+
+    def request(self, text: str, source: str, target: str) -> Optional[str]:
+        """Translate one pack: every packed line is one item of the inference batch"""
+        if source == target:
+            return text
+        lines = text.split(PACK_SEPARATOR)
+        return PACK_SEPARATOR.join(self.model.translate_lines(lines, source, target))
+
+    def translate_batch(
+        self,
+        texts: List[str],
+        source: str,
+        target: str,
+        batch_size: Optional[int] = None,
+        memory: Optional[TranslationMemory] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        stats: Optional[dict] = None,
+        result_callback: Optional[Callable[[int, str, bool], None]] = None,
+        keep_results: bool = True,
+        fuzzy_threshold: Optional[float] = None,
+        prepared: Optional[PreparedTexts] = None,
+        max_workers: Optional[int] = None
+    ) -> List[str]:
+        # Check the language pair once instead of failing every pack
+        self.model.language_code(source)
+        self.model.language_code(target)
+        return translate_texts(
+            texts,
+            source,
+            target,
+            self.request,
+            max_workers=max_workers or self.max_workers,
+            memory=memory,
+            progress_callback=progress_callback,
+            pack_size=batch_size or LOCAL_BATCH_SIZE,
+            stats=stats,
+            result_callback=result_callback,
+            keep_results=keep_results,
+            provider=self.name,
+            namespace=make_namespace(f"{self.name}/{self.model.name}", source, target),
+            fuzzy_threshold=fuzzy_threshold,
+            prepared=prepared
+        )
+
+
+def make_local_provider(
+    max_workers: Optional[int] = None,
+    model: Optional[str] = None,
+    base_url: Optional[str] = None
+) -> Provider:
+    """Use the local server at base_url (or LOCAL_MT_URL) if any, else an in-process model"""
+    base_url = base_url or LOCAL_URL
+    if base_url:
+        return LocalServerProvider(base_url, max_workers, model)
+    return LocalProvider(max_workers, model)
+
+
+_providers: 'OrderedDict[tuple, Provider]' = OrderedDict()
+_providers_lock = threading.Lock()
+
+
+def get_provider(name: str, **options) -> Provider:
+    """Return the process-wide provider instance for a name and options
+
+    The MAX_PROVIDERS most recently used instances are kept. Older ones are
+    dropped but not closed, since a running job may still hold them; their
+    pooled connections are released once the last job is done with them.
+    """
+    key = (name, tuple(sorted((k, v) for k, v in options.items() if v is not None)))
+    with _providers_lock:
+        provider = _providers.get(key)
+        if provider is None:
+            if name == 'google':
+                provider = GoogleProvider(**dict(key[1]))
+            elif name == 'openai':
+                provider = OpenAIProvider(**dict(key[1]))
+            elif name == 'local':
+                provider = make_local_provider(**dict(key[1]))
+            else:
+                raise Exception(f"مزود غير معروف: {name}")
+            _providers[key] = provider
+            while len(_providers) > MAX_PROVIDERS:
+                _providers.popitem(last=False)
+        else:
+            _providers.move_to_end(key)
+    return provider
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter - تحديد معدل الطلبات
+Adaptive request pacing and circuit breaking shared by threads and worker processes
+"""
+
+import multiprocessing
+import random
+import time
+from typing import Dict, Optional
+
+from metrics import get_metrics
+
+# Provider requests per second across all workers (each request carries a whole pack)
+DEFAULT_RATE = 10.0
+
+# AIMD: add this many requests/second per success, multiply by this factor on 429/timeouts
+ADDITIVE_INCREASE = 0.2
+MULTIPLICATIVE_DECREASE = 0.5
+MIN_RATE = 0.5
+# Throttles arriving together come from one burst: cut the rate at most this often
+DECREASE_COOLDOWN = 1.0  # seconds
+
+# Circuit breaker: after this many failures in a row every worker pauses
+FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN = 15.0  # seconds, doubled for every trip in a row
+MAX_BREAKER_COOLDOWN = 120.0
+
+# Jittered exponential backoff between retries of one request
+BACKOFF_BASE = 1.0  # seconds
+MAX_BACKOFF = 30.0
+
+# Slots of the shared state array
+_RATE, _TOKENS, _REFILLED, _OPEN_UNTIL, _FAILURES, _DECREASED, _TRIPS = range(7)
+
+DEFAULT_PROVIDER = '*'
+
+
+class ThrottledError(Exception):
+    """Raised by providers when the service answers HTTP 429 or times out"""
+
+
+def backoff_delay(attempt: int) -> float:
+    """Return a full-jitter exponential delay before retry number attempt + 1"""
+    return random.uniform(0, min(MAX_BACKOFF, BACKOFF_BASE * 2 ** attempt))
+
+
+class RateLimiter:
+    """AIMD token bucket with a circuit breaker, backed by shared memory
+
+    The rate rises by ADDITIVE_INCREASE after every success, up to the
+    configured rate, and is halved on 429s or timeouts. After
+    FAILURE_THRESHOLD failures in a row the breaker opens and acquire()
+    blocks every thread and process until the cooldown has passed.
+
+    Create it in the parent process and hand it to worker processes through
+    the pool initializer; every thread and process then draws from the same
+    bucket and sees the same breaker.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, min_rate: float = MIN_RATE):
+        self.max_rate = rate if rate and rate > 0 else 0.0
+        self.min_rate = min(min_rate, self.max_rate)
+        self._lock = multiprocessing.Lock()
+        self._state = multiprocessing.RawArray('d', 7)
+        self._state[_RATE] = self.max_rate
+        self._state[_TOKENS] = 1.0
+        # time.monotonic() is system-wide, so times are comparable across processes
+        self._state[_REFILLED] = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        """Current allowed requests per second (0 = unlimited)"""
+        return self._state[_RATE]
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the circuit breaker is currently pausing all workers"""
+        return time.monotonic() < self._state[_OPEN_UNTIL]
+
+    def acquire(self) -> float:
+        """Block until the caller may send one request; return the seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                open_until = self._state[_OPEN_UNTIL]
+                if now >= open_until:
+                    if not self.max_rate:
+                        return waited
+                    rate = self._state[_RATE]
+                    # Refill, allowing a burst of at most one second of traffic
+                    tokens = min(
+                        max(1.0, rate),
+                        self._state[_TOKENS] + (now - self._state[_REFILLED]) * rate
+                    )
+                    # Reserve a token; a negative balance is the queue ahead of us
+                    self._state[_TOKENS] = tokens - 1
+                    self._state[_REFILLED] = now
+                    delay = (1 - tokens) / rate if tokens < 1 else 0.0
+                    break
+                delay = open_until - now
+            # Breaker open: wait it out, then compete for a token again
+            time.sleep(delay)
+            waited += delay
+        if delay > 0:
+            time.sleep(delay)
+        return waited + delay
+
+    def on_success(self):
+        """Record a successful request: close the breaker and raise the rate"""
+        with self._lock:
+            self._state[_FAILURES] = 0
+            self._state[_TRIPS] = 0
+            if self.max_rate:
+                self._state[_RATE] = min(self.max_rate, self._state[_RATE] + ADDITIVE_INCREASE)
+
+    def on_throttle(self):
+        """Record a 429 or timeout: cut the rate and count towards the breaker"""
+        with self._lock:
+            now = time.monotonic()
+            # One burst of 429s counts once, both for the rate and the breaker
+            if now - self._state[_DECREASED] < DECREASE_COOLDOWN:
+                return
+            self._state[_DECREASED] = now
+            if self.max_rate:
+                self._state[_RATE] = max(self.min_rate, self._state[_RATE] * MULTIPLICATIVE_DECREASE)
+                get_metrics().inc('rate_decreases_total')
+            self._record_failure(now)
+
+    def on_failure(self):
+        """Record any other failed request, counting towards the breaker"""
+        with self._lock:
+            self._record_failure(time.monotonic())
+
+    def _record_failure(self, now: float):
+        self._state[_FAILURES] += 1
+        if self._state[_FAILURES] >= FAILURE_THRESHOLD and now >= self._state[_OPEN_UNTIL]:
+            cooldown = min(MAX_BREAKER_COOLDOWN, BREAKER_COOLDOWN * 2 ** self._state[_TRIPS])
+            self._state[_OPEN_UNTIL] = now + cooldown
+            self._state[_TRIPS] += 1
+            # Half-open after the cooldown: the next failure trips it again
+            self._state[_FAILURES] = FAILURE_THRESHOLD - 1
+            get_metrics().inc('breaker_trips_total')
+
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+
+
+def set_rate_limiter(limiter: Optional[RateLimiter], provider: str = DEFAULT_PROVIDER):
+    """Install the limiter used by provider requests in this process
+
+    A limiter installed without a provider name applies to every provider
+    that has none of its own.
+    """
+    if limiter is None:
+        _rate_limiters.pop(provider, None)
+    else:
+        _rate_limiters[provider] = limiter
+
+
+def get_rate_limiter(provider: str = DEFAULT_PROVIDER) -> Optional[RateLimiter]:
+    """Return the limiter installed for a provider in this process, if any"""
+    return _rate_limiters.get(provider) or _rate_limiters.get(DEFAULT_PROVIDER)
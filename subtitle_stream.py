@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Subtitle Stream - ترجمة الملفات الكبيرة بذاكرة ثابتة
+Chunked reader, translator and writer for SRT and ASS/SSA files
+
+Events are read a chunk at a time, translated and written out before the
+next chunk is read, so memory use does not grow with the file. Everything
+except the translated text (headers, styles, comments, timings, unknown
+sections, line endings, BOM) is copied byte for byte.
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Events translated together; repeated lines are deduplicated within a chunk
+# and across chunks through the translation memory
+CHUNK_SIZE = 500
+
+STREAM_FORMATS = ('.srt', '.ass', '.ssa')
+
+# SRT inline tags (<i>, <font color=...>) travel as override blocks so that
+# the ASS segmenter keeps them out of the translated text
+SRT_TAG_PATTERN = re.compile(r'<[^<>]*>')
+WRAPPED_TAG_PATTERN = re.compile(r'\{(<[^<>]*>)\}')
+SRT_TIMING = '-->'
+
+
+class StreamEvent:
+    """One dialogue event: the text to translate and how to write it back"""
+
+    __slots__ = ('style', 'text', 'render')
+
+    def __init__(self, style: str, text: str, render: Callable[[str], str]):
+        self.style = style
+        self.text = text
+        self.render = render
+
+
+Item = Union[str, StreamEvent]
+
+
+def _line_ending(line: str) -> str:
+    return line[len(line.rstrip('\r\n')):]
+
+
+def _read_ass(lines: Iterable[str]) -> Iterator[Item]:
+    fields: List[str] = []
+    in_events = False
+    for line in lines:
+        stripped = line.strip().lstrip('\ufeff')
+        if stripped.startswith('['):
+            in_events = stripped.lower() == '[events]'
+        elif in_events and stripped.lower().startswith('format:'):
+            fields = [field.strip().lower() for field in stripped.split(':', 1)[1].split(',')]
+        elif in_events and fields and line.startswith('Dialogue:'):
+            kind, _, values = line.partition(':')
+            values = values.rstrip('\r\n')
+            parts = values.split(',', len(fields) - 1)
+            if len(parts) == len(fields):
+                prefix = f"{kind}:{','.join(parts[:-1])},"
+                ending = _line_ending(line)
+                style = parts[fields.index('style')].strip() if 'style' in fields else ''
+                yield StreamEvent(
+                    style, parts[-1], lambda text, prefix=prefix, ending=ending: prefix + text + ending
+                )
+                continue
+        yield line
+
+
+def _srt_render(header: str, separator: str, ending: str) -> Callable[[str], str]:
+    def render(text: str) -> str:
+        text = WRAPPED_TAG_PATTERN.sub(r'\1', text)
+        return header + text.replace('\\N', separator) + ending
+    return render
+
+
+def _read_srt(lines: Iterable[str]) -> Iterator[Item]:
+    block: List[str] = []
+
+    def flush() -> Iterator[Item]:
+        # index, timing, then one or more text lines
+        if len(block) >= 3 and SRT_TIMING in block[1]:
+            separator = _line_ending(block[0]) or '\n'
+            text = '\\N'.join(line.rstrip('\r\n') for line in block[2:])
+            text = SRT_TAG_PATTERN.sub(lambda m: '{' + m.group() + '}', text)
+            render = _srt_render(block[0] + block[1], separator, _line_ending(block[-1]))
+            yield StreamEvent('Default', text, render)
+        else:
+            yield from block
+        block.clear()
+
+    for line in lines:
+        if line.strip():
+            block.append(line)
+        else:
+            yield from flush()
+            yield line
+    yield from flush()
+
+
+def read_items(path: str) -> Iterator[Item]:
+    """Yield the lines of a subtitle file, with dialogue events as StreamEvents"""
+    suffix = Path(path).suffix.lower()
+    if suffix not in STREAM_FORMATS:
+        raise Exception(f"صيغة غير مدعومة في الوضع المتدفق: {suffix}")
+    # newline='' keeps the original line endings; a BOM stays part of line one
+    with open(path, encoding='utf-8', newline='') as f:
+        if suffix == '.srt':
+            yield from _read_srt(f)
+        else:
+            yield from _read_ass(f)
+
+
+def scan_events(path: str, sample: int) -> Tuple[int, List[str]]:
+    """Count dialogue events and keep about sample texts spread evenly over the file"""
+    count = 0
+    stride = 1
+    texts: List[str] = []
+    for item in read_items(path):
+        if isinstance(item, StreamEvent):
+            if count % stride == 0:
+                texts.append(item.text)
+                # Thin out to every other kept text once the sample is full
+                if len(texts) >= 2 * sample:
+                    texts = texts[::2]
+                    stride *= 2
+            count += 1
+    return count, texts
+
+
+def chunked(items: Iterable[Item], size: int = CHUNK_SIZE) -> Iterator[List[Item]]:
+    """Group items into lists holding at most size events each"""
+    chunk: List[Item] = []
+    events = 0
+    for item in items:
+        chunk.append(item)
+        if isinstance(item, StreamEvent):
+            events += 1
+            if events >= size:
+                yield chunk
+                chunk = []
+                events = 0
+    if chunk:
+        yield chunk
+
+
+def translate_chunks(
+    chunks: Iterable[List[Item]],
+    translate: Callable[[List[StreamEvent]], None]
+) -> Iterator[str]:
+    """Translate the events of every chunk in place and yield the output lines"""
+    for chunk in chunks:
+        translate([item for item in chunk if isinstance(item, StreamEvent)])
+        for item in chunk:
+            yield item.render(item.text) if isinstance(item, StreamEvent) else item
+
+
+def write_lines(path: str, lines: Iterable[str]):
+    """Write output lines to a temporary file and move it into place when complete"""
+    target = Path(path)
+    tmp = target.with_name(target.name + '.tmp')
+    try:
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            for line in lines:
+                f.write(line)
+        os.replace(tmp, target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def stream_file(
+    input_file: str,
+    output_file: str,
+    translate: Callable[[List[StreamEvent]], None],
+    chunk_size: Optional[int] = None
+):
+    """Run read -> chunk -> translate -> write as one generator pipeline"""
+    write_lines(
+        output_file,
+        translate_chunks(chunked(read_items(input_file), chunk_size or CHUNK_SIZE), translate)
+    )
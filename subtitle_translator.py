@@ -5,16 +5,30 @@ Subtitle Translator - أداة ترجمة ملفات الترجمة
 """
 
 import argparse
+import json
+import re
 import sys
 import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Callable, List, Optional
 
 import pysubs2
-from deep_translator import GoogleTranslator
 from colorama import init, Fore, Style
 from tqdm import tqdm
 
+from job_state import Journal, Manifest, journal_path
+from language_detect import DETECT_SAMPLE, describe_sources, detect_source, group_by_source, line_sources
+from line_filter import DEFAULT_DENYLIST, DEFAULT_EXCLUDE_STYLES, LineFilter, describe_skipped
+from metrics import get_metrics, summarize
+from rate_limiter import DEFAULT_RATE, RateLimiter, set_rate_limiter
+from providers import PROVIDER_NAMES, get_provider
+from translation_engine import DEFAULT_WORKERS, PreparedTexts
+from subtitle_stream import CHUNK_SIZE, scan_events, stream_file
+from translation_memory import DEFAULT_FUZZY_THRESHOLD, get_memory
+
 # Initialize colorama for Windows support
 init()
 
@@ -55,36 +69,24 @@ def get_supported_languages() -> dict:
     }
 
 
-def translate_text(text: str, translator: GoogleTranslator) -> str:
-    """Translate text while preserving ASS formatting tags"""
-    if not text or not text.strip():
-        return text
-
-    # Extract and preserve ASS override tags like {\pos(x,y)}, {\an8}, etc.
-    import re
-
-    # Pattern to match ASS override blocks
-    tag_pattern = r'(\{[^}]*\})'
-
-    # Split text into tags and content
-    parts = re.split(tag_pattern, text)
-
-    translated_parts = []
-    for part in parts:
-        if part.startswith('{') and part.endswith('}'):
-            # Preserve formatting tags
-            translated_parts.append(part)
-        elif part.strip():
-            # Translate actual text
-            try:
-                translated = translator.translate(part)
-                translated_parts.append(translated if translated else part)
-            except Exception:
-                translated_parts.append(part)
-        else:
-            translated_parts.append(part)
+def parse_targets(target_lang) -> List[str]:
+    """Split target languages given as "ar,en,fr" or a list, dropping repeats"""
+    if isinstance(target_lang, str):
+        target_lang = target_lang.split(',')
+    targets = []
+    for lang in target_lang:
+        lang = lang.strip()
+        if lang and lang not in targets:
+            targets.append(lang)
+    return targets
+
 
-    return ''.join(translated_parts)
+def output_path(input_file: str, target_lang: str, output_file: Optional[str] = None) -> str:
+    """Return the output path for one target language; {lang} in output_file is replaced"""
+    if output_file:
+        return output_file.replace('{lang}', target_lang)
+    input_path = Path(input_file)
+    return str(input_path.parent / f"{input_path.stem}_{target_lang}{input_path.suffix}")
 
 
 def translate_subtitles(
@@ -92,65 +94,491 @@ def translate_subtitles(
     output_file: Optional[str],
     target_lang: str,
     source_lang: str = 'auto',
-    batch_size: int = 50
+    batch_size: int = 50,
+    use_cache: bool = True,
+    cache_path: Optional[str] = None,
+    max_workers: int = DEFAULT_WORKERS,
+    stats: Optional[dict] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    quiet: bool = False,
+    incremental: bool = False,
+    resume: bool = False,
+    line_filter: Optional[LineFilter] = None,
+    provider: str = 'google',
+    provider_options: Optional[dict] = None,
+    fuzzy_threshold: Optional[float] = None,
+    stream: bool = False,
+    chunk_size: int = CHUNK_SIZE
 ) -> bool:
     """
     Translate subtitle file while preserving Aegisub compatibility
 
     Args:
         input_file: Path to input subtitle file (ASS/SRT)
-        output_file: Path to output file (optional)
-        target_lang: Target language code
+        output_file: Path to output file (optional); with several targets
+            it must contain {lang}, e.g. "out/ep01_{lang}.ass"
+        target_lang: Target language code, or several separated by commas
+            ("ar,en,fr"): the file is parsed once and all targets are
+            translated concurrently
         source_lang: Source language code (default: auto-detect)
-        batch_size: Number of lines to translate per batch
+        batch_size: Maximum number of fragments packed into one request
+        use_cache: Reuse translations stored in the translation memory
+        cache_path: Path to the translation memory database (optional)
+        max_workers: Maximum number of concurrent translation requests
+        stats: Dict filled with line counts, output path and error (optional)
+        progress_callback: Called with (finished lines, total lines) instead
+            of drawing a progress bar (optional)
+        quiet: Suppress console messages
+        incremental: Reuse translations of unchanged events recorded in the
+            output's sidecar manifest and only translate new or edited ones
+        resume: Skip events already recorded in the journal of an interrupted
+            run; finished events are always journaled while translating
+        line_filter: Classifier for events that are copied unchanged instead
+            of being translated (optional)
+        provider: Translation provider name ('google', 'openai' or 'local')
+        provider_options: Extra provider settings such as api_key or model
+        fuzzy_threshold: Reuse memory entries at least this similar to a
+            line, e.g. differing only in punctuation or a name (optional)
+        stream: Read, translate and write chunk_size events at a time so
+            memory stays flat for very large files (see subtitle_stream)
+        chunk_size: Events per chunk in stream mode
 
     Returns:
         True if successful, False otherwise
     """
-    try:
-        # Load subtitle file
-        print_info(f"جاري تحميل الملف: {input_file}")
-        subs = pysubs2.load(input_file)
-
-        # Determine output file path
-        if not output_file:
-            input_path = Path(input_file)
-            output_file = str(input_path.parent / f"{input_path.stem}_{target_lang}{input_path.suffix}")
+    if stats is None:
+        stats = {}
+    info = (lambda msg: None) if quiet else print_info
+    metrics = get_metrics()
 
-        # Initialize translator
-        translator = GoogleTranslator(source=source_lang, target=target_lang)
+    try:
+        targets = parse_targets(target_lang)
+        if not targets:
+            raise Exception("حدد لغة الهدف")
+        if len(targets) > 1 and output_file and '{lang}' not in output_file:
+            raise Exception("استخدم {lang} في مسار الإخراج عند الترجمة إلى عدة لغات")
+        outputs = {lang: output_path(input_file, lang, output_file) for lang in targets}
+        stats['output_file'] = outputs[targets[0]]
+        if len(targets) > 1:
+            stats['outputs'] = outputs
+
+        memory = get_memory(cache_path) if use_cache else None
+
+        if stream:
+            if len(targets) > 1:
+                raise Exception("الوضع المتدفق يدعم لغة هدف واحدة فقط")
+            if incremental:
+                raise Exception("الوضع المتدفق لا يدعم --incremental؛ ذاكرة الترجمة تعيد استخدام الأسطر دون تغيير")
+            if not _translate_stream(
+                input_file, outputs[targets[0]], targets[0], source_lang, batch_size, memory, max_workers,
+                stats, progress_callback, info, resume, line_filter, provider, provider_options,
+                fuzzy_threshold, chunk_size
+            ):
+                if not quiet:
+                    print_error(stats['error'])
+                return False
+            if not quiet:
+                print_success(f"تم حفظ الملف المترجم: {outputs[targets[0]]}")
+            _report(stats, memory, info)
+            return True
+
+        # Load and parse the file once for every target language
+        info(f"جاري تحميل الملف: {input_file}")
+        with metrics.stage('load'):
+            subs = pysubs2.load(input_file)
 
         # Filter dialogue lines (skip comments)
         dialogue_lines = [event for event in subs.events if not event.is_comment]
+        stats['lines'] = len(dialogue_lines)
 
         if not dialogue_lines:
-            print_error("لا توجد نصوص للترجمة في الملف")
+            stats['error'] = "لا توجد نصوص للترجمة في الملف"
+            if not quiet:
+                print_error(stats['error'])
             return False
 
-        print_info(f"عدد الأسطر: {len(dialogue_lines)}")
-        print_info(f"الترجمة إلى: {target_lang}")
+        info(f"عدد الأسطر: {len(dialogue_lines)}")
+        info(f"الترجمة إلى: {'، '.join(targets)}")
 
-        # Translate with progress bar
-        print_info("جاري الترجمة...")
+        texts = [event.text for event in dialogue_lines]
+        with metrics.stage('segment'):
+            prepared = PreparedTexts(texts)
 
-        for event in tqdm(dialogue_lines, desc="الترجمة", unit="سطر"):
-            if event.text:
-                event.text = translate_text(event.text, translator)
+        # Fix the source language once for the whole file
+        with metrics.stage('detect'):
+            sources = line_sources(texts, source_lang)
+        if source_lang == 'auto':
+            stats['source'] = Counter(sources).most_common(1)[0][0]
+            info(f"لغة المصدر: {describe_sources(sources)}")
 
-        # Save translated file
-        subs.save(output_file)
-        print_success(f"تم حفظ الملف المترجم: {output_file}")
+        jobs = [
+            plan_target(
+                lang, outputs[lang], dialogue_lines, texts, prepared, sources, source_lang, provider,
+                line_filter, incremental, resume, info=info, labelled=len(targets) > 1
+            )
+            for lang in targets
+        ]
+
+        # Translate with progress bar
+        info("جاري الترجمة...")
+        total = sum(len(job['todo']) for job in jobs)
+        bar = None
+        if progress_callback is None:
+            bar = tqdm(total=total, desc="الترجمة", unit="سطر")
+
+            def progress_callback(done: int, total: int):
+                bar.update(done - bar.n)
+
+        # Targets report from their own threads; progress is their sum,
+        # starting from the events that need no request
+        finished = {job['lang']: job['done'] for job in jobs}
+        progress_lock = threading.Lock()
+        progress_callback(sum(finished.values()), total)
+
+        def run(job: dict):
+            def on_progress(done: int):
+                with progress_lock:
+                    finished[job['lang']] = done
+                    progress_callback(sum(finished.values()), total)
+
+            translate_target(
+                translator, job, texts, prepared, batch_size, memory, fuzzy_threshold, max_workers,
+                progress_callback=on_progress
+            )
+
+        try:
+            # Targets run concurrently over one provider sized for all of them
+            translator = get_provider(
+                provider, max_workers=max_workers * len(jobs), **(provider_options or {})
+            )
+            if len(jobs) == 1:
+                run(jobs[0])
+            else:
+                executor = ThreadPoolExecutor(max_workers=len(jobs))
+                try:
+                    for future in [executor.submit(run, job) for job in jobs]:
+                        future.result()
+                except BaseException:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+                executor.shutdown()
+        finally:
+            if bar is not None:
+                bar.close()
+            for job in jobs:
+                job['journal'].close()
+
+        # Save translated files
+        for job in jobs:
+            for key, value in job['stats'].items():
+                stats[key] = stats.get(key, 0) + value
+            for event, translated in zip(dialogue_lines, job['translated']):
+                event.text = translated
+            with metrics.stage('save'):
+                subs.save(job['output'])
+                job['journal'].discard()
+                if job['manifest'] is not None:
+                    job['manifest'].save(job['output'], list(zip(texts, job['translated'])))
+            if not quiet:
+                print_success(f"تم حفظ الملف المترجم: {job['output']}")
+        _report(stats, memory, info)
 
         return True
 
     except FileNotFoundError:
-        print_error(f"الملف غير موجود: {input_file}")
+        stats['error'] = f"الملف غير موجود: {input_file}"
+        if not quiet:
+            print_error(stats['error'])
         return False
     except Exception as e:
-        print_error(f"خطأ: {str(e)}")
+        stats['error'] = f"خطأ: {str(e)}"
+        if not quiet:
+            print_error(stats['error'])
         return False
 
 
+def plan_target(
+    lang: str,
+    output: str,
+    dialogue_lines: list,
+    texts: List[str],
+    prepared: PreparedTexts,
+    sources: List[str],
+    source_lang: str,
+    provider: str,
+    line_filter: Optional[LineFilter] = None,
+    incremental: bool = False,
+    resume: bool = False,
+    journal_file: Optional[os.PathLike] = None,
+    info: Callable[[str], None] = lambda msg: None,
+    labelled: bool = False
+) -> dict:
+    """Work out which events one target language still needs translated
+
+    Used by the CLI and the web app alike: filter, carry over journaled and
+    unchanged events, then group what is left into one batch per source
+    language. job['done'] counts the events left to do that are never sent
+    (already in the target language, or tags and drawings only).
+    """
+    label = f"[{lang}] " if labelled else ""
+    metrics = get_metrics()
+    job_stats = {}
+
+    # Signs, songs, numbers and lines already in the target script pass through
+    kept = range(len(texts))
+    skipped = {}
+    if line_filter is not None:
+        with metrics.stage('filter'):
+            reasons = line_filter.classify(dialogue_lines, lang, source_lang)
+        kept = [idx for idx, reason in enumerate(reasons) if reason is None]
+        for reason in reasons:
+            if reason is not None:
+                skipped[reason] = skipped.get(reason, 0) + 1
+        job_stats['skipped'] = sum(skipped.values())
+        if skipped:
+            info(f"{label}أسطر متخطاة دون ترجمة: {job_stats['skipped']} ({describe_skipped(skipped)})")
+
+    # Carry over events finished by an interrupted run (--resume) and
+    # unchanged events from the previous output (--incremental)
+    translated_texts = list(texts)
+    settings = {'provider': provider, 'source': source_lang, 'target': lang}
+    journal = Journal(journal_file or journal_path(output), settings, resume=resume)
+    manifest = Manifest.load(output, settings) if incremental else None
+    todo = []
+    carried = []
+    resumed = reused = 0
+    for idx in kept:
+        text = texts[idx]
+        previous = journal.lookup(text)
+        if previous is not None:
+            resumed += 1
+        elif manifest is not None:
+            previous = manifest.lookup(text)
+            if previous is not None:
+                reused += 1
+        if previous is None:
+            todo.append(idx)
+        else:
+            translated_texts[idx] = previous
+            carried.append(idx)
+
+    if resume:
+        job_stats['resumed'] = resumed
+        info(f"{label}أسطر مستأنفة من المحاولة السابقة: {resumed}")
+    if incremental:
+        job_stats['reused'] = reused
+        info(f"{label}أسطر دون تغيير: {reused}، أسطر جديدة أو معدلة: {len(todo)}")
+
+    # One batch per source language; lines already in the target stay as they are
+    groups = group_by_source([idx for idx in todo if prepared.keys[idx]], sources, lang)
+
+    return {
+        'lang': lang,
+        'output': output,
+        'kept': len(kept),
+        'skipped': skipped,
+        'carried': carried,
+        'todo': todo,
+        'groups': groups,
+        'done': len(todo) - sum(len(indices) for indices in groups.values()),
+        'translated': translated_texts,
+        'journal': journal,
+        'manifest': manifest,
+        'stats': job_stats,
+    }
+
+
+def translate_target(
+    translator,
+    job: dict,
+    texts: List[str],
+    prepared: PreparedTexts,
+    batch_size: int,
+    memory,
+    fuzzy_threshold: Optional[float],
+    max_workers: int,
+    progress_callback: Optional[Callable[[int], None]] = None,
+    result_callback: Optional[Callable[[int, str, bool], None]] = None
+):
+    """Translate the batches of one planned target
+
+    Finished events are journaled. With result_callback they are handed on
+    as (event index, translated, complete) instead of being kept in
+    job['translated']. progress_callback gets the target's events done so far.
+    """
+    base = job['done']
+    for source, todo in job['groups'].items():
+        def on_result(k: int, translated: str, complete: bool, todo=todo):
+            job['journal'].record(texts[todo[k]], translated, complete)
+            if result_callback is not None:
+                result_callback(todo[k], translated, complete)
+
+        results = translator.translate_batch(
+            [texts[idx] for idx in todo],
+            source,
+            job['lang'],
+            batch_size=batch_size,
+            memory=memory,
+            progress_callback=None if progress_callback is None else
+            lambda done, _total, base=base: progress_callback(base + done),
+            stats=job['stats'],
+            result_callback=on_result,
+            keep_results=result_callback is None,
+            fuzzy_threshold=fuzzy_threshold,
+            prepared=prepared.subset(todo),
+            max_workers=max_workers
+        )
+        for idx, translated in zip(todo, results):
+            job['translated'][idx] = translated
+        base += len(todo)
+
+
+def _report(stats: dict, memory, info: Callable[[str], None]):
+    """Print the request, token and memory savings of a finished file"""
+    info(
+        f"المقاطع: {stats.get('fragments', 0)}، فريدة: {stats.get('unique', 0)}، "
+        f"طلبات موفرة بإزالة التكرار: {stats.get('deduplicated', 0)}"
+    )
+    if stats.get('tokens_saved'):
+        info(f"رموز موفرة بإزالة الوسوم من الطلبات: ~{stats['tokens_saved']}")
+    if memory is not None:
+        memory_stats = memory.stats()
+        info(
+            f"ذاكرة الترجمة: {memory_stats['hits']} إصابة، "
+            f"{stats.get('fuzzy', 0)} تطابق تقريبي، "
+            f"{max(0, memory_stats['misses'] - stats.get('fuzzy', 0))} إخفاق"
+        )
+
+
+def _translate_stream(
+    input_file: str,
+    output_file: str,
+    target_lang: str,
+    source_lang: str,
+    batch_size: int,
+    memory,
+    max_workers: int,
+    stats: dict,
+    progress_callback: Optional[Callable[[int, int], None]],
+    info: Callable[[str], None],
+    resume: bool,
+    line_filter: Optional[LineFilter],
+    provider: str,
+    provider_options: Optional[dict],
+    fuzzy_threshold: Optional[float],
+    chunk_size: int
+) -> bool:
+    """Translate a file chunk by chunk, writing the output as it goes
+
+    Returns False (with stats['error'] set) when the file has no dialogue.
+    """
+    info(f"جاري قراءة الملف على دفعات: {input_file}")
+    metrics = get_metrics()
+    total, sample = scan_events(input_file, DETECT_SAMPLE)
+    stats['lines'] = total
+    if not total:
+        stats['error'] = "لا توجد نصوص للترجمة في الملف"
+        return False
+    info(f"عدد الأسطر: {total}")
+    info(f"الترجمة إلى: {target_lang}")
+
+    # Fix the source language once from a sample spread over the whole file
+    file_source = source_lang
+    if source_lang == 'auto':
+        with metrics.stage('detect'):
+            file_source = detect_source(sample)
+        stats['source'] = file_source
+        info(f"لغة المصدر: {'تلقائي' if file_source == 'auto' else file_source}")
+
+    translator = get_provider(provider, max_workers=max_workers, **(provider_options or {}))
+    settings = {'provider': provider, 'source': source_lang, 'target': target_lang}
+    # Only entries of an interrupted run are held in memory, not this run's
+    journal = Journal(journal_path(output_file), settings, resume=resume, track=False)
+    skipped: dict = {}
+    resumed = 0
+    done = 0
+
+    bar = None
+    if progress_callback is None:
+        bar = tqdm(total=total, desc="الترجمة", unit="سطر")
+
+        def progress_callback(finished: int, _total: int):
+            bar.update(finished - bar.n)
+
+    def translate(events):
+        nonlocal resumed, done
+        kept = events
+        if line_filter is not None:
+            with metrics.stage('filter'):
+                kept, chunk_skipped = line_filter.split(events, target_lang, source_lang)
+            for reason, count in chunk_skipped.items():
+                skipped[reason] = skipped.get(reason, 0) + count
+
+        todo = []
+        for event in kept:
+            previous = journal.lookup(event.text) if resume else None
+            if previous is None:
+                todo.append(event)
+            else:
+                event.text = previous
+                resumed += 1
+
+        texts = [event.text for event in todo]
+        sources = line_sources(texts, source_lang, file_source)
+        groups = group_by_source(range(len(todo)), sources, target_lang)
+        offset = done + len(events) - sum(len(indices) for indices in groups.values())
+        for source, indices in groups.items():
+            batch = [texts[k] for k in indices]
+            results = translator.translate_batch(
+                batch,
+                source,
+                target_lang,
+                batch_size=batch_size,
+                memory=memory,
+                progress_callback=lambda finished, _, offset=offset: progress_callback(offset + finished, total),
+                stats=stats,
+                result_callback=lambda k, translated, complete, batch=batch: journal.record(
+                    batch[k], translated, complete
+                ),
+                fuzzy_threshold=fuzzy_threshold
+            )
+            for k, translated in zip(indices, results):
+                todo[k].text = translated
+            offset += len(indices)
+        done += len(events)
+        progress_callback(done, total)
+
+    info("جاري الترجمة...")
+    try:
+        stream_file(input_file, output_file, translate, chunk_size)
+    finally:
+        if bar is not None:
+            bar.close()
+        journal.close()
+    journal.discard()
+
+    if skipped:
+        stats['skipped'] = sum(skipped.values())
+        info(f"أسطر متخطاة دون ترجمة: {stats['skipped']} ({describe_skipped(skipped)})")
+    if resume:
+        stats['resumed'] = resumed
+        info(f"أسطر مستأنفة من المحاولة السابقة: {resumed}")
+    return True
+
+
+def save_stats(path: str, run: dict):
+    """Write run counters and collected metrics as JSON ('-' for stdout)"""
+    snapshot = get_metrics().snapshot()
+    report = {'run': run, 'summary': summarize(snapshot), 'metrics': snapshot}
+    data = json.dumps(report, ensure_ascii=False, indent=2)
+    if path == '-':
+        print(data)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(data + '\n')
+        print_info(f"تم حفظ الإحصاءات: {path}")
+
+
 def list_languages():
     """Display supported languages"""
     print("\nاللغات المدعومة:")
@@ -172,15 +600,59 @@ def main():
   %(prog)s input.ass -t ar                    # ترجمة إلى العربية
   %(prog)s input.srt -t en -s ja              # ترجمة من اليابانية إلى الإنجليزية
   %(prog)s input.ass -t ar -o output.ass      # تحديد ملف الإخراج
+  %(prog)s input.ass -t ar,en,fr,id           # عدة لغات في مهمة واحدة
+  %(prog)s input.ass -t ar -p openai          # الترجمة عبر OpenAI
+  %(prog)s input.ass -t ar -s en -p local     # الترجمة بنموذج محلي دون إنترنت
+  %(prog)s season1/ -t ar -o out/             # ترجمة مجلد كامل
+  %(prog)s "season1/*.ass" -t ar -P 4         # ترجمة عدة ملفات بأربع عمليات
   %(prog)s --list                             # عرض اللغات المدعومة
         """
     )
 
-    parser.add_argument('input', nargs='?', help='ملف الترجمة (ASS/SRT)')
-    parser.add_argument('-t', '--target', help='لغة الترجمة (مثال: ar, en, ja)')
+    parser.add_argument('input', nargs='*', help='ملف/ملفات الترجمة (ASS/SRT) أو مجلدات أو أنماط glob')
+    parser.add_argument('-t', '--target', help='لغة الترجمة، أو عدة لغات مفصولة بفواصل (مثال: ar أو ar,en,fr)')
     parser.add_argument('-s', '--source', default='auto', help='لغة المصدر (افتراضي: تلقائي)')
-    parser.add_argument('-o', '--output', help='ملف الإخراج (اختياري)')
+    parser.add_argument('-o', '--output', help='ملف الإخراج ({lang} تُستبدل بكل لغة)، أو مجلد الإخراج عند ترجمة عدة ملفات (اختياري)')
     parser.add_argument('--list', action='store_true', help='عرض اللغات المدعومة')
+    parser.add_argument('-p', '--provider', choices=PROVIDER_NAMES, default='google',
+                        help='محرك الترجمة (افتراضي: google)')
+    parser.add_argument('--api-key', default=os.environ.get('OPENAI_API_KEY'),
+                        help='مفتاح OpenAI API (افتراضي: المتغير OPENAI_API_KEY)')
+    parser.add_argument('--model', help='نموذج OpenAI، أو النموذج المحلي مع -p local (اختياري)')
+    parser.add_argument('--local-url', default=os.environ.get('LOCAL_MT_URL'),
+                        help='عنوان خادم محلي متوافق مع OpenAI مثل llama.cpp (افتراضي: المتغير LOCAL_MT_URL)')
+    parser.add_argument('-b', '--batch-size', type=int, default=50,
+                        help='عدد المقاطع في الطلب الواحد (افتراضي: 50)')
+    parser.add_argument('-j', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'عدد الطلبات المتزامنة (افتراضي: {DEFAULT_WORKERS})')
+    parser.add_argument('--cache', help='مسار قاعدة ذاكرة الترجمة (اختياري)')
+    parser.add_argument('--no-cache', action='store_true', help='تعطيل ذاكرة الترجمة')
+    parser.add_argument('--fuzzy', type=float, nargs='?', const=DEFAULT_FUZZY_THRESHOLD, metavar='THRESHOLD',
+                        help='إعادة استخدام ترجمات الأسطر المتشابهة بهذه النسبة على الأقل '
+                             f'(معطل افتراضياً، وبدون قيمة: {DEFAULT_FUZZY_THRESHOLD:g})')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f'الحد الأقصى للطلبات في الثانية لكل العمليات، يخفض تلقائياً عند 429 (افتراضي: {DEFAULT_RATE:g}، 0 = بلا حد)')
+    parser.add_argument('-P', '--processes', type=int,
+                        help='عدد العمليات عند ترجمة عدة ملفات')
+    parser.add_argument('--incremental', action='store_true',
+                        help='ترجمة الأسطر الجديدة أو المعدلة فقط منذ آخر تشغيل')
+    parser.add_argument('--resume', action='store_true',
+                        help='استئناف ترجمة توقفت دون إعادة الأسطر المكتملة')
+    parser.add_argument('--stream', action='store_true',
+                        help='قراءة الملف وترجمته وكتابته على دفعات بذاكرة ثابتة (للملفات الضخمة)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help=f'عدد الأسطر في كل دفعة مع --stream (افتراضي: {CHUNK_SIZE})')
+    parser.add_argument('--report', help='حفظ تقرير الملفات بصيغة JSON (وضع الملفات المتعددة)')
+    parser.add_argument('--include-style', action='append', metavar='PATTERN',
+                        help='ترجمة الأنماط المطابقة فقط (يمكن تكراره، يدعم * و ?)')
+    parser.add_argument('--exclude-style', action='append', metavar='PATTERN',
+                        help='تخطي الأنماط المطابقة (يمكن تكراره؛ افتراضي: Sign و OP و ED والكاريوكي)')
+    parser.add_argument('--deny', action='append', metavar='REGEX',
+                        help='تخطي الأسطر المطابقة للتعبير النمطي (يمكن تكراره؛ افتراضي: ♪)')
+    parser.add_argument('--no-filter', action='store_true',
+                        help='ترجمة كل الأسطر دون تصفية مسبقة')
+    parser.add_argument('--stats', metavar='PATH',
+                        help='حفظ إحصاءات الأداء (الطلبات، زمن الاستجابة، الإعادات، المراحل) بصيغة JSON؛ - للطباعة')
 
     args = parser.parse_args()
 
@@ -199,25 +671,104 @@ def main():
         print("مثال: subtitle_translator.py input.ass -t ar")
         return 1
 
+    provider_options = {}
+    if args.provider == 'openai':
+        if not args.api_key:
+            print_error("يجب تحديد مفتاح OpenAI باستخدام --api-key أو المتغير OPENAI_API_KEY")
+            return 1
+        provider_options = {'api_key': args.api_key, 'model': args.model}
+    elif args.provider == 'local':
+        provider_options = {'model': args.model, 'base_url': args.local_url}
+
+    # Our own hardware has no quota: keep only the breaker for the local provider
+    rate = 0 if args.provider == 'local' else args.rate
+
+    line_filter = None
+    if not args.no_filter:
+        try:
+            line_filter = LineFilter(
+                include_styles=args.include_style,
+                exclude_styles=args.exclude_style or DEFAULT_EXCLUDE_STYLES,
+                denylist=args.deny or DEFAULT_DENYLIST
+            )
+        except re.error as e:
+            print_error(f"تعبير نمطي غير صالح: {e}")
+            return 1
+
+    # Bulk mode: directories, globs or several files
+    from bulk_translate import DEFAULT_PROCESSES, expand_inputs, is_bulk_input, print_report, run_bulk
+
+    if is_bulk_input(args.input):
+        files = expand_inputs(args.input, args.target)
+        if not files:
+            print_error("لم يتم العثور على ملفات ترجمة مدعومة")
+            return 1
+
+        print_info(f"عدد الملفات: {len(files)}")
+        reports = run_bulk(
+            files,
+            target_lang=args.target,
+            source_lang=args.source,
+            output_dir=args.output,
+            batch_size=args.batch_size,
+            max_workers=args.workers,
+            processes=args.processes or DEFAULT_PROCESSES,
+            use_cache=not args.no_cache,
+            cache_path=args.cache,
+            rate=rate,
+            incremental=args.incremental,
+            resume=args.resume,
+            line_filter=line_filter,
+            provider=args.provider,
+            provider_options=provider_options,
+            fuzzy_threshold=args.fuzzy or None,
+            stream=args.stream,
+            chunk_size=args.chunk_size
+        )
+        print_report(reports, args.report)
+        if args.stats:
+            save_stats(args.stats, {'files': reports})
+        return 0 if all(report['success'] for report in reports) else 1
+
+    input_file = args.input[0]
+
     # Check if input file exists
-    if not os.path.exists(args.input):
-        print_error(f"الملف غير موجود: {args.input}")
+    if not os.path.exists(input_file):
+        print_error(f"الملف غير موجود: {input_file}")
         return 1
 
     # Validate file extension
-    ext = Path(args.input).suffix.lower()
+    ext = Path(input_file).suffix.lower()
     if ext not in ['.ass', '.srt', '.ssa']:
         print_error(f"صيغة غير مدعومة: {ext}")
         print("الصيغ المدعومة: ASS, SRT, SSA")
         return 1
 
+    set_rate_limiter(RateLimiter(rate))
+
     # Translate
+    stats = {}
     success = translate_subtitles(
-        input_file=args.input,
+        input_file=input_file,
         output_file=args.output,
         target_lang=args.target,
-        source_lang=args.source
+        source_lang=args.source,
+        batch_size=args.batch_size,
+        use_cache=not args.no_cache,
+        cache_path=args.cache,
+        max_workers=args.workers,
+        incremental=args.incremental,
+        resume=args.resume,
+        line_filter=line_filter,
+        provider=args.provider,
+        provider_options=provider_options,
+        fuzzy_threshold=args.fuzzy or None,
+        stream=args.stream,
+        chunk_size=args.chunk_size,
+        stats=stats
     )
+    if args.stats:
+        save_stats(args.stats, stats)
 
     return 0 if success else 1
 
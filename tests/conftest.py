@@ -0,0 +1,57 @@
+import json
+import sys
+import urllib.error
+import urllib.request
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'devtools'))
+
+from mock_backend import start_server  # noqa: E402
+
+
+class StubError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class StubClient:
+    """The part of the OpenAI client that translate_with_openai uses, over urllib"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **options):
+        body = json.dumps({'model': model, 'messages': messages, **options}).encode('utf-8')
+        request = urllib.request.Request(
+            f"{self.base_url}/chat/completions", body, {'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                data = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise StubError(e.code)
+        message = SimpleNamespace(content=data['choices'][0]['message']['content'])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def stub():
+    """Start a mock backend with the given options; return (client, state)"""
+    servers = []
+
+    def start(**options):
+        server, state = start_server(**options)
+        servers.append(server)
+        return StubClient(f"http://127.0.0.1:{server.server_port}/v1"), state
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
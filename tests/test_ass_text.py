@@ -0,0 +1,79 @@
+import pytest
+
+from ass_text import is_translatable, parse_line
+
+LINES = [
+    r'{\an8}Hello there',
+    r'Hello\Nworld',
+    r'{\i1}Hi{\i0} there',
+    r'{\pos(1,2)}',
+    '  Hi  ',
+    r'{\p1}m 0 0 l 1 1{\p0}',
+    r'Hello{\p1}m 0 0 l 1 1{\p0}World',
+    r'A\hB',
+    r'Hi{\b1}!{\b0}',
+    '...',
+    r'{\i1}Hello\N{\i0}world',
+]
+
+
+@pytest.mark.parametrize('text', LINES)
+def test_untranslated_segments_restore_the_line_exactly(text):
+    line = parse_line(text)
+    assert line.restore([None] * len(line.segments)) == text
+    assert line.restore([segment.text for segment in line.segments]) == text
+
+
+def test_leading_tags_and_spaces_stay_out_of_the_segment():
+    line = parse_line(r'{\an8}  Hello there ')
+    assert [segment.text for segment in line.segments] == ['Hello there']
+    assert line.restore(['Bonjour']) == r'{\an8}  Bonjour '
+
+
+def test_inline_tags_become_placeholders():
+    line = parse_line(r'{\i1}Hi{\i0} there, {\b1}friend{\b0}!')
+    assert [segment.text for segment in line.segments] == ['Hi⟦0⟧ there, ⟦1⟧friend⟦2⟧!']
+    assert line.restore(['Salut⟦0⟧ à toi, ⟦1⟧ami⟦2⟧ !']) == r'{\i1}Salut{\i0} à toi, {\b1}ami{\b0} !'
+
+
+def test_adjacent_tags_share_one_placeholder():
+    line = parse_line(r'Hello{\i1}{\b1} world')
+    assert [segment.text for segment in line.segments] == ['Hello⟦0⟧ world']
+    assert line.restore(['Bonjour⟦0⟧ monde']) == r'Bonjour{\i1}{\b1} monde'
+
+
+def test_line_breaks_are_sent_as_spaces_and_put_back():
+    line = parse_line(r'Hello\Nmy world')
+    assert [segment.text for segment in line.segments] == ['Hello my world']
+    assert line.restore(['Bonjour mon monde']) == r'Bonjour\Nmon monde'
+
+
+def test_dropped_placeholders_are_reinserted_at_a_word_boundary():
+    line = parse_line(r'{\i1}Hi{\i0} there')
+    restored = line.restore(['Salut la'])
+    assert restored.count(r'{\i0}') == 1
+    assert restored.replace(r'{\i0}', '') == r'{\i1}Salut la'
+    assert r'Sa{\i0}' not in restored
+
+
+def test_duplicate_and_unknown_placeholders_are_removed():
+    line = parse_line(r'{\i1}Hi{\i0} there')
+    restored = line.restore(['Salut⟦0⟧ la ⟦0⟧⟦5⟧'])
+    assert restored.count(r'{\i0}') == 1
+    assert '⟦' not in restored
+
+
+def test_drawings_and_tag_only_lines_have_no_segments():
+    assert parse_line(r'{\p1}m 0 0 l 1 1{\p0}').segments == []
+    assert parse_line(r'{\pos(1,2)}').segments == []
+    assert parse_line('... !?').segments == []
+
+    line = parse_line(r'Hello{\p1}m 0 0 l 1 1{\p0}World')
+    assert [segment.text for segment in line.segments] == ['Hello', 'World']
+    assert line.restore(['Bonjour', 'Monde']) == r'Bonjour{\p1}m 0 0 l 1 1{\p0}Monde'
+
+
+def test_is_translatable_ignores_placeholders_and_digits():
+    assert is_translatable('Hi ⟦0⟧')
+    assert not is_translatable('⟦0⟧ 123 ⟦1⟧')
+    assert not is_translatable('')
@@ -0,0 +1,22 @@
+import json
+
+import benchmark
+
+
+def save(directory, name, settings):
+    path = directory / f"{name}.json"
+    path.write_text(json.dumps({'settings': settings, 'results': []}), encoding='utf-8')
+    return path
+
+
+def test_latest_result_skips_runs_with_other_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark, 'RESULTS_DIR', tmp_path)
+    settings = {'sizes': [200], 'latency': 0.05}
+    older = save(tmp_path, '20260101T000000Z', settings)
+    save(tmp_path, '20260102T000000Z', {'sizes': [200], 'latency': 0.3})
+    (tmp_path / '20260103T000000Z.json').write_text('{broken', encoding='utf-8')
+    current = save(tmp_path, '20260104T000000Z', settings)
+
+    assert benchmark.latest_result(settings, exclude=current) == older
+    assert benchmark.latest_result(settings) == current
+    assert benchmark.latest_result({'sizes': [1000]}) is None
@@ -0,0 +1,33 @@
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('pysubs2')
+pytest.importorskip('tqdm')
+
+from bulk_translate import expand_inputs, output_patterns  # noqa: E402
+
+
+def test_output_patterns_mirror_input_tree(tmp_path):
+    for season in ('season1', 'season2'):
+        (tmp_path / season).mkdir()
+        (tmp_path / season / 'ep01.ass').write_text('', encoding='utf-8')
+        (tmp_path / season / 'ep01_ar.ass').write_text('', encoding='utf-8')
+
+    files = expand_inputs([str(tmp_path)], 'ar')
+    assert [path.name for path in files] == ['ep01.ass', 'ep01.ass']
+
+    out = tmp_path / 'out'
+    patterns = output_patterns(files, str(out))
+    assert patterns == [
+        str(out / 'season1' / 'ep01_{lang}.ass'),
+        str(out / 'season2' / 'ep01_{lang}.ass'),
+    ]
+
+
+def test_output_patterns_flat_for_one_directory(tmp_path):
+    files = [tmp_path / 'a.srt', tmp_path / 'b.ass']
+    assert output_patterns(files, 'out') == [
+        str(Path('out') / 'a_{lang}.srt'),
+        str(Path('out') / 'b_{lang}.ass'),
+    ]
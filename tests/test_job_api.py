@@ -0,0 +1,74 @@
+import http.client
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+pytest.importorskip('pysubs2')
+pytest.importorskip('deep_translator')
+
+import job_api  # noqa: E402
+from job_api import JobService, OutputCache, parse_tokens, start_api_server  # noqa: E402
+
+
+def test_parse_tokens():
+    assert parse_tokens('ingest:a1, web:b:2 ,tok,') == {'a1': 'ingest', 'b:2': 'web', 'tok': 'default'}
+    assert parse_tokens(None) == {}
+
+
+def test_server_refuses_to_start_without_tokens(monkeypatch):
+    monkeypatch.delenv(job_api.API_TOKENS_ENV, raising=False)
+    with pytest.raises(Exception):
+        start_api_server(0, host='127.0.0.1', service=object())
+
+
+@pytest.fixture
+def api(tmp_path):
+    service = JobService(workers=1, cache=OutputCache(tmp_path / 'cache'))
+    server = start_api_server(0, host='127.0.0.1', service=service, tokens={'t1': 'ingest', 't2': 'web'})
+
+    def call(path, token=None, body=None):
+        headers = {'Authorization': f"Bearer {token}"} if token else {}
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(f"http://127.0.0.1:{server.server_port}{path}", data, headers)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    call.port = server.server_port
+    yield service, call
+    server.shutdown()
+    server.server_close()
+
+
+def test_requests_need_a_valid_token(api):
+    _, call = api
+    assert call('/jobs')[0] == 401
+    assert call('/jobs', 'wrong')[0] == 401
+    assert call('/jobs', 't1') == (200, {'jobs': []})
+
+
+def test_clients_only_see_their_own_jobs(api):
+    service, call = api
+    job = {'id': 'a' * 32, 'client': 'ingest'}
+    service.jobs[job['id']] = job
+
+    assert call(f"/jobs/{job['id']}", 't2')[0] == 404
+    assert call('/jobs', 't2') == (200, {'jobs': []})
+
+
+def test_invalid_content_length_is_rejected_before_reading(api):
+    _, call = api
+    for length, status in (('-1', 400), ('abc', 400), (str(job_api.MAX_REQUEST_BYTES + 1), 413)):
+        connection = http.client.HTTPConnection('127.0.0.1', call.port)
+        connection.putrequest('POST', '/jobs')
+        connection.putheader('Authorization', 'Bearer t1')
+        connection.putheader('Content-Length', length)
+        connection.endheaders()
+        response = connection.getresponse()
+        assert response.status == status
+        assert 'error' in json.loads(response.read())
+        connection.close()
@@ -0,0 +1,52 @@
+from job_state import Journal
+from translation_engine import translate_texts
+
+
+def fake_request(text, source, target):
+    # 'World' never comes back, as after a ban or an outage
+    if text == 'World':
+        return None
+    return text.upper()
+
+
+def test_partially_failed_lines_are_reported_incomplete():
+    texts = ['Hello', r'Hello{\p1}m 0 0 l 1 1{\p0}World', 'World']
+    results = {}
+
+    translated = translate_texts(
+        texts, 'en', 'ar', fake_request, pack_size=1,
+        result_callback=lambda i, text, complete: results.__setitem__(i, (text, complete))
+    )
+
+    assert translated == ['HELLO', r'HELLO{\p1}m 0 0 l 1 1{\p0}World', 'World']
+    assert results == {
+        0: ('HELLO', True),
+        1: (r'HELLO{\p1}m 0 0 l 1 1{\p0}World', False),
+        2: ('World', False),
+    }
+
+
+def test_incomplete_lines_are_not_journaled(tmp_path):
+    settings = {'target': 'ar'}
+    path = tmp_path / 'out.ass.journal'
+    journal = Journal(path, settings)
+    journal.record('Hello', 'HELLO')
+    journal.record('Hello World', 'HELLO World', complete=False)
+    journal.record('Same', 'Same')
+    journal.close()
+
+    resumed = Journal(path, settings, resume=True)
+    assert resumed.lookup('Hello') == 'HELLO'
+    assert resumed.lookup('Hello World') is None
+    assert resumed.lookup('Same') is None
+    resumed.discard()
+    assert not path.exists()
+
+
+def test_journal_from_other_settings_is_ignored(tmp_path):
+    path = tmp_path / 'out.ass.journal'
+    journal = Journal(path, {'target': 'ar'})
+    journal.record('Hello', 'HELLO')
+    journal.close()
+
+    assert Journal(path, {'target': 'fr'}, resume=True).lookup('Hello') is None
@@ -0,0 +1,42 @@
+import os
+import threading
+import time
+
+from job_store import FairQueue, OutputCache
+
+
+def test_output_cache_drops_expired_and_least_recently_used_files(tmp_path):
+    cache = OutputCache(tmp_path / 'cache', max_bytes=25, ttl=100)
+    now = time.time()
+    paths = []
+    for i in range(4):
+        source = tmp_path / f"out{i}.ass"
+        source.write_text('x' * 10)
+        paths.append(cache.put(f"{i:02d}key", '.ass', source))
+        os.utime(paths[-1], (now - 1000 + i, now - 50))
+    os.utime(paths[0], (now, now - 50))
+    os.utime(paths[3], (now - 997, now - 200))
+
+    assert cache.get('03key', '.ass') is None
+    assert cache.evict() == 2
+    assert [path.exists() for path in paths] == [True, False, True, False]
+
+
+def test_fair_queue_serves_clients_round_robin():
+    queue = FairQueue()
+    for i in range(3):
+        queue.put('bulk', f"bulk{i}")
+    queue.put('web', 'web0')
+    queue.put('web', 'web1')
+
+    assert [queue.get() for _ in range(5)] == ['bulk0', 'web0', 'bulk1', 'web1', 'bulk2']
+
+
+def test_fair_queue_get_waits_for_a_job():
+    queue = FairQueue()
+    got = []
+    worker = threading.Thread(target=lambda: got.append(queue.get()))
+    worker.start()
+    queue.put('web', 'job')
+    worker.join(timeout=5)
+    assert got == ['job']
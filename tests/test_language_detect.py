@@ -0,0 +1,42 @@
+from language_detect import detect_language, group_by_source, line_sources
+
+TRADITIONAL = ['這是我們的學校', '你說什麼？', '謝謝你來看我', '我們還沒見過面', '這個問題很難']
+SIMPLIFIED = ['这是我们的学校', '你说什么？', '谢谢你来看我', '我们还没见过面', '这个问题很难']
+
+
+def test_chinese_variants_are_told_apart():
+    assert detect_language(TRADITIONAL) == 'zh-TW'
+    assert detect_language(SIMPLIFIED) == 'zh-CN'
+
+
+def test_han_text_without_variant_characters_is_not_guessed():
+    assert detect_language(['你好', '先生', '中文']) == 'auto'
+
+
+def test_traditional_file_is_translated_into_simplified():
+    sources = line_sources(TRADITIONAL)
+    groups = group_by_source(range(len(TRADITIONAL)), sources, 'zh-CN')
+    assert groups == {'zh-TW': list(range(len(TRADITIONAL)))}
+
+
+def test_undetermined_han_lines_are_kept_for_a_chinese_target():
+    texts = ['你好', '先生', '中文']
+    for target in ('zh-CN', 'zh-TW'):
+        assert group_by_source(range(3), line_sources(texts), target) == {'auto': [0, 1, 2]}
+
+
+def test_lines_already_in_the_target_are_left_out():
+    texts = SIMPLIFIED + ['Hello there, how are you? What is that?']
+    sources = line_sources(texts)
+    assert sources[:-1] == ['zh-CN'] * len(SIMPLIFIED)
+    assert group_by_source(range(len(texts)), sources, 'zh-CN') == {sources[-1]: [len(SIMPLIFIED)]}
+
+
+def test_japanese_kanji_only_lines_stay_with_the_file():
+    texts = ['こんにちは、先生', '先生', 'ありがとうございます', '生徒会長']
+    assert line_sources(texts) == ['ja'] * 4
+
+
+def test_korean_hanja_only_lines_stay_with_the_file():
+    texts = ['안녕하세요 선생님', '감사합니다', '學生會長', '先生', '잘 지냈어요?', '這個問題']
+    assert line_sources(texts) == ['ko'] * len(texts)
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from line_filter import (
+    REASON_DENYLIST, REASON_NO_LETTERS, REASON_STYLE, REASON_TARGET_SCRIPT, LineFilter, line_script
+)
+
+
+def events(*texts, style='Default'):
+    return [SimpleNamespace(text=text, style=style) for text in texts]
+
+
+JAPANESE = events('先生', 'こんにちは、先生', '生徒会長です', '生徒会長', 'ありがとう')
+
+
+def test_line_script():
+    assert line_script('こんにちは、先生') == 'japanese'
+    assert line_script('先生') == 'han'
+    assert line_script('안녕하세요 선생님') == 'korean'
+    assert line_script('Hello there') == 'latin'
+    assert line_script('Hello 先生 こんにちは') is None
+    assert line_script('123 !') is None
+
+
+def test_style_denylist_and_letterless_lines_are_skipped():
+    reasons = LineFilter().classify(
+        events('♪ la la la', '...', 'Hello') + events('Title', style='Sign-Main'), 'ar', 'en'
+    )
+    assert reasons == [REASON_DENYLIST, REASON_NO_LETTERS, None, REASON_STYLE]
+
+
+def test_lines_in_the_target_script_are_skipped():
+    reasons = LineFilter().classify(events('Hello there', 'مرحبا بك', 'Good night'), 'ar', 'auto')
+    assert reasons == [None, REASON_TARGET_SCRIPT, None]
+
+
+def test_same_script_pairs_translate_everything():
+    assert LineFilter().classify(events('Hello', 'Bonjour'), 'fr', 'en') == [None, None]
+
+
+def test_kanji_only_japanese_lines_are_translated_into_chinese():
+    for source in ('ja', 'auto'):
+        for target in ('zh-CN', 'zh-TW'):
+            assert LineFilter().classify(JAPANESE, target, source) == [None] * len(JAPANESE)
+
+
+def test_kanji_only_lines_of_a_japanese_file_with_a_wrong_source():
+    # The file is Japanese even though the user picked another source
+    assert LineFilter().classify(JAPANESE, 'zh-CN', 'en') == [None] * len(JAPANESE)
+
+
+def test_hanja_only_korean_lines_are_translated_into_chinese():
+    korean = events('先生', '안녕하세요 선생님', '감사합니다')
+    assert LineFilter().classify(korean, 'zh-CN', 'ko') == [None, None, None]
+
+
+def test_chinese_lines_in_a_latin_file_are_skipped_for_a_chinese_target():
+    reasons = LineFilter().classify(events('Hello there', '你好', 'Good night'), 'zh-CN', 'en')
+    assert reasons == [None, REASON_TARGET_SCRIPT, None]
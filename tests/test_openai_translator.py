@@ -0,0 +1,119 @@
+import threading
+import time
+
+from openai_translator import RequestBudget, parse_response, translate_with_openai
+
+PREFIX = '[stub] '
+
+
+def make_texts(count):
+    return [f"line {i}" for i in range(count)]
+
+
+def test_parse_response_uses_positional_keys():
+    # Key 1 is expected[0]; missing, empty, unknown and out-of-range keys are dropped
+    content = '{"1": "a", "3": "c", "4": "d", "2": " ", "x": "y"}'
+    assert parse_response(content, [10, 11, 12]) == {10: 'a', 12: 'c'}
+
+
+def test_parse_response_rejects_malformed_content():
+    assert parse_response('not json', [0]) == {}
+    assert parse_response('["a"]', [0]) == {}
+    assert parse_response(None, [0]) == {}
+
+
+def test_results_keep_input_order(stub):
+    client, state = stub(latency=0.01)
+    texts = make_texts(250)
+    received = {}
+    stats = {}
+
+    result = translate_with_openai(
+        texts, 'en', 'ar', 'key', max_lines=20, max_concurrency=4, client=client,
+        stats=stats, result_callback=received.__setitem__
+    )
+
+    assert result == [PREFIX + text for text in texts]
+    assert received == dict(enumerate(result))
+    assert stats == {'batches': 13, 'failed': 0}
+    assert state.snapshot()['requests'] == 13
+
+
+def test_batches_run_concurrently_up_to_the_limit(stub):
+    client, state = stub(latency=0.2)
+    texts = make_texts(120)
+
+    started = time.monotonic()
+    translate_with_openai(texts, 'en', 'ar', 'key', max_lines=10, max_concurrency=4, client=client)
+    elapsed = time.monotonic() - started
+
+    assert state.snapshot()['max_in_flight'] == 4
+    # 12 batches of 0.2 s each, four at a time
+    assert elapsed < 12 * 0.2 / 2
+
+
+def test_rpm_budget_delays_requests_beyond_the_window(stub):
+    class ShortBudget(RequestBudget):
+        WINDOW = 0.5
+
+    client, state = stub()
+    budget = ShortBudget(rpm=3, tpm=None)
+    texts = make_texts(6)
+
+    started = time.monotonic()
+    result = translate_with_openai(
+        texts, 'en', 'ar', 'key', max_lines=1, max_concurrency=6, client=client, budget=budget
+    )
+    elapsed = time.monotonic() - started
+
+    assert result == [PREFIX + text for text in texts]
+    assert state.snapshot()['requests'] == 6
+    # Three requests fit in the first window, the other three wait for it to pass
+    assert elapsed >= ShortBudget.WINDOW
+
+
+def test_budget_is_shared_between_threads():
+    class ShortBudget(RequestBudget):
+        WINDOW = 0.3
+
+    budget = ShortBudget(rpm=2, tpm=None)
+    waits = []
+    lock = threading.Lock()
+
+    def acquire():
+        waited = budget.acquire(10)
+        with lock:
+            waits.append(waited)
+
+    threads = [threading.Thread(target=acquire) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(1 for waited in waits if waited < 0.05) == 2
+    assert sum(1 for waited in waits if waited >= ShortBudget.WINDOW * 0.8) == 2
+
+
+def test_tpm_budget_lets_one_oversized_request_through():
+    budget = RequestBudget(rpm=None, tpm=100)
+    assert budget.acquire(500) < 0.05
+
+
+def test_misaligned_batches_are_resubmitted(stub):
+    # Every multi-line batch comes back with one line missing
+    client, state = stub(drop_rate=1.0)
+    texts = make_texts(40)
+    stats = {}
+
+    result = translate_with_openai(
+        texts, 'en', 'ar', 'key', max_lines=10, max_concurrency=2, client=client, stats=stats
+    )
+
+    assert result == [PREFIX + text for text in texts]
+    assert stats['failed'] == 0
+    snapshot = state.snapshot()
+    assert snapshot['dropped'] >= 4
+    # Only the missing lines are sent again, not whole batches
+    assert snapshot['requests'] == 4 + snapshot['dropped']
+
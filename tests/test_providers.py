@@ -0,0 +1,75 @@
+import pytest
+
+pytest.importorskip('openai')
+pytest.importorskip('bs4')
+pytest.importorskip('deep_translator')
+
+from providers import MAX_PROVIDERS, GoogleProvider, OpenAIProvider, Provider, get_provider  # noqa: E402
+from translation_memory import TranslationMemory  # noqa: E402
+
+PREFIX = '[stub] '
+
+
+def test_provider_is_abstract():
+    with pytest.raises(TypeError):
+        Provider()
+
+
+def test_openai_provider_reads_and_writes_the_translation_memory(stub, tmp_path):
+    client, state = stub()
+    provider = OpenAIProvider('key', base_url=client.base_url)
+    memory = TranslationMemory(tmp_path / 'memory.sqlite3')
+    texts = ['Hello there', r'{\i1}Good{\i0} night', 'Hello there']
+
+    stats = {}
+    first = provider.translate_batch(texts, 'en', 'ar', memory=memory, stats=stats)
+    requests = state.snapshot()['requests']
+    assert first == [PREFIX + 'Hello there', r'{\i1}' + PREFIX + r'Good{\i0} night', PREFIX + 'Hello there']
+    assert stats['cached'] == 0
+
+    stats = {}
+    second = provider.translate_batch(texts, 'en', 'ar', memory=memory, stats=stats)
+    assert second == first
+    assert stats['cached'] == 2
+    assert state.snapshot()['requests'] == requests
+    provider.close()
+
+
+def test_openai_provider_uses_fuzzy_matches(stub, tmp_path):
+    client, state = stub()
+    provider = OpenAIProvider('key', base_url=client.base_url)
+    memory = TranslationMemory(tmp_path / 'memory.sqlite3')
+    provider.translate_batch(['Are you coming, Taro?'], 'en', 'ar', memory=memory)
+    requests = state.snapshot()['requests']
+
+    stats = {}
+    result = provider.translate_batch(
+        ['are you coming, taro'], 'en', 'ar', memory=memory, stats=stats, fuzzy_threshold=0.97
+    )
+    assert result == [PREFIX + 'Are you coming, Taro']
+    assert stats['fuzzy'] == 1
+    assert state.snapshot()['requests'] == requests
+    provider.close()
+
+
+def test_get_provider_keeps_a_bounded_number_of_instances():
+    first = get_provider('google', max_workers=1)
+    assert get_provider('google', max_workers=1) is first
+    for workers in range(2, MAX_PROVIDERS + 2):
+        get_provider('google', max_workers=workers)
+    assert get_provider('google', max_workers=1) is not first
+
+
+def test_google_provider_fails_when_the_page_has_no_translation(monkeypatch):
+    class Response:
+        status_code = 200
+        text = '<html><body>Before you continue</body></html>'
+
+        def raise_for_status(self):
+            pass
+
+    provider = GoogleProvider(max_workers=1)
+    monkeypatch.setattr(provider.session, 'get', lambda *args, **kwargs: Response())
+    with pytest.raises(Exception):
+        provider.request('Hello', 'en', 'ar')
+    provider.close()
@@ -0,0 +1,101 @@
+import time
+
+import rate_limiter
+from rate_limiter import (
+    ADDITIVE_INCREASE, FAILURE_THRESHOLD, MAX_BACKOFF, MIN_RATE, RateLimiter, backoff_delay,
+    get_rate_limiter, set_rate_limiter
+)
+
+
+def test_unlimited_rate_never_waits():
+    limiter = RateLimiter(rate=0)
+    assert all(limiter.acquire() == 0 for _ in range(100))
+
+
+def test_requests_are_paced_at_the_rate():
+    limiter = RateLimiter(rate=20)
+    started = time.monotonic()
+    for _ in range(11):
+        limiter.acquire()
+    # One token is available at once, the other ten come at 20 per second
+    assert time.monotonic() - started >= 10 / 20 * 0.9
+
+
+def test_throttle_halves_the_rate_once_per_burst():
+    limiter = RateLimiter(rate=8)
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.rate == 4
+
+    limiter._state[rate_limiter._DECREASED] -= rate_limiter.DECREASE_COOLDOWN
+    limiter.on_throttle()
+    assert limiter.rate == 2
+
+
+def test_rate_stays_between_the_minimum_and_the_configured_rate():
+    limiter = RateLimiter(rate=1)
+    for _ in range(5):
+        limiter._state[rate_limiter._DECREASED] = 0
+        limiter.on_throttle()
+    assert limiter.rate == MIN_RATE
+
+    limiter.on_success()
+    assert limiter.rate == MIN_RATE + ADDITIVE_INCREASE
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.rate == 1
+
+
+def test_breaker_opens_after_consecutive_failures(monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'BREAKER_COOLDOWN', 0.3)
+    limiter = RateLimiter(rate=0)
+    for _ in range(FAILURE_THRESHOLD - 1):
+        limiter.on_failure()
+    assert not limiter.is_open
+
+    limiter.on_failure()
+    assert limiter.is_open
+    waited = limiter.acquire()
+    assert 0.2 <= waited < 1.0
+    assert not limiter.is_open
+
+
+def test_half_open_breaker_trips_again_with_a_longer_cooldown(monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'BREAKER_COOLDOWN', 0.1)
+    limiter = RateLimiter(rate=0)
+    for _ in range(FAILURE_THRESHOLD):
+        limiter.on_failure()
+    limiter.acquire()
+
+    # One more failure after the cooldown is enough, and the pause doubles
+    limiter.on_failure()
+    assert limiter.is_open
+    assert limiter.acquire() >= 0.15
+
+
+def test_success_resets_the_failure_count():
+    limiter = RateLimiter(rate=0)
+    for _ in range(FAILURE_THRESHOLD - 1):
+        limiter.on_failure()
+    limiter.on_success()
+    limiter.on_failure()
+    assert not limiter.is_open
+
+
+def test_backoff_delay_is_bounded():
+    for attempt in range(10):
+        delay = backoff_delay(attempt)
+        assert 0 <= delay <= min(MAX_BACKOFF, 2 ** attempt)
+
+
+def test_provider_limiters_fall_back_to_the_default():
+    shared, google = RateLimiter(rate=1), RateLimiter(rate=2)
+    try:
+        set_rate_limiter(shared)
+        set_rate_limiter(google, 'google')
+        assert get_rate_limiter('google') is google
+        assert get_rate_limiter('openai') is shared
+    finally:
+        set_rate_limiter(None)
+        set_rate_limiter(None, 'google')
+    assert get_rate_limiter('google') is None
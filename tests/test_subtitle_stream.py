@@ -0,0 +1,172 @@
+import pytest
+
+from job_state import Journal
+from subtitle_stream import stream_file
+from translation_engine import translate_texts
+
+ASS = (
+    '\ufeff[Script Info]\r\n'
+    '; Script generated by Aegisub\r\n'
+    'ScriptType: v4.00+\r\n'
+    'PlayResX: 1280\r\n'
+    '\r\n'
+    '[V4+ Styles]\r\n'
+    'Format: Name, Fontname, Fontsize, PrimaryColour, Bold, Italic, Alignment\r\n'
+    'Style: Default,Arial,48,&H00FFFFFF,0,0,2\r\n'
+    'Style: Sign,Arial,30,&H00FFFFFF,0,0,8\r\n'
+    '\r\n'
+    '[Events]\r\n'
+    'Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\r\n'
+    'Comment: 0,0:00:00.00,0:00:01.00,Default,,0,0,0,,Translator note, keep as is\r\n'
+    'Dialogue: 0,0:00:01.00,0:00:02.00,Default,,0,0,0,,{\\an8}Wait, what?\r\n'
+    'Dialogue: 0,0:00:02.00,0:00:03.00,Sign,,0,0,0,,Go {\\i1}now{\\i0}\\Nplease\r\n'
+    'Dialogue: 0,0:00:03.00,0:00:04.00,Default,,0,0,0,,{\\p1}m 0 0 l 10 0 10 10{\\p0}\r\n'
+)
+
+
+def upper(text, source, target):
+    return text.upper()
+
+
+def translate_upper(events):
+    results = translate_texts([event.text for event in events], 'en', 'ar', upper, pack_size=1)
+    for event, translated in zip(events, results):
+        event.text = translated
+
+
+def write(path, content):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(content)
+
+
+def read(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return f.read()
+
+
+def test_srt_round_trip_keeps_bom_crlf_and_tags(tmp_path):
+    source = tmp_path / 'in.srt'
+    write(source, (
+        '\ufeff1\r\n'
+        '00:00:01,000 --> 00:00:02,000\r\n'
+        'Hello <i>there</i>\r\n'
+        'friend\r\n'
+        '\r\n'
+        '2\r\n'
+        '00:00:03,000 --> 00:00:04,000\r\n'
+        'Bye\r\n'
+    ))
+
+    stream_file(str(source), str(tmp_path / 'out.srt'), translate_upper)
+
+    assert read(tmp_path / 'out.srt') == (
+        '\ufeff1\r\n'
+        '00:00:01,000 --> 00:00:02,000\r\n'
+        'HELLO <i>THERE</i>\r\n'
+        'FRIEND\r\n'
+        '\r\n'
+        '2\r\n'
+        '00:00:03,000 --> 00:00:04,000\r\n'
+        'BYE\r\n'
+    )
+
+
+def test_ass_round_trip_keeps_headers_and_comments(tmp_path):
+    source = tmp_path / 'in.ass'
+    write(source, ASS)
+
+    seen = []
+
+    def translate(events):
+        seen.extend((event.style, event.text) for event in events)
+        translate_upper(events)
+
+    stream_file(str(source), str(tmp_path / 'out.ass'), translate)
+
+    assert seen == [
+        ('Default', '{\\an8}Wait, what?'),
+        ('Sign', 'Go {\\i1}now{\\i0}\\Nplease'),
+        ('Default', '{\\p1}m 0 0 l 10 0 10 10{\\p0}'),
+    ]
+    assert read(tmp_path / 'out.ass') == (
+        ASS.replace('{\\an8}Wait, what?', '{\\an8}WAIT, WHAT?')
+        .replace('Go {\\i1}now{\\i0}\\Nplease', 'GO {\\i1}NOW{\\i0}\\NPLEASE')
+    )
+
+
+def test_large_input_is_translated_chunk_by_chunk(tmp_path):
+    source = tmp_path / 'in.srt'
+    write(source, '\n'.join(
+        f"{i}\n00:00:{i:02},000 --> 00:00:{i:02},500\nLine {i}\n" for i in range(1, 8)
+    ))
+    sizes = []
+
+    def translate(events):
+        sizes.append(len(events))
+        translate_upper(events)
+
+    stream_file(str(source), str(tmp_path / 'out.srt'), translate, chunk_size=3)
+
+    assert sizes == [3, 3, 1]
+    output = read(tmp_path / 'out.srt')
+    assert [line for line in output.splitlines() if line.startswith('LINE')] == [
+        f"LINE {i}" for i in range(1, 8)
+    ]
+
+
+def test_interrupted_run_resumes_from_the_journal(tmp_path):
+    source = tmp_path / 'in.srt'
+    write(source, '\n'.join(
+        f"{i}\n00:00:{i:02},000 --> 00:00:{i:02},500\nLine {i}\n" for i in range(1, 5)
+    ))
+    output = tmp_path / 'out.srt'
+    journal_file = tmp_path / 'out.srt.journal'
+    settings = {'target': 'ar'}
+    requests = []
+
+    def request(text, source, target):
+        requests.append(text)
+        return text.upper()
+
+    def run(journal, fail_after=None):
+        chunks = 0
+
+        def translate(events):
+            nonlocal chunks
+            if chunks == fail_after:
+                raise KeyboardInterrupt
+            chunks += 1
+            todo = []
+            for event in events:
+                previous = journal.lookup(event.text)
+                if previous is None:
+                    todo.append(event)
+                else:
+                    event.text = previous
+            results = translate_texts(
+                [event.text for event in todo], 'en', 'ar', request, pack_size=1,
+                result_callback=lambda k, translated, complete: journal.record(
+                    todo[k].text, translated, complete
+                )
+            )
+            for event, translated in zip(todo, results):
+                event.text = translated
+
+        try:
+            stream_file(str(source), str(output), translate, chunk_size=2)
+        finally:
+            journal.close()
+
+    with pytest.raises(KeyboardInterrupt):
+        run(Journal(journal_file, settings, track=False), fail_after=1)
+    # Nothing half-written is left behind
+    assert not output.exists()
+    assert list(tmp_path.glob('*.tmp')) == []
+    assert requests == ['Line 1', 'Line 2']
+
+    requests.clear()
+    run(Journal(journal_file, settings, resume=True, track=False))
+    assert requests == ['Line 3', 'Line 4']
+    assert [line for line in read(output).splitlines() if line.startswith('LINE')] == [
+        f"LINE {i}" for i in range(1, 5)
+    ]
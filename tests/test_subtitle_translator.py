@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip('pysubs2')
+pytest.importorskip('tqdm')
+
+from job_state import Journal  # noqa: E402
+from subtitle_translator import plan_target, translate_target  # noqa: E402
+from translation_engine import PreparedTexts  # noqa: E402
+
+TEXTS = ['Hello', r'{\p1}m 0 0 l 1 1{\p0}', r'{\an8}', 'مرحبا', 'Bye']
+SOURCES = ['en', 'en', 'en', 'ar', 'en']
+
+
+class Translator:
+    def __init__(self):
+        self.batches = []
+
+    def translate_batch(self, texts, source, target, result_callback=None, keep_results=True, **kwargs):
+        self.batches.append((texts, source))
+        for i, text in enumerate(texts):
+            result_callback(i, text.upper(), True)
+        return [text.upper() for text in texts] if keep_results else []
+
+
+def test_plan_counts_lines_that_are_never_sent(tmp_path):
+    output = str(tmp_path / 'out_ar.ass')
+    settings = {'provider': 'google', 'source': 'auto', 'target': 'ar'}
+    journal = Journal(tmp_path / 'out_ar.ass.journal', settings)
+    journal.record('Bye', 'وداعا')
+    journal.close()
+
+    prepared = PreparedTexts(TEXTS)
+    job = plan_target('ar', output, [], TEXTS, prepared, SOURCES, 'auto', 'google', resume=True)
+
+    assert job['carried'] == [4]
+    assert job['translated'][4] == 'وداعا'
+    assert job['todo'] == [0, 1, 2, 3]
+    # Drawing, tag-only and Arabic lines need no request
+    assert job['groups'] == {'en': [0]}
+    assert job['done'] == 3
+
+    translator = Translator()
+    finished = []
+    translate_target(
+        translator, job, TEXTS, prepared, 50, None, None, 1,
+        result_callback=lambda idx, translated, complete: finished.append((idx, translated))
+    )
+    job['journal'].close()
+    assert translator.batches == [(['Hello'], 'en')]
+    assert finished == [(0, 'HELLO')]
+    assert job['done'] + len(finished) == len(job['todo'])
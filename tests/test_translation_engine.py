@@ -0,0 +1,34 @@
+from translation_engine import pack_fragments, translate_texts
+
+
+def test_failed_fragments_are_counted():
+    def request(text, source, target):
+        return None if 'World' in text else text.upper()
+
+    stats = {}
+    translated = translate_texts(['Hello', 'World', 'World', 'Bye'], 'en', 'ar', request, pack_size=1, stats=stats)
+
+    assert translated == ['HELLO', 'World', 'World', 'BYE']
+    assert stats['failed'] == 1
+    assert stats['unique'] == 3
+
+
+def test_duplicates_are_sent_once():
+    sent = []
+
+    def request(text, source, target):
+        sent.append(text)
+        return text.upper()
+
+    stats = {}
+    translated = translate_texts(['Hi', ' hi ', 'Hi', 'Bye'], 'en', 'ar', request, stats=stats)
+
+    assert translated == ['HI', ' HI ', 'HI', 'BYE']
+    assert sent == ['Hi\nhi\nBye']
+    assert stats['failed'] == 0
+
+
+def test_pack_fragments_respects_item_and_character_limits():
+    assert pack_fragments(['a', 'b', 'c'], max_items=2) == [[0, 1], [2]]
+    assert pack_fragments(['aaaa', 'bbbb', 'c'], max_chars=10) == [[0, 1], [2]]
+    assert pack_fragments(['a', 'x\ny', 'b']) == [[1], [0, 2]]
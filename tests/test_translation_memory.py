@@ -0,0 +1,73 @@
+import pytest
+
+from translation_memory import DEFAULT_FUZZY_THRESHOLD, TranslationMemory, adapt_translation
+
+NAMESPACE = 'google:en>ar'
+
+
+@pytest.mark.parametrize('text, source', [
+    ("I can't do it.", "I can do it."),
+    ("You are not my friend", "You are my friend"),
+    ("I will kill her tomorrow", "I will kill him tomorrow"),
+    ("I will kill him tomorrow", "I will kill her tomorrow"),
+    ("He is my sister", "She is my sister"),
+    ("They left early", "We left early"),
+    ("I love you", "I hate you"),
+])
+def test_negation_and_pronoun_changes_are_rejected(text, source):
+    assert adapt_translation(text, source, 'ترجمة')[0] == 0.0
+
+
+def test_case_spacing_and_punctuation_changes_score_one():
+    score, adapted = adapt_translation('wait,  taro', 'Wait, Taro!', 'انتظر يا تارو!')
+    assert score == 1.0
+    assert adapted == 'انتظر يا تارو'
+
+
+def test_names_and_numbers_are_swapped_when_found_verbatim():
+    assert adapt_translation('Wait, Jiro!', 'Wait, Taro!', 'انتظر يا Taro!') == (1.0, 'انتظر يا Jiro!')
+    assert adapt_translation('Room 12', 'Room 13', 'الغرفة 13') == (1.0, 'الغرفة 12')
+
+
+def test_names_and_numbers_that_cannot_be_swapped_are_rejected():
+    assert adapt_translation('Wait, Jiro!', 'Wait, Taro!', 'انتظر يا تارو!')[0] == 0.0
+    assert adapt_translation('Room 12', 'Room 13', 'الغرفة الثالثة عشرة')[0] == 0.0
+
+
+def test_honorific_changes_pass():
+    assert adapt_translation('Taro-kun, wait!', 'Taro-san, wait!', 'Taro-san، انتظر!') == (
+        1.0, 'Taro-kun، انتظر!'
+    )
+    assert adapt_translation('Taro, wait!', 'Taro-san, wait!', 'تارو، انتظر!')[0] == 1.0
+
+
+def test_tag_placeholders_lower_the_score():
+    score, _ = adapt_translation('⟦0⟧Hello there', 'Hello there', 'مرحبا')
+    assert 0 < score < DEFAULT_FUZZY_THRESHOLD
+
+
+@pytest.fixture
+def memory(tmp_path):
+    return TranslationMemory(tmp_path / 'memory.sqlite3')
+
+
+def test_exact_matches(memory):
+    memory.put_many(NAMESPACE, [('Hello', 'مرحبا'), ('Bye', 'وداعا')])
+    assert memory.get_many(NAMESPACE, ['Hello', 'Bye', 'Other']) == {'Hello': 'مرحبا', 'Bye': 'وداعا'}
+    assert memory.get_many('google:en>fr', ['Hello']) == {}
+
+
+def test_fuzzy_lookup_rejects_opposite_meanings(memory):
+    memory.put_many(NAMESPACE, [
+        ('I can do it.', 'أستطيع فعلها.'),
+        ('I will kill him tomorrow', 'سأقتله غدا'),
+        ('She is my sister', 'هي أختي'),
+        ('Are you coming, Taro?', 'هل ستأتي يا Taro؟'),
+    ])
+    found = memory.get_fuzzy_many(NAMESPACE, [
+        "I can't do it.",
+        'I will kill her tomorrow',
+        'He is my sister',
+        'are you coming, Jiro',
+    ], DEFAULT_FUZZY_THRESHOLD)
+    assert found == {'are you coming, Jiro': 'هل ستأتي يا Jiro؟'}
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Translation Engine - محرك الترجمة المشترك
+Concurrent translation pipeline shared by the CLI and the web app
+"""
+
+import re
+import unicodedata
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ass_text import parse_line
+from metrics import get_metrics
+from rate_limiter import ThrottledError, backoff_delay, get_rate_limiter
+from translation_memory import TranslationMemory, make_namespace
+
+# Attempts per request; the delay between them comes from backoff_delay()
+MAX_RETRIES = 3
+
+# Maximum number of provider requests in flight
+DEFAULT_WORKERS = 8
+
+# Request packing: many fragments are joined into one provider request.
+# Google is queried with a GET request, so keep the packed text well under
+# the URL length limit (non-Latin text is percent-encoded to ~9 bytes/char).
+PACK_SEPARATOR = '\n'
+MAX_PACK_CHARS = 1800
+DEFAULT_PACK_SIZE = 50
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# One provider request: (text, source, target) -> translation; raises on failure
+RequestFunc = Callable[[str, str, str], Optional[str]]
+
+
+def normalize_fragment(fragment: str) -> str:
+    """Normalize a fragment so repeated lines share one translation"""
+    return WHITESPACE_PATTERN.sub(' ', unicodedata.normalize('NFC', fragment)).strip()
+
+
+class PreparedTexts:
+    """Texts parsed into segments once, reusable for any number of target languages
+
+    Parsing and normalization do not depend on the target, so a file
+    translated into several languages is segmented a single time and each
+    target takes the subset of lines it still needs.
+    """
+
+    def __init__(self, texts: List[str], lines: Optional[list] = None, keys: Optional[list] = None):
+        self.texts = texts
+        # Tag-aware segmentation: one segment per logical sentence, with inline
+        # tags as placeholders; drawings and tag-only text are never sent
+        self.lines = lines if lines is not None else [parse_line(text) if text else None for text in texts]
+        # Normalized text of every segment, the deduplication key
+        self.keys = keys if keys is not None else [
+            [normalize_fragment(segment.text) for segment in line.segments] if line else []
+            for line in self.lines
+        ]
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def subset(self, indices: List[int]) -> 'PreparedTexts':
+        """Return the prepared texts at indices, without parsing them again"""
+        return PreparedTexts(
+            [self.texts[i] for i in indices],
+            [self.lines[i] for i in indices],
+            [self.keys[i] for i in indices]
+        )
+
+    def groups(self) -> Dict[str, List[Tuple[int, int]]]:
+        """Map every distinct segment to its (text index, segment index) occurrences"""
+        groups: Dict[str, List[Tuple[int, int]]] = {}
+        for i, keys in enumerate(self.keys):
+            for k, key in enumerate(keys):
+                groups.setdefault(key, []).append((i, k))
+        return groups
+
+
+def lookup_memory(
+    memory: TranslationMemory,
+    namespace: str,
+    keys: List[str],
+    fuzzy_threshold: Optional[float] = None
+) -> Tuple[Dict[str, str], int]:
+    """Serve what we can from the translation memory, then from near matches
+
+    Returns:
+        (translations found per key, how many of them are fuzzy matches)
+    """
+    metrics = get_metrics()
+    with metrics.stage('memory'):
+        found = memory.get_many(namespace, keys)
+    metrics.inc('cache_lookups_total', len(found), result='hit')
+    pending = [key for key in keys if key not in found]
+
+    fuzzy_count = 0
+    if fuzzy_threshold and pending:
+        with metrics.stage('fuzzy'):
+            fuzzy = memory.get_fuzzy_many(namespace, pending, fuzzy_threshold)
+        fuzzy_count = len(fuzzy)
+        metrics.inc('cache_lookups_total', fuzzy_count, result='fuzzy')
+        found.update(fuzzy)
+    metrics.inc('cache_lookups_total', len(pending) - fuzzy_count, result='miss')
+    return found, fuzzy_count
+
+
+def translate_fragment(
+    fragment: str,
+    source: str,
+    target: str,
+    request: RequestFunc,
+    provider: str = 'google'
+) -> Optional[str]:
+    """Translate a single fragment, retrying with jittered exponential backoff
+
+    Every attempt passes through the provider's shared rate limiter and
+    reports its outcome back, so 429s and timeouts slow down all workers.
+    """
+    limiter = get_rate_limiter(provider)
+    metrics = get_metrics()
+    for attempt in range(MAX_RETRIES):
+        if attempt:
+            metrics.inc('retries_total', provider=provider)
+        if limiter is not None:
+            metrics.inc('wait_seconds_total', limiter.acquire(), provider=provider)
+        metrics.inc('chars_sent_total', len(fragment), provider=provider)
+        started = time.perf_counter()
+        try:
+            translated = request(fragment, source, target)
+            outcome = 'ok'
+        except ThrottledError:
+            translated, outcome = None, 'throttled'
+        except Exception:
+            translated, outcome = None, 'error'
+        metrics.observe('request_seconds', time.perf_counter() - started, provider=provider)
+        metrics.inc('requests_total', provider=provider, outcome=outcome)
+        if limiter is not None:
+            if outcome == 'ok':
+                limiter.on_success()
+            elif outcome == 'throttled':
+                limiter.on_throttle()
+            else:
+                limiter.on_failure()
+        if translated:
+            return translated
+        if outcome != 'ok' and attempt < MAX_RETRIES - 1:
+            delay = backoff_delay(attempt)
+            metrics.inc('backoff_seconds_total', delay, provider=provider)
+            time.sleep(delay)
+    return None
+
+
+def pack_fragments(
+    fragments: List[str],
+    max_items: int = DEFAULT_PACK_SIZE,
+    max_chars: int = MAX_PACK_CHARS
+) -> List[List[int]]:
+    """Group fragment indices into packs that fit one provider request"""
+    packs = []
+    current = []
+    size = 0
+    for idx, fragment in enumerate(fragments):
+        if PACK_SEPARATOR in fragment:
+            # Cannot be split back reliably, send on its own
+            packs.append([idx])
+            continue
+        cost = len(fragment) + len(PACK_SEPARATOR)
+        if current and (len(current) >= max_items or size + cost > max_chars):
+            packs.append(current)
+            current = []
+            size = 0
+        current.append(idx)
+        size += cost
+    if current:
+        packs.append(current)
+    return packs
+
+
+def translate_pack(
+    fragments: List[str],
+    source: str,
+    target: str,
+    request: RequestFunc,
+    provider: str = 'google'
+) -> List[Optional[str]]:
+    """Translate packed fragments in one request, bisecting on misaligned splits"""
+    if len(fragments) == 1:
+        return [translate_fragment(fragments[0], source, target, request, provider)]
+
+    translated = translate_fragment(PACK_SEPARATOR.join(fragments), source, target, request, provider)
+    if translated is None:
+        # Provider failure, not a split problem: bisecting would only retry harder
+        return [None] * len(fragments)
+
+    lines = translated.split(PACK_SEPARATOR)
+    if len(lines) == len(fragments):
+        return [line.strip() or None for line in lines]
+
+    mid = len(fragments) // 2
+    return (
+        translate_pack(fragments[:mid], source, target, request, provider)
+        + translate_pack(fragments[mid:], source, target, request, provider)
+    )
+
+
+def translate_texts(
+    texts: List[str],
+    source: str,
+    target: str,
+    request: RequestFunc,
+    max_workers: int = DEFAULT_WORKERS,
+    memory: Optional[TranslationMemory] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    pack_size: int = DEFAULT_PACK_SIZE,
+    stats: Optional[dict] = None,
+    result_callback: Optional[Callable[[int, str, bool], None]] = None,
+    keep_results: bool = True,
+    provider: str = 'google',
+    namespace: Optional[str] = None,
+    fuzzy_threshold: Optional[float] = None,
+    prepared: Optional[PreparedTexts] = None
+) -> List[str]:
+    """
+    Translate texts concurrently while preserving ASS formatting tags
+
+    Args:
+        texts: Subtitle texts, possibly containing ASS override tags
+        source: Source language code ('auto' to detect)
+        target: Target language code
+        request: Sends one packed request to the provider (see providers.py)
+        max_workers: Maximum number of requests in flight
+        memory: Translation memory to read from and write to (optional)
+        progress_callback: Called with (finished texts, total texts)
+        pack_size: Maximum number of fragments packed into one request
+        stats: Dict filled with fragment, duplicate, cache and failure counts
+            (optional); 'failed' counts distinct fragments that kept their
+            source text because every attempt failed
+        result_callback: Called with (text index, translated text, complete) as
+            soon as every fragment of a text is done, e.g. to checkpoint
+            progress; complete is False when a fragment failed and kept its
+            source text
+        keep_results: When False, each text's state is released as soon as it
+            has been passed to result_callback and an empty list is returned
+        provider: Provider name used for the memory namespace and metrics
+        namespace: Memory namespace, when the provider name alone does not
+            identify the translations (e.g. the local model in use)
+        fuzzy_threshold: Reuse memory entries at least this similar to a
+            segment (see TranslationMemory.get_fuzzy_many); None disables
+        prepared: texts already parsed by PreparedTexts, e.g. shared by
+            several target languages (optional)
+
+    Returns:
+        Translated texts in the same order as the input
+    """
+    namespace = namespace or make_namespace(provider, source, target)
+    metrics = get_metrics()
+    if prepared is None:
+        started = time.perf_counter()
+        prepared = PreparedTexts(texts)
+        metrics.observe('stage_seconds', time.perf_counter() - started, stage='segment')
+    # Copied: finished lines are released when keep_results is False
+    lines = list(prepared.lines)
+    translations = [[None] * len(line.segments) if line else [] for line in lines]
+
+    # Deduplicate: every occurrence of a normalized segment shares one translation
+    groups = prepared.groups()
+    remaining = [len(keys) for keys in prepared.keys]
+    fragment_count = sum(remaining)
+    unique_count = len(groups)
+
+    total = len(texts)
+    done = sum(1 for count in remaining if count == 0)
+    # Texts with a fragment that failed and fell back to its source text
+    incomplete = set()
+
+    def finish(i: int, k: int, translated: Optional[str]):
+        nonlocal done
+        if translated:
+            translations[i][k] = translated
+        else:
+            incomplete.add(i)
+        remaining[i] -= 1
+        if remaining[i] == 0:
+            done += 1
+            if result_callback:
+                result_callback(i, lines[i].restore(translations[i]), i not in incomplete)
+            if not keep_results:
+                lines[i] = translations[i] = None
+            if progress_callback:
+                progress_callback(done, total)
+
+    if progress_callback:
+        progress_callback(done, total)
+
+    def finish_group(key: str, translated: Optional[str]):
+        for i, k in groups.pop(key):
+            finish(i, k, translated)
+
+    pending = list(groups)
+    cached_count = fuzzy_count = 0
+
+    if memory is not None and pending:
+        found, fuzzy_count = lookup_memory(memory, namespace, pending, fuzzy_threshold)
+        cached_count = len(found) - fuzzy_count
+        for key, translated in found.items():
+            finish_group(key, translated)
+        pending = [key for key in pending if key not in found]
+
+    if stats is not None:
+        stats['fragments'] = stats.get('fragments', 0) + fragment_count
+        stats['unique'] = stats.get('unique', 0) + unique_count
+        stats['deduplicated'] = stats.get('deduplicated', 0) + fragment_count - unique_count
+        stats['cached'] = stats.get('cached', 0) + cached_count
+        stats['fuzzy'] = stats.get('fuzzy', 0) + fuzzy_count
+
+    failed = 0
+    if pending:
+        started = time.perf_counter()
+        packs = pack_fragments(pending, max_items=max(1, int(pack_size)))
+        executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)))
+        try:
+            futures = {
+                executor.submit(
+                    translate_pack, [pending[k] for k in pack], source, target, request, provider
+                ): pack
+                for pack in packs
+            }
+            for future in as_completed(futures):
+                pack = futures[future]
+                results = future.result()
+                if memory is not None:
+                    memory.put_many(namespace, [
+                        (pending[k], translated)
+                        for k, translated in zip(pack, results)
+                        if translated
+                    ])
+                for k, translated in zip(pack, results):
+                    if not translated:
+                        failed += 1
+                    finish_group(pending[k], translated)
+        except BaseException:
+            # Ctrl-C or a failure: drop queued packs instead of draining them
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+        metrics.observe('stage_seconds', time.perf_counter() - started, stage='translate')
+    if stats is not None:
+        stats['failed'] = stats.get('failed', 0) + failed
+
+    if not keep_results:
+        return []
+    return [
+        line.restore(translated) if line else text
+        for line, translated, text in zip(lines, translations, texts)
+    ]
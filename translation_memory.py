@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Translation Memory - ذاكرة ترجمة دائمة
+SQLite-backed cache shared by the CLI and the web app
+"""
+
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    # Vectorizes MinHash signatures; the pure-Python path gives the same values
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULT_PATH = Path(
+    os.environ.get(
+        'SUBTITLE_TM_PATH',
+        Path.home() / '.cache' / 'subtitle_translator' / 'memory.sqlite3'
+    )
+)
+DEFAULT_MAX_ENTRIES = 500_000
+DEFAULT_TTL = 180 * 24 * 3600  # seconds
+
+# Refresh the LRU timestamp at most this often to keep hits read-mostly
+TOUCH_INTERVAL = 3600  # seconds
+# Run eviction after this many writes
+EVICT_EVERY = 1000
+
+# Fuzzy matching: segments whose similarity reaches the threshold reuse the
+# stored translation (1.0 = only case, spacing or punctuation may differ).
+# Off unless asked for; this is the threshold used when it is enabled.
+DEFAULT_FUZZY_THRESHOLD = 0.97
+# MinHash signature over character trigrams, split into LSH bands: two
+# segments become candidates when all rows of any band agree
+MINHASH_BANDS = 8
+MINHASH_ROWS = 4
+SHINGLE_SIZE = 3
+# Keys read per band bucket, and best-colliding candidates compared exactly
+MAX_BUCKET_READ = 32
+MAX_CANDIDATES = 8
+
+# Hash family: shingle CRCs spread by a 64-bit multiply, then XOR-ed with one
+# fixed random mask per signature row
+_MASK64 = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_rng = random.Random(0x5EED)
+_ROW_MASKS = [_rng.getrandbits(64) for _ in range(MINHASH_BANDS * MINHASH_ROWS)]
+del _rng
+_ROW_MASK_ARRAY = numpy.array(_ROW_MASKS, dtype=numpy.uint64)[:, None] if numpy is not None else None
+
+WORD_PATTERN = re.compile(r'\w+')
+# Honorifics may be added, dropped or changed, e.g. Taro-san / Taro-kun
+HONORIFICS = {
+    'san', 'kun', 'chan', 'sama', 'dono', 'tan', 'senpai', 'sempai', 'sensei',
+    'mr', 'mrs', 'ms', 'miss', 'sir', 'madam',
+}
+PLACEHOLDER_PATTERN = re.compile(r'⟦\s*\d+\s*⟧')
+TRAILING_PUNCTUATION = re.compile(r'[^\w\s]+$')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace   TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    created     REAL NOT NULL,
+    accessed    REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS bands (
+    namespace TEXT NOT NULL,
+    band      INTEGER NOT NULL,
+    key       TEXT NOT NULL,
+    PRIMARY KEY (namespace, band, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bands_key ON bands (namespace, key);
+CREATE TABLE IF NOT EXISTS counters (
+    namespace TEXT PRIMARY KEY,
+    hits      INTEGER NOT NULL DEFAULT 0,
+    misses    INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def make_namespace(provider: str, source: str, target: str) -> str:
+    """Build the namespace for a provider and language pair"""
+    return f"{provider}:{source}>{target}"
+
+
+def text_key(text: str) -> str:
+    """Hash a source segment into a fixed-size key"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def canonical_text(text: str) -> str:
+    """Fold case and drop punctuation and extra spacing, for fuzzy matching"""
+    text = ''.join(
+        ' ' if unicodedata.category(char)[0] in 'PS' else char
+        for char in unicodedata.normalize('NFKC', text).casefold()
+    )
+    return ' '.join(text.split())
+
+
+def _signature(shingles: set) -> List[int]:
+    if numpy is not None:
+        hashes = numpy.fromiter(shingles, dtype=numpy.uint64, count=len(shingles))
+        hashes *= numpy.uint64(_GOLDEN)
+        return (hashes ^ _ROW_MASK_ARRAY).min(axis=1).tolist()
+    hashes = [(x * _GOLDEN) & _MASK64 for x in shingles]
+    return [min(map(mask.__xor__, hashes)) for mask in _ROW_MASKS]
+
+
+def minhash_bands(canonical: str) -> List[int]:
+    """Return the LSH band hashes of a canonical segment"""
+    padded = f" {canonical} "
+    shingles = {
+        zlib.crc32(padded[i:i + SHINGLE_SIZE].encode('utf-8'))
+        for i in range(max(1, len(padded) - SHINGLE_SIZE + 1))
+    }
+    signature = _signature(shingles)
+    bands = []
+    for band in range(MINHASH_BANDS):
+        value = band + 1
+        for row in signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS]:
+            value = (value * 1_000_003 ^ row) & 0x7FFFFFFFFFFFFFFF
+        # SQLite integers are signed 64-bit
+        bands.append(value - (1 << 62))
+    return bands
+
+
+def _word_pattern(word: str) -> str:
+    # Whole words only, never the number inside a ⟦n⟧ tag placeholder
+    return rf'(?<!⟦)(?<!⟦ )\b{re.escape(word)}\b(?!⟧)(?! ⟧)'
+
+
+def _is_honorific(word: str) -> bool:
+    return word.casefold() in HONORIFICS
+
+
+def _is_swappable(old: str, new: str) -> bool:
+    # Numbers for numbers, capitalized names for names
+    return old.isdigit() and new.isdigit() or old[0].isupper() and new[0].isupper()
+
+
+def adapt_translation(text: str, source: str, translation: str) -> Tuple[float, str]:
+    """Score a stored match for text and adapt its translation
+
+    Only case, spacing, punctuation, honorifics, numbers and names may
+    differ. Numbers or capitalized names that differ one-for-one are
+    swapped in the translation when the old word appears in it exactly
+    once, e.g. names kept in Latin script; a match with any other differing
+    word, such as a negation or a pronoun, or with a number or name that
+    cannot be swapped, scores 0. Trailing punctuation is carried over when
+    the match has none or the translation ends with the match's.
+
+    Returns:
+        (similarity between 0 and 1, adapted translation)
+    """
+    words = WORD_PATTERN.findall(PLACEHOLDER_PATTERN.sub(' ', text))
+    matched_words = WORD_PATTERN.findall(PLACEHOLDER_PATTERN.sub(' ', source))
+    adapted = translation
+    swaps = []
+    honorifics = []
+    opcodes = SequenceMatcher(
+        None, [word.casefold() for word in matched_words], [word.casefold() for word in words], autojunk=False
+    ).get_opcodes()
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            continue
+        old, new = matched_words[i1:i2], words[j1:j2]
+        if all(map(_is_honorific, old + new)):
+            if len(old) == len(new):
+                honorifics.extend(zip(old, new))
+            continue
+        if len(old) != len(new) or not all(map(_is_swappable, old, new)):
+            return 0.0, translation
+        swaps.extend(zip(old, new))
+
+    if len(swaps) > max(1, len(words) // 4):
+        return 0.0, translation
+    for old, new in swaps:
+        if len(re.findall(_word_pattern(old), adapted)) != 1:
+            return 0.0, translation
+    for old, new in swaps + [
+        (old, new) for old, new in honorifics if len(re.findall(_word_pattern(old), adapted)) == 1
+    ]:
+        adapted = re.sub(_word_pattern(old), lambda _: new, adapted)
+
+    # Swapped words and honorifics do not lower the score; tag placeholders do
+    def compared(value: str) -> str:
+        return ' '.join(
+            word for word in canonical_text(value).split()
+            if word not in HONORIFICS and word not in swapped
+        )
+
+    swapped = {word.casefold() for pair in swaps for word in pair}
+    score = SequenceMatcher(None, compared(text), compared(source), autojunk=False).ratio()
+
+    ending = TRAILING_PUNCTUATION.search(text.rstrip())
+    matched_ending = TRAILING_PUNCTUATION.search(source.rstrip())
+    if matched_ending is None:
+        if ending:
+            adapted = adapted.rstrip() + ending.group()
+    elif adapted.rstrip().endswith(matched_ending.group()):
+        adapted = adapted.rstrip()[:-len(matched_ending.group())] + (ending.group() if ending else '')
+    return score, adapted
+
+
+class TranslationMemory:
+    """Size-bounded on-disk translation cache with LRU/TTL eviction
+
+    Safe to share between threads (one connection per thread) and between
+    processes (SQLite WAL journal with a busy timeout).
+    """
+
+    def __init__(
+        self,
+        path: Optional[os.PathLike] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: Optional[float] = DEFAULT_TTL
+    ):
+        self.path = Path(path) if path else DEFAULT_PATH
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.fuzzy_hits = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        # Stores created before fuzzy matching keep no source text
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
+        if 'source' not in columns:
+            conn.execute("ALTER TABLE entries ADD COLUMN source TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, namespace: str, hits: int, misses: int):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+        if hits or misses:
+            self._connect().execute(
+                "INSERT INTO counters (namespace, hits, misses) VALUES (?, ?, ?) "
+                "ON CONFLICT(namespace) DO UPDATE SET "
+                "hits = hits + excluded.hits, misses = misses + excluded.misses",
+                (namespace, hits, misses)
+            )
+
+    def get(self, namespace: str, text: str) -> Optional[str]:
+        """Return the cached translation of text, or None"""
+        return self.get_many(namespace, [text]).get(text)
+
+    def get_many(self, namespace: str, texts: Iterable[str]) -> Dict[str, str]:
+        """Return cached translations for every text found in the namespace"""
+        keys = {text_key(text): text for text in texts}
+        if not keys:
+            return {}
+
+        now = time.time()
+        conn = self._connect()
+        found = {}
+        stale = []
+        key_list = list(keys)
+        for i in range(0, len(key_list), 500):
+            chunk = key_list[i:i + 500]
+            rows = conn.execute(
+                f"SELECT key, translation, created, accessed FROM entries "
+                f"WHERE namespace = ? AND key IN ({','.join('?' * len(chunk))})",
+                [namespace, *chunk]
+            ).fetchall()
+            for key, translation, created, accessed in rows:
+                if self.ttl and now - created > self.ttl:
+                    continue
+                found[keys[key]] = translation
+                if now - accessed > TOUCH_INTERVAL:
+                    stale.append((now, namespace, key))
+
+        if stale:
+            conn.executemany(
+                "UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?",
+                stale
+            )
+        self._count(namespace, len(found), len(keys) - len(found))
+        return found
+
+    def put(self, namespace: str, text: str, translation: str):
+        """Store a single translation"""
+        self.put_many(namespace, [(text, translation)])
+
+    def get_fuzzy_many(
+        self,
+        namespace: str,
+        texts: Iterable[str],
+        threshold: float = DEFAULT_FUZZY_THRESHOLD
+    ) -> Dict[str, str]:
+        """Return adapted translations of stored segments similar to each text
+
+        Candidates come from the MinHash/LSH band index, so a lookup costs a
+        few indexed reads however many segments are stored; the best
+        candidates are then scored with adapt_translation().
+        """
+        now = time.time()
+        conn = self._connect()
+        found = {}
+        for text in texts:
+            canonical = canonical_text(text)
+            if not canonical:
+                continue
+            # Common lines fill some buckets: read a bounded sample of each
+            collisions: Dict[str, int] = {}
+            for band in minhash_bands(canonical):
+                for (key,) in conn.execute(
+                    "SELECT key FROM bands WHERE namespace = ? AND band = ? LIMIT ?",
+                    (namespace, band, MAX_BUCKET_READ)
+                ):
+                    collisions[key] = collisions.get(key, 0) + 1
+            if not collisions:
+                continue
+            keys = sorted(collisions, key=collisions.get, reverse=True)[:MAX_CANDIDATES]
+            rows = conn.execute(
+                f"SELECT source, translation, created FROM entries "
+                f"WHERE namespace = ? AND key IN ({','.join('?' * len(keys))})",
+                [namespace, *keys]
+            ).fetchall()
+            best_score = 0.0
+            for source, translation, created in rows:
+                if source is None or (self.ttl and now - created > self.ttl):
+                    continue
+                score, adapted = adapt_translation(text, source, translation)
+                if score >= threshold and score > best_score:
+                    best_score = score
+                    found[text] = adapted
+        with self._lock:
+            self.fuzzy_hits += len(found)
+        return found
+
+    def put_many(self, namespace: str, pairs: Iterable[Tuple[str, str]]):
+        """Store several translations in one transaction"""
+        now = time.time()
+        rows = []
+        band_rows = []
+        for text, translation in pairs:
+            if not translation:
+                continue
+            key = text_key(text)
+            rows.append((namespace, key, text, translation, now, now))
+            canonical = canonical_text(text)
+            if canonical:
+                band_rows.extend((namespace, band, key) for band in minhash_bands(canonical))
+        if not rows:
+            return
+
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                "INSERT OR REPLACE INTO entries "
+                "(namespace, key, source, translation, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO bands (namespace, band, key) VALUES (?, ?, ?)",
+                band_rows
+            )
+
+        with self._lock:
+            self._writes += len(rows)
+            due = self._writes >= EVICT_EVERY
+            if due:
+                self._writes = 0
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries and trim the store to max_entries (LRU)"""
+        conn = self._connect()
+        removed = 0
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            if self.ttl:
+                cutoff = time.time() - self.ttl
+                conn.execute(
+                    "DELETE FROM bands WHERE (namespace, key) IN "
+                    "(SELECT namespace, key FROM entries WHERE created < ?)",
+                    (cutoff,)
+                )
+                removed += conn.execute(
+                    "DELETE FROM entries WHERE created < ?", (cutoff,)
+                ).rowcount
+            total = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            excess = total - self.max_entries
+            if excess > 0:
+                removed += self._evict_lru(conn, excess)
+        return removed
+
+    @staticmethod
+    def _evict_lru(conn: sqlite3.Connection, excess: int) -> int:
+        # WITHOUT ROWID tables have no rowid, so select the oldest keys explicitly
+        victims = conn.execute(
+            "SELECT namespace, key FROM entries ORDER BY accessed LIMIT ?", (excess,)
+        ).fetchall()
+        conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+        conn.executemany("DELETE FROM bands WHERE namespace = ? AND key = ?", victims)
+        return len(victims)
+
+    def clear(self, namespace: Optional[str] = None):
+        """Remove all entries, or only those of one namespace"""
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            if namespace is None:
+                conn.execute("DELETE FROM entries")
+                conn.execute("DELETE FROM bands")
+                conn.execute("DELETE FROM counters")
+            else:
+                conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+                conn.execute("DELETE FROM bands WHERE namespace = ?", (namespace,))
+                conn.execute("DELETE FROM counters WHERE namespace = ?", (namespace,))
+
+    def stats(self) -> dict:
+        """Return session and lifetime hit/miss counters"""
+        conn = self._connect()
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lifetime = conn.execute(
+            "SELECT COALESCE(SUM(hits), 0), COALESCE(SUM(misses), 0) FROM counters"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'fuzzy_hits': self.fuzzy_hits,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'lifetime_hits': lifetime[0],
+            'lifetime_misses': lifetime[1],
+        }
+
+
+_default_memory = None
+_default_lock = threading.Lock()
+
+
+def get_memory(path: Optional[os.PathLike] = None) -> TranslationMemory:
+    """Return the process-wide translation memory"""
+    global _default_memory
+    with _default_lock:
+        if _default_memory is None or (path and Path(path) != _default_memory.path):
+            _default_memory = TranslationMemory(path)
+        return _default_memory